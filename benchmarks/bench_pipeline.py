@@ -0,0 +1,195 @@
+"""
+Benchmark the parsing and output hot paths on a synthetic PO corpus
+Reports pages/sec, rows/sec and peak Python memory per stage:
+parse_pdf_tables, parse_pdf_text, parse_pdf (dispatch + both parsers), parse_pdf_templates (parse_pdf
+with learned layout templates) and write_output (xlsx, csv)
+
+    python benchmarks/bench_pipeline.py --count 40 --lines 80 --json bench.json
+    python benchmarks/bench_pipeline.py --compare bench.json      # exit 1 if a stage got slower
+"""
+
+import argparse
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from po_corpus import generate_corpus
+from po_extractor import PDFExtractor, PDFAnalysis, set_progress_handler
+from layout_templates import LayoutTemplates
+
+
+def measure(work, trace_memory):
+    """Run work() once; returns (seconds, peak MB or None, result)"""
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = work()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024 if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def run_stage(name, work, pages, repeat, trace_memory):
+    """Best of `repeat` timed runs, plus one traced run for peak memory (tracing slows the code down)"""
+    best = None
+    rows = 0
+    for _ in range(repeat):
+        elapsed, _, rows = measure(work, False)
+        best = elapsed if best is None else min(best, elapsed)
+    peak = measure(work, True)[1] if trace_memory else None
+    return {
+        'stage': name,
+        'seconds': round(best, 4),
+        'pages': pages,
+        'rows': rows,
+        'pages_per_sec': round(pages / best, 2) if pages and best else None,
+        'rows_per_sec': round(rows / best, 2) if rows and best else None,
+        'peak_mb': round(peak, 2) if peak is not None else None,
+    }
+
+
+def parse_stage(extractor, documents, method):
+    """Open each PDF and run one parser method on it; returns the number of rows"""
+    import pdfplumber
+
+    def work():
+        rows = 0
+        for path, _, _ in documents:
+            with pdfplumber.open(path) as pdf:
+                rows += len(getattr(extractor, method)(PDFAnalysis(pdf), os.path.basename(path)))
+        return rows
+    return work
+
+
+def parse_pdf_stage(extractor, documents):
+    def work():
+        return sum(len(extractor.parse_pdf(path, os.path.basename(path))) for path, _, _ in documents)
+    return work
+
+
+def write_stage(extractor, rows, directory, extension):
+    """write_output of all rows into a fresh output file and store"""
+    def work():
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        extractor.write_output(os.path.join(directory, f"PO_Data.{extension}"), rows)
+        return len(rows)
+    return work
+
+
+def print_report(results):
+    def cell(value, width, digits):
+        return f"{value:>{width}.{digits}f}" if value is not None else f"{'-':>{width}}"
+
+    print(f"{'Stage':<24}{'Seconds':>10}{'Pages/s':>10}{'Rows/s':>12}{'Peak MB':>10}")
+    for r in results:
+        print(f"{r['stage']:<24}{cell(r['seconds'], 10, 3)}{cell(r['pages_per_sec'], 10, 1)}"
+              f"{cell(r['rows_per_sec'], 12, 1)}{cell(r['peak_mb'], 10, 1)}")
+
+
+def compare(results, baseline_path, tolerance):
+    """Print the change against a saved report; returns False if a stage slowed by more than tolerance"""
+    with open(baseline_path) as f:
+        baseline = {r['stage']: r for r in json.load(f)['results']}
+    ok = True
+    print(f"\nAgainst {baseline_path} (tolerance {tolerance:.0%}):")
+    for r in results:
+        old = baseline.get(r['stage'])
+        if not old or not old.get('seconds'):
+            continue
+        change = r['seconds'] / old['seconds'] - 1
+        slower = change > tolerance
+        ok = ok and not slower
+        print(f"  {r['stage']:<22}{change:>+8.1%}{'  SLOWER' if slower else ''}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark PO parsing and output on a synthetic corpus")
+    parser.add_argument("--corpus", help="Use (or create) the corpus in this folder instead of a temp folder")
+    parser.add_argument("--count", type=int, default=20, help="POs in the corpus (default: 20)")
+    parser.add_argument("--lines", type=int, default=40, help="Line items per PO (default: 40)")
+    parser.add_argument("--terms-pages", type=int, default=1,
+                        help="Terms and conditions pages after each table PO (default: 1)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage, best is reported (default: 3)")
+    parser.add_argument("--write-scale", type=int, default=10,
+                        help="Write stages get the parsed rows this many times, as separate PDFs (default: 10)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced run for peak memory")
+    parser.add_argument("--json", help="Save the results to this file")
+    parser.add_argument("--compare", help="Compare against a saved --json report")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed slowdown for --compare (default: 0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    set_progress_handler(lambda message: None)  # Parser logging would dominate the timings
+    work_dir = tempfile.mkdtemp(prefix="po_bench_")
+    try:
+        corpus_dir = args.corpus or os.path.join(work_dir, "corpus")
+        documents = generate_corpus(corpus_dir, args.count, args.lines, seed=args.seed,
+                                    terms_pages=args.terms_pages)
+        tables = [d for d in documents if d[1] == 'table']
+        texts = [d for d in documents if d[1] == 'text']
+        print(f"Corpus: {len(documents)} POs, {sum(d[2] for d in documents)} pages, "
+              f"{args.lines} line items each ({corpus_dir})\n")
+
+        extractor = PDFExtractor()
+        trace = not args.no_memory
+        results = [
+            run_stage('parse_pdf_tables', parse_stage(extractor, tables, 'parse_pdf_tables'),
+                      sum(d[2] for d in tables), args.repeat, trace),
+            run_stage('parse_pdf_text', parse_stage(extractor, texts, 'parse_pdf_text'),
+                      sum(d[2] for d in texts), args.repeat, trace),
+            run_stage('parse_pdf', parse_pdf_stage(extractor, documents),
+                      sum(d[2] for d in documents), args.repeat, trace),
+        ]
+
+        # Same documents once the corpus layouts are learned
+        templates = PDFExtractor()
+        templates.layout_templates = LayoutTemplates(os.path.join(work_dir, "layouts.sqlite")).open()
+        try:
+            parse_pdf_stage(templates, documents)()
+            results.append(run_stage('parse_pdf_templates', parse_pdf_stage(templates, documents),
+                                     sum(d[2] for d in documents), args.repeat, trace))
+        finally:
+            templates.layout_templates.close()
+
+        parsed = []
+        for path, _, _ in documents:
+            parsed.extend(extractor.parse_pdf(path, os.path.basename(path)))
+        rows = [dict(row, pdf_file=f"{copy}_{row['pdf_file']}")
+                for copy in range(args.write_scale) for row in parsed]
+        for extension in ('xlsx', 'csv'):
+            results.append(run_stage(f'write_output_{extension}',
+                                     write_stage(extractor, rows, os.path.join(work_dir, extension), extension),
+                                     0, args.repeat, trace))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'count': args.count, 'lines': args.lines, 'seed': args.seed,
+                       'terms_pages': args.terms_pages, 'results': results}, f, indent=2)
+        print(f"\nSaved to {args.json}")
+
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Synthetic purchase order PDFs for benchmarking the parsers
+Writes plain PDF (Helvetica text and ruled tables) in the layouts PDFExtractor expects:
+- table: header row with "Line" / "Part Number", continuation tables without a header on later pages
+- text: vertical layout, one value per line under a "Line" heading
+Both have the Order Number / Order Date line and the Ship To Address / Ordering Office blocks.
+Table POs can end with terms and conditions pages (boxed clauses and a signature grid, no line items).
+
+    python benchmarks/po_corpus.py --out corpus --count 50 --lines 80 --layout mixed
+"""
+
+import argparse
+import os
+import random
+import zlib
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+
+MONTHS = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
+
+# (heading, x, width) of the line item table columns
+TABLE_COLUMNS = [
+    ("Line", 40, 35), ("Part Number", 75, 150), ("Delivery Date", 225, 70), ("Quantity", 295, 50),
+    ("UOM", 345, 40), ("Unit Price", 385, 70), ("Amount", 455, 100)
+]
+
+SHIP_TO = [
+    ["ACME Receiving Dock 4", "1200 Industrial Pkwy", "Springfield, IL 62701", "USA"],
+    ["Northwind Plant 2 Receiving", "88 Harbor Rd", "Tacoma, WA 98421", "USA"],
+    ["Contoso Distribution Center", "5 Logistics Way", "Columbus, OH 43215", "USA"],
+]
+
+ORDERING_OFFICE = [
+    ["ACME Procurement", "PO Box 77", "Chicago, IL 60601", "USA"],
+    ["Northwind Purchasing", "400 Pine St Suite 9", "Seattle, WA 98101", "USA"],
+    ["Contoso Supply Chain", "12 Market Sq", "Cincinnati, OH 45202", "USA"],
+]
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+class CorpusPage:
+    """Drawing operations for one page - positions are top-down like pdfplumber's"""
+
+    def __init__(self):
+        self.ops = []
+
+    def text(self, x, top, value, size=8):
+        y = PAGE_HEIGHT - top - size
+        self.ops.append(f"BT /F1 {size} Tf {x:.2f} {y:.2f} Td ({_escape(value)}) Tj ET")
+
+    def rect(self, x, top, width, height):
+        y = PAGE_HEIGHT - top - height
+        self.ops.append(f"{x:.2f} {y:.2f} {width:.2f} {height:.2f} re S")
+
+    def content(self):
+        return ("0.5 w\n" + "\n".join(self.ops)).encode('latin-1')
+
+
+def write_pdf(path, pages):
+    """Write pages as a minimal PDF 1.4 file (one shared Helvetica font, compressed content streams)"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for page in pages:
+        data = zlib.compress(page.content())
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(data) + data + b"\nendstream")
+        objects.append((f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                        f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>").encode())
+        kids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def line_items(count, rng):
+    """(line, part, delivery date, quantity, UOM, unit price, amount) as printed on the PO"""
+    for number in range(1, count + 1):
+        quantity = rng.randint(1, 900)
+        price = rng.randint(100, 99999) / 100
+        part = f"{rng.randint(10, 99)}P{rng.randint(1000, 9999)}X{rng.randint(100, 999)}-{rng.randint(1000, 9999)}"
+        yield (f"{number}.1", f"{part} / REV: {rng.choice('ABC')}",
+               f"{rng.randint(1, 28)}-{rng.choice(MONTHS)}-2025", str(quantity), "Each",
+               f"{price:.4f}", f"{quantity * price:,.4f}")
+
+
+def draw_header(page, order_number, rng):
+    """Title, order number/date and the two address blocks"""
+    site = rng.randrange(len(SHIP_TO))
+    page.text(40, 30, "PURCHASE ORDER", 14)
+    page.text(40, 55, f"Order Number {order_number}  Order Date {rng.randint(1, 28):02d}-Jan-2025")
+    page.text(40, 120, "Ship To Address")
+    page.text(320, 120, "Ordering Office")
+    for row, (ship_line, office_line) in enumerate(zip(SHIP_TO[site], ORDERING_OFFICE[site])):
+        page.text(40, 135 + row * 11, ship_line)
+        page.text(320, 135 + row * 11, office_line)
+    page.text(320, 185, "Supplier Contact Jane Roe")
+    page.text(40, 200, "Payment Terms Net 30")
+    page.text(320, 200, "Buyer John Doe")
+
+
+CLAUSES = [
+    "Acceptance. This order is accepted by shipment or written acknowledgement.",
+    "Delivery. Time is of the essence; partial shipments require written approval.",
+    "Invoicing. Invoices must quote the order number and line number of each item.",
+    "Warranty. Goods shall be free from defects in material and workmanship for 12 months.",
+    "Inspection. Buyer may reject nonconforming goods within 30 days of receipt.",
+    "Changes. Buyer may change quantities or delivery dates by written notice.",
+    "Termination. Buyer may terminate this order for convenience with 10 days notice.",
+    "Governing law. This order is governed by the laws of the state of delivery.",
+]
+
+
+def draw_terms(page, rng):
+    """Boxed, numbered clauses and a signature grid - ruled, but never line items"""
+    page.text(40, 40, "TERMS AND CONDITIONS OF PURCHASE", 12)
+    top = 70
+    clauses = rng.sample(CLAUSES, len(CLAUSES))
+    for number, clause in enumerate(clauses * 3, 1):
+        page.text(48, top, f"{number}. {clause}", 7)
+        top += 14
+    page.rect(40, 62, 532, top - 58)
+    for row in range(2):
+        for column, label in enumerate(("Authorized Signature", "Date")):
+            page.rect(40 + column * 266, top + 20 + row * 30, 266, 30)
+            if row == 0:
+                page.text(44 + column * 266, top + 25, label, 7)
+
+
+def table_po(path, lines=20, per_page=25, seed=1, terms_pages=0):
+    """Ruled table layout, optionally followed by terms pages; returns the page count"""
+    rng = random.Random(seed)
+    items = list(line_items(lines, rng))
+    pages = []
+    while items or not pages:
+        page = CorpusPage()
+        first = not pages
+        top = 60
+        if first:
+            draw_header(page, f"45{seed:08d}", rng)
+            top = 230
+        rows, items = items[:per_page], items[per_page:]
+        # Later pages continue the table without a header row
+        table = ([tuple(column[0] for column in TABLE_COLUMNS)] if first else []) + rows
+        for row_index, row in enumerate(table):
+            y = top + row_index * 18
+            for (name, x, width), cell in zip(TABLE_COLUMNS, row):
+                page.rect(x, y, width, 18)
+                page.text(x + 2, y + 5, cell, 7)
+        page.text(40, 740, "Terms and conditions apply.")
+        pages.append(page)
+    for _ in range(terms_pages):
+        page = CorpusPage()
+        draw_terms(page, rng)
+        pages.append(page)
+    write_pdf(path, pages)
+    return len(pages)
+
+
+def text_po(path, lines=20, per_page=60, seed=1):
+    """Vertical layout - each value on its own line; returns the page count"""
+    rng = random.Random(seed)
+    values = ["Line"]
+    for line, part, delivery, quantity, uom, price, amount in line_items(lines, rng):
+        # Currency suffix keeps prices from looking like line numbers
+        values += [line, part, delivery, quantity, uom,
+                   f"{float(price):.2f} USD", f"{float(amount.replace(',', '')):.2f} USD"]
+    pages = []
+    while values or not pages:
+        page = CorpusPage()
+        top = 60
+        if not pages:
+            draw_header(page, f"46{seed:08d}", rng)
+            top = 230
+        chunk, values = values[:per_page], values[per_page:]
+        for row, value in enumerate(chunk):
+            page.text(40, top + row * 9, value, 7)
+        pages.append(page)
+    write_pdf(path, pages)
+    return len(pages)
+
+
+LAYOUTS = {'table': table_po, 'text': text_po}
+
+
+def generate_corpus(directory, count=20, lines=40, per_page=None, layout='mixed', seed=1, terms_pages=0):
+    """Write count POs into directory; returns [(path, layout, pages)].
+    layout 'mixed' alternates table and text POs; terms_pages are added to table POs."""
+    os.makedirs(directory, exist_ok=True)
+    corpus = []
+    for index in range(count):
+        kind = layout if layout != 'mixed' else ('table', 'text')[index % 2]
+        path = os.path.join(directory, f"PO_{kind}_{seed + index:05d}.pdf")
+        kwargs = {'per_page': per_page} if per_page else {}
+        if kind == 'table':
+            kwargs['terms_pages'] = terms_pages
+        pages = LAYOUTS[kind](path, lines=lines, seed=seed + index, **kwargs)
+        corpus.append((path, kind, pages))
+    return corpus
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic purchase order PDFs")
+    parser.add_argument("--out", required=True, help="Folder to write the PDFs to")
+    parser.add_argument("--count", type=int, default=20, help="Number of POs (default: 20)")
+    parser.add_argument("--lines", type=int, default=40, help="Line items per PO (default: 40)")
+    parser.add_argument("--per-page", type=int,
+                        help="Line items per page (default: 25 for tables, 60 text lines for vertical POs)")
+    parser.add_argument("--layout", choices=['table', 'text', 'mixed'], default='mixed')
+    parser.add_argument("--terms-pages", type=int, default=0, help="Terms and conditions pages after each table PO")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    corpus = generate_corpus(args.out, args.count, args.lines, args.per_page, args.layout, args.seed,
+                             args.terms_pages)
+    print(f"Wrote {len(corpus)} POs ({sum(pages for _, _, pages in corpus)} pages) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Attachment index - content hashes of attachments seen in earlier runs, keyed by cheap metadata
+Lets a run recognise a known attachment from (EntryID, position, FileName, Size) without
+calling SaveAsFile - on a network-backed mailbox that's a full download per attachment
+"""
+
+import os
+import time
+import sqlite3
+
+from po_extractor import update_progress
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".pdf_extractor_attachments.sqlite")
+
+
+class AttachmentIndex:
+    """SQLite map of (message EntryID, attachment position) -> (FileName, Size, content hash)"""
+
+    def __init__(self, path=None, max_age_days=90):
+        self.path = path or DEFAULT_INDEX_PATH
+        self.max_age = max_age_days * 86400
+        self.conn = None
+        self.hits = 0
+        self.invalidated = 0
+
+    def open(self):
+        """Open (or create) the index and drop entries not seen within max age"""
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS attachments (
+                entry_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                file_name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                pdf_hash TEXT NOT NULL,
+                last_seen REAL NOT NULL,
+                archived_size INTEGER,
+                archived_mtime INTEGER,
+                PRIMARY KEY (entry_id, position)
+            )
+        """)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(attachments)")}
+        if 'archived_size' not in columns:  # Index from before archived files were recorded
+            self.conn.execute("ALTER TABLE attachments ADD COLUMN archived_size INTEGER")
+            self.conn.execute("ALTER TABLE attachments ADD COLUMN archived_mtime INTEGER")
+        removed = self.conn.execute(
+            "DELETE FROM attachments WHERE last_seen < ?", (time.time() - self.max_age,)).rowcount
+        self.conn.commit()
+        if removed:
+            update_progress(f"Attachment index: dropped {removed} stale entries")
+        return self
+
+    def lookup(self, entry_id, position, file_name, size):
+        """Content hash of a known attachment, or None. An entry whose name or size no longer
+        matches is dropped - the attachment changed and has to be fetched again."""
+        row = self.conn.execute(
+            "SELECT file_name, size, pdf_hash FROM attachments WHERE entry_id = ? AND position = ?",
+            (entry_id, position)
+        ).fetchone()
+        if row is None:
+            return None
+        if (row[0], row[1]) != (file_name, size):
+            self.forget(entry_id, position)
+            self.invalidated += 1
+            return None
+        self.hits += 1
+        self.conn.execute(
+            "UPDATE attachments SET last_seen = ? WHERE entry_id = ? AND position = ?",
+            (time.time(), entry_id, position)
+        )
+        self.conn.commit()
+        return row[2]
+
+    def put(self, entry_id, position, file_name, size, pdf_hash):
+        """Remember the content hash of an attachment that was fetched"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO attachments VALUES (?, ?, ?, ?, ?, ?, NULL, NULL)",
+            (entry_id, position, file_name, size, pdf_hash, time.time())
+        )
+        self.conn.commit()
+
+    def archived(self, entry_id, position):
+        """(size, mtime_ns) of the attachment's archived file when it was placed, or None"""
+        row = self.conn.execute(
+            "SELECT archived_size, archived_mtime FROM attachments WHERE entry_id = ? AND position = ?",
+            (entry_id, position)
+        ).fetchone()
+        return (row[0], row[1]) if row and row[0] is not None else None
+
+    def set_archived(self, entry_id, position, size, mtime_ns):
+        """Remember the archived file's size and mtime - a later run checks those instead of hashing it"""
+        self.conn.execute(
+            "UPDATE attachments SET archived_size = ?, archived_mtime = ? WHERE entry_id = ? AND position = ?",
+            (size, mtime_ns, entry_id, position)
+        )
+        self.conn.commit()
+
+    def forget(self, entry_id, position):
+        self.conn.execute(
+            "DELETE FROM attachments WHERE entry_id = ? AND position = ?", (entry_id, position))
+        self.conn.commit()
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
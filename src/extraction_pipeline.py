@@ -0,0 +1,626 @@
+"""
+Extraction pipeline - mail source -> PDFs -> parsed rows -> output store
+Shared by the Eel app and the headless CLI; front-end interaction goes through RunCallbacks
+"""
+
+from datetime import datetime
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from po_extractor import PDFExtractor, update_progress, file_md5
+from parse_pool import ParsePool
+from parse_cache import ParseCache
+from attachment_index import AttachmentIndex
+from pdf_archive import ArchiveWriter, open_archive
+from layout_templates import DEFAULT_TEMPLATE_PATH
+from output_store import DEFAULT_CHUNK_ROWS
+from run_journal import RunJournal
+from run_metrics import RunMetrics
+
+STAGING_FOLDER = ".staging"
+STALE_STAGING_SECONDS = 24 * 3600  # A staging folder untouched this long was left by an interrupted run
+
+
+def make_staging_folder(base_folder):
+    """New staging folder for one run under base_folder/.staging. Runs writing to the same PDFs
+    folder each get their own; only stale leftovers of other runs are removed."""
+    root = os.path.join(base_folder, STAGING_FOLDER)
+    os.makedirs(root, exist_ok=True)
+    cutoff = time.time() - STALE_STAGING_SECONDS
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            if os.path.getmtime(path) >= cutoff:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)  # Staged PDF from before per-run folders
+        except OSError:
+            pass  # Removed by another run meanwhile
+    return tempfile.mkdtemp(prefix="run_", dir=root)
+
+
+class RunCallbacks:
+    """How a run talks to its front end - the GUI asks the user, the CLI decides on its own"""
+
+    def status(self, text):
+        pass
+
+    def progress(self, current, total):
+        pass
+
+    def ask_retry_pdf(self, file_name):
+        """PDF can't be saved (file open?) - True to try again"""
+        return False
+
+    def ask_retry_file(self, output_path, attempt, max_retries):
+        """Output file is locked - True to try again"""
+        return False
+
+
+class ExtractionRun:
+    """One extraction run over a list of messages - EXACT ORIGINAL LOGIC of run_extraction"""
+
+    def __init__(self, settings=None, callbacks=None, extractor=None):
+        self.settings = settings or {}
+        self.callbacks = callbacks or RunCallbacks()
+        self.extractor = extractor or PDFExtractor()
+        self.metrics = RunMetrics()
+
+    def find_messages(self, mail_source, subject_text, start_date, end_date,
+                      sync_state=None, sync_key=None, incremental=False):
+        """Messages matching the filter; incremental runs only return mail newer than the watermark"""
+        if incremental and sync_state:
+            since, _ = sync_state.watermark(sync_key)
+            if since:
+                since_day = datetime(since.year, since.month, since.day)
+                start_date = max(start_date, since_day) if start_date else since_day
+                update_progress(f"Incremental: emails since last run ({since.strftime('%Y-%m-%d %H:%M')})")
+            else:
+                update_progress("Incremental: no previous run for this folder, scanning full range")
+
+        # Filter emails - EXACT ORIGINAL LOGIC
+        update_progress(f"Filtering emails with subject containing: '{subject_text}'")
+        with self.metrics.stage('find_messages'):
+            emails = mail_source.messages(subject_text, start_date, end_date)
+        if incremental and sync_state:
+            emails = sync_state.new_messages(sync_key, emails)
+        # Table sources know how many rows they read; otherwise only the matches are seen
+        self.metrics.count('emails_scanned', getattr(mail_source, 'rows_read', None) or len(emails))
+        self.metrics.count('emails_matched', len(emails))
+        update_progress(f"Found {len(emails)} matching emails")
+        return emails
+
+    def open_parse_cache(self):
+        """Parsed rows of PDFs seen in earlier runs, keyed by content hash (None if disabled)"""
+        if not self.settings.get('parse_cache', True):
+            return None
+        try:
+            return ParseCache(
+                self.settings.get('parse_cache_path'),
+                max_mb=self.settings.get('parse_cache_max_mb', 200),
+                max_age_days=self.settings.get('parse_cache_max_age_days', 90)
+            ).open()
+        except Exception as e:
+            update_progress(f"Warning: Parse cache unavailable: {e}")
+            return None
+
+    def open_attachment_index(self):
+        """Content hashes of attachments seen in earlier runs, by message and position (None if disabled)"""
+        if not self.settings.get('attachment_index', True):
+            return None
+        try:
+            return AttachmentIndex(
+                self.settings.get('attachment_index_path'),
+                max_age_days=self.settings.get('parse_cache_max_age_days', 90)
+            ).open()
+        except Exception as e:
+            update_progress(f"Warning: Attachment index unavailable: {e}")
+            return None
+
+    def open_journal(self):
+        """Journal of the run's finished attachments, for resuming it after a crash (None if disabled)"""
+        if not self.settings.get('run_journal', True):
+            return None
+        try:
+            return RunJournal(self.settings.get('run_journal_path')).open()
+        except Exception as e:
+            update_progress(f"Warning: Run journal unavailable: {e}")
+            return None
+
+    def layout_path(self):
+        """Layout template store the parse workers use (None if disabled)"""
+        if not self.settings.get('layout_templates', True):
+            return None
+        return self.settings.get('layout_templates_path') or DEFAULT_TEMPLATE_PATH
+
+    def last_run(self):
+        """Parameters of the interrupted run the journal can resume, or None"""
+        journal = self.open_journal()
+        if not journal:
+            return None
+        try:
+            return journal.last_run()
+        finally:
+            journal.close()
+
+    def run(self, emails, output_path, params=None, resume=False):
+        """Process the messages' PDFs and write the output. Returns a result dict like
+        {"success": True, "items": n, "pdfs": n} or {"success": False, "error": ...}.
+        The run report is written next to the output either way.
+        params (the front end's run parameters, JSON-serializable) journal the run as it goes; with resume
+        and the same params as the interrupted run, the messages it finished are skipped."""
+        result = {"success": False, "error": "Run did not complete"}
+        journal = self.open_journal() if params is not None else None
+        try:
+            if journal and not (resume and journal.last_run() == params):
+                journal.start(params)
+            result = self._run(emails, output_path, journal)
+            return result
+        finally:
+            if journal:
+                journal.close()
+            self.write_report(output_path, result)
+
+    def write_report(self, output_path, result):
+        """PO_Data.run.json next to the output, plus the Prometheus textfile if configured"""
+        if not self.settings.get('run_report', True):
+            return
+        try:
+            report = self.metrics.write(output_path, result, self.settings.get('run_report_prometheus'))
+            latency = report['parse_latency']
+            if latency['count']:
+                update_progress(f"Parse time per PDF: p50 {latency['p50']:.2f}s, p95 {latency['p95']:.2f}s")
+            update_progress(f"Run report: {self.metrics.path_for(output_path)}")
+        except Exception as e:
+            update_progress(f"Warning: Could not write run report: {e}")
+
+    def _run(self, emails, output_path, journal=None):
+        """Generator pipeline: messages -> saved PDF attachments -> parsed results -> output store.
+        One message's attachments are loaded at a time, the parse pool's queues are bounded and rows
+        are upserted every output_chunk_rows, so memory doesn't grow with the date range."""
+        callbacks = self.callbacks
+        metrics = self.metrics
+        settings = self.settings
+
+        # Setup PDF storage location - EXACT ORIGINAL LOGIC
+        output_dir = os.path.dirname(output_path)
+        pdf_base_folder = os.path.join(output_dir, "PDFs")
+
+        # Attachments are saved once into staging on the archive volume, parsed from there
+        # and renamed into their date folder - no temp copy, no second write
+        write_behind = settings.get('archive_write_behind', False)
+        if write_behind:
+            # Archive on a slow share: stage and parse locally, background threads copy to the share
+            staging_folder = tempfile.mkdtemp(prefix="pdf_extractor_staging_")
+        else:
+            staging_folder = make_staging_folder(pdf_base_folder)
+        # 'dated' moves each PDF into its date folder; 'content' stores it once by hash and links it there
+        archive = open_archive(settings.get('pdf_archive', 'dated'), pdf_base_folder)
+        archive_writer = None
+        archive_failures = []
+        written_behind = []  # pdf dicts handed to the archive writer
+        if write_behind:
+            archive_writer = ArchiveWriter(archive, workers=settings.get('archive_writers', 4),
+                                           retries=settings.get('archive_retries', 5)).start()
+
+        # Process PDFs with deduplication - EXACT ORIGINAL LOGIC
+        pdf_count = 0
+        row_count = 0
+        processed_pdfs = set()  # Track unique PDFs by hash
+
+        # Rows go to the output store in chunks as they're parsed; the file is exported at the end
+        write_stats = {'seconds': {}}
+        writer = self.extractor.open_output(output_path, settings.get('output_chunk_rows', DEFAULT_CHUNK_ROWS),
+                                            stats=write_stats)
+
+        # Messages still being worked on -> PDFs not yet collected (journal only)
+        open_messages = {}
+        staging_id = None  # Message whose attachments are being saved
+        if journal:
+            # Resumed run: carry over what the interrupted run finished
+            processed_pdfs |= journal.seen_hashes()
+            pdf_count, row_count = journal.totals()
+            if pdf_count:
+                update_progress(f"Resuming run: {pdf_count} PDFs with {row_count} line items already done")
+            # Rows that hadn't reached the output store yet (upserts are keyed, so repeats are harmless)
+            for rows in journal.unstored_rows():
+                writer.add(rows)
+
+        parse_cache = self.open_parse_cache()
+        attachment_index = self.open_attachment_index()
+
+        # Parsing runs in worker processes; this (COM) thread only saves and queues attachments
+        parse_pool = ParsePool(workers=settings.get('parse_workers'), layout_path=self.layout_path()).start()
+
+        def message_done(entry_id, collected=0):
+            """Count off collected PDFs - journal the message once it's staged and all of them are done"""
+            if not journal:
+                return
+            left = open_messages.get(entry_id, 0) - collected
+            if left or entry_id == staging_id:
+                open_messages[entry_id] = left
+                return
+            open_messages.pop(entry_id, None)
+            journal.record_message(entry_id)
+
+        def place_pdf(pdf):
+            if archive_writer:
+                # Blocks only while the writer's queue is full; failures are reported at the end
+                with metrics.stage('archive_queue'):
+                    archive_writer.submit(pdf['staged'], pdf['hash'], pdf['date_folder'], pdf['name'],
+                                          pdf['entry_id'])
+                written_behind.append(pdf)
+                return
+            with metrics.stage('archive'):
+                _place_pdf(pdf)
+            remember_archived(pdf)
+
+        def remember_archived(pdf):
+            """Index the placed file's size and mtime, so a later run can tell it's unchanged without reading it"""
+            if not attachment_index:
+                return
+            placed = archive.placed_stat(pdf['hash'], pdf['date_folder'], pdf['name'])
+            if placed:
+                try:
+                    attachment_index.set_archived(pdf['entry_id'], pdf['index'], *placed)
+                except Exception as e:
+                    update_progress(f"  Warning: Could not index attachment: {e}")
+
+        def _place_pdf(pdf):
+            """Move a staged PDF into the archive with retry on permission error - EXACT ORIGINAL LOGIC"""
+            for pdf_attempt in range(3):  # Try up to 3 times for PDF saves
+                try:
+                    saved = archive.place(pdf['staged'], pdf['hash'], pdf['date_folder'], pdf['name'],
+                                          pdf['entry_id'])
+                    update_progress(f"  Saved to: {saved}")
+                    return
+                except PermissionError:
+                    if pdf_attempt < 2:
+                        # Send retry request to UI
+                        if not callbacks.ask_retry_pdf(pdf['name']):
+                            update_progress(f"  User cancelled PDF save for: {pdf['name']}")
+                            break
+                    else:
+                        update_progress(f"  ERROR: Could not save PDF after 3 attempts: {pdf['name']}")
+                        break
+                except Exception as e:
+                    update_progress(f"  Warning: Could not save PDF: {e}")
+                    break
+            try:
+                os.remove(pdf['staged'])
+            except:
+                pass
+
+        def report_archive_writes():
+            """One summary of the background archive writes instead of a message per file"""
+            update_progress(f"PDF archive: {archive_writer.placed} written in the background, "
+                            f"{archive_writer.retried} retries")
+            metrics.count('archive_retries', archive_writer.retried)
+            metrics.count('archive_failures', len(archive_failures))
+            if archive_failures:
+                update_progress(f"  ERROR: {len(archive_failures)} PDFs could not be saved to {pdf_base_folder}:")
+                for path, error in archive_failures[:20]:
+                    update_progress(f"    {path}: {error}")
+                if len(archive_failures) > 20:
+                    update_progress(f"    ... and {len(archive_failures) - 20} more")
+
+        def known_pdf(entry_id, index, attachment, date_folder):
+            """pdf dict with the stored rows for an attachment the index knows - if its archived copy
+            and parse result are still there, so its bytes needn't be fetched. Otherwise None."""
+            if not attachment_index or not parse_cache:
+                return None
+            try:
+                with metrics.stage('attachment_index'):
+                    size = attachment.size
+                    pdf_hash = attachment_index.lookup(entry_id, index, attachment.file_name, size) \
+                        if size is not None else None
+                if pdf_hash is None:
+                    return None
+                # Size and mtime recorded at placement spare reading the archived file back
+                archived = attachment_index.archived(entry_id, index)
+                if not archive.contains(pdf_hash, date_folder, attachment.file_name, archived):
+                    return None
+                if archived is None:
+                    # Hashed once - indexed before placements were recorded
+                    current = archive.file_stat(date_folder, attachment.file_name)
+                    if current:
+                        attachment_index.set_archived(entry_id, index, *current)
+                with metrics.stage('cache_lookup'):
+                    rows = parse_cache.get(pdf_hash, attachment.file_name)
+            except Exception as e:
+                update_progress(f"  Warning: Attachment index lookup failed: {e}")
+                return None
+            if rows is None:
+                return None
+            metrics.count('attachments_indexed')
+            return {'hash': pdf_hash, 'name': attachment.file_name, 'staged': None,
+                    'date_folder': date_folder, 'entry_id': entry_id, 'index': index, 'rows': rows}
+
+        def remember_attachment(entry_id, index, attachment, pdf_hash):
+            """Index a fetched attachment's content hash by its metadata for later runs"""
+            if not attachment_index:
+                return
+            try:
+                size = attachment.size
+                if size is not None:
+                    attachment_index.put(entry_id, index, attachment.file_name, size, pdf_hash)
+            except Exception as e:
+                update_progress(f"  Warning: Could not index attachment: {e}")
+
+        def staged_pdfs():
+            """Save each message's new PDF attachments into staging. Yields a pdf dict per PDF and
+            None after each message; the message's attachments are released once it's done."""
+            nonlocal pdf_count, staging_id
+            for idx, email in enumerate(emails, 1):
+                update_progress(f"\n[{idx}/{len(emails)}] Processing: {email.subject}")
+                callbacks.status(f"Processing email {idx}/{len(emails)}...")
+                callbacks.progress(idx, len(emails))
+                if journal and journal.is_message_done(email.entry_id):
+                    update_progress("  Already done (resumed run)")
+                    metrics.count('emails_resumed')
+                    continue
+                metrics.count('emails_processed')
+                done_attachments = journal.done_attachments(email.entry_id) if journal else set()
+                staging_id = email.entry_id
+
+                # Get email date for folder organization
+                email_date = email.received_time
+                date_folder = datetime(email_date.year, email_date.month, email_date.day).strftime("%Y-%m-%d")
+                pdf_save_folder = os.path.join(pdf_base_folder, date_folder)
+
+                # Create folder if it doesn't exist
+                os.makedirs(pdf_save_folder, exist_ok=True)
+
+                # Extract PDFs from attachments
+                with metrics.stage('load_attachments'):
+                    attachments = email.attachments
+                for index, attachment in enumerate(attachments):
+                    if index in done_attachments:
+                        continue
+                    if attachment.file_name.lower().endswith('.pdf'):
+                        pdf = known_pdf(email.entry_id, index, attachment, date_folder)
+                        if pdf is not None:
+                            # Seen in an earlier run and already archived - nothing to fetch
+                            if pdf['hash'] in processed_pdfs:
+                                update_progress(f"  Skipping duplicate: {attachment.file_name}")
+                                metrics.count('duplicates_skipped')
+                                if journal:
+                                    journal.record_attachment(email.entry_id, index, None, attachment.file_name, [])
+                                continue
+                            processed_pdfs.add(pdf['hash'])
+                            pdf_count += 1
+                            metrics.count('pdfs_found')
+                            update_progress(f"  Found PDF: {attachment.file_name} (known, not downloaded)")
+                            try:
+                                # The content archive may hold the PDF without this date's view
+                                archive.add_view(pdf['hash'], date_folder, attachment.file_name, email.entry_id)
+                            except Exception as e:
+                                update_progress(f"  Warning: Could not save PDF: {e}")
+                            open_messages[email.entry_id] = open_messages.get(email.entry_id, 0) + 1
+                            yield pdf
+                            continue
+
+                        # Save straight into staging (unique name - attachment names collide)
+                        staged_pdf = os.path.join(staging_folder, f"{uuid.uuid4().hex}.pdf")
+                        with metrics.stage('save_attachment'):
+                            attachment.save_as(staged_pdf)
+                        metrics.count('attachments_saved')
+
+                        # Calculate PDF hash for deduplication (streamed, not read into memory)
+                        try:
+                            with metrics.stage('hash'):
+                                pdf_hash = file_md5(staged_pdf)
+                            remember_attachment(email.entry_id, index, attachment, pdf_hash)
+
+                            # Check if already processed
+                            if pdf_hash in processed_pdfs:
+                                update_progress(f"  Skipping duplicate: {attachment.file_name}")
+                                metrics.count('duplicates_skipped')
+                                if journal:
+                                    journal.record_attachment(email.entry_id, index, None, attachment.file_name, [])
+                                try:
+                                    os.remove(staged_pdf)
+                                except:
+                                    pass
+                                continue
+
+                            # Mark as processed
+                            processed_pdfs.add(pdf_hash)
+                            pdf_count += 1
+                            metrics.count('pdfs_found')
+                            update_progress(f"  Found PDF: {attachment.file_name}")
+                        except Exception as e:
+                            update_progress(f"  Error processing {attachment.file_name}: {e}")
+                            try:
+                                os.remove(staged_pdf)
+                            except:
+                                pass
+                            continue
+
+                        open_messages[email.entry_id] = open_messages.get(email.entry_id, 0) + 1
+                        yield {
+                            'hash': pdf_hash,
+                            'name': attachment.file_name,
+                            'staged': staged_pdf,
+                            'date_folder': date_folder,
+                            'entry_id': email.entry_id,
+                            'index': index
+                        }
+                email.release()
+                attachments = None
+                staging_id = None
+                message_done(email.entry_id)
+                yield None
+
+        def parsed_results(pdfs):
+            """Reuse cached rows or queue each PDF for parsing (blocks while the parse queue is full).
+            Yields (pdf_name, data, messages, pdf, stats) in message order as results are ready."""
+            for pdf in pdfs:
+                if pdf is None:
+                    # Message done - hand on PDFs the workers have already finished
+                    yield from parse_pool.ready_results()
+                    continue
+                if 'rows' in pdf:
+                    # Known attachment - rows from the parse cache, file already archived
+                    update_progress(f"    Cached: {len(pdf['rows'])} line items")
+                    metrics.count('cache_hits')
+                    parse_pool.add_result(pdf['name'], pdf.pop('rows'), tag=dict(pdf, placed=True))
+                    continue
+                try:
+                    # Reuse rows from an earlier run, otherwise queue for parsing
+                    with metrics.stage('cache_lookup'):
+                        cached = parse_cache.get(pdf['hash'], pdf['name']) if parse_cache else None
+                    if cached is not None:
+                        update_progress(f"    Cached: {len(cached)} line items")
+                        metrics.count('cache_hits')
+                        place_pdf(pdf)
+                        parse_pool.add_result(pdf['name'], cached, tag=dict(pdf, placed=True))
+                    else:
+                        # Take finished results first if the workers are full - submit would wait forever
+                        yield from waited(parse_pool.make_room())
+                        # Workers read the staged file; it's archived once they're done
+                        # (in-process parsing and a full queue both show up as queue_parse)
+                        with metrics.stage('queue_parse'):
+                            parse_pool.submit(pdf['staged'], pdf['name'], tag=pdf)
+                except Exception as e:
+                    update_progress(f"  Error processing {pdf['name']}: {e}")
+                    try:
+                        os.remove(pdf['staged'])
+                    except:
+                        pass
+                    message_done(pdf['entry_id'], collected=1)
+
+            # Wait for the remaining PDFs
+            update_progress("\nWaiting for PDF parsing to finish...")
+            yield from waited(parse_pool.finish())
+
+        def waited(results):
+            """Yield results, counting the time spent blocked on the workers as parse_wait"""
+            results = iter(results)
+            while True:
+                with metrics.stage('parse_wait'):
+                    entry = next(results, None)
+                if entry is None:
+                    return
+                yield entry
+
+        try:
+            try:
+                # Log and store parsed PDFs in email order, caching fresh parses and archiving the files
+                for pdf_name, data, messages, pdf, stats in parsed_results(staged_pdfs()):
+                    for message in messages:
+                        update_progress(message)
+                    row_count += len(data)
+                    chunks = writer.chunks
+                    with metrics.stage('write_output'):
+                        writer.add(data)
+                    if stats:
+                        metrics.add_parse(pdf_name, len(data), stats)
+                    if not pdf:
+                        continue
+                    if journal:
+                        with metrics.stage('journal'):
+                            journal.record_attachment(pdf['entry_id'], pdf['index'], pdf['hash'], pdf_name, data)
+                            if writer.chunks != chunks:
+                                # That chunk held every journaled row
+                                journal.mark_stored()
+                        message_done(pdf['entry_id'], collected=1)
+                    if pdf.get('placed'):
+                        continue  # Cache hit - already archived
+                    # Don't cache failed parses - they'd never be retried
+                    if parse_cache and not any('error' in m.lower() for m in messages):
+                        try:
+                            with metrics.stage('cache_store'):
+                                parse_cache.put(pdf['hash'], data)
+                        except Exception as e:
+                            update_progress(f"  Warning: Could not cache parse result: {e}")
+                    # The worker is done with the staged file - move it into the archive
+                    place_pdf(pdf)
+            finally:
+                parse_pool.close()
+                if archive_writer:
+                    update_progress("Waiting for PDFs to be written to the archive...")
+                    with metrics.stage('archive_wait'):
+                        archive_failures = archive_writer.finish()
+                    report_archive_writes()
+                    for pdf in written_behind:
+                        remember_archived(pdf)
+                shutil.rmtree(staging_folder, ignore_errors=True)
+                if archive.deduplicated:
+                    update_progress(f"PDF archive: {archive.stored} stored, {archive.deduplicated} already stored")
+                metrics.count('archive_stored', archive.stored)
+                metrics.count('archive_deduplicated', archive.deduplicated)
+                archive.close()
+                if parse_cache:
+                    update_progress(f"Parse cache: {parse_cache.hits} hits, {parse_cache.misses} parsed")
+                    parse_cache.close()
+                if attachment_index:
+                    update_progress(f"Attachment index: {attachment_index.hits} known attachments, "
+                                    f"{attachment_index.invalidated} changed since indexed")
+                    attachment_index.close()
+
+            # Write to file (Excel or CSV) with retry on permission error - EXACT ORIGINAL LOGIC
+            # (rows of full chunks are already in the store - a retry only redoes the export)
+            update_progress(f"\nWriting {row_count} line items to file...")
+            metrics.count('rows_extracted', row_count)
+            max_retries = 5
+            for attempt in range(max_retries):
+                try:
+                    with metrics.stage('write_output'):
+                        if row_count:
+                            # (a resumed run may have nothing left to add - finish_output still exports)
+                            self.extractor.finish_output(writer, export=settings.get('output_export', 'auto') != 'skip')
+                        else:
+                            update_progress("Warning: No data to write")
+                    break  # Success, exit retry loop
+                except PermissionError:
+                    if attempt < max_retries - 1:
+                        # Ask user to retry
+                        if not callbacks.ask_retry_file(output_path, attempt + 2, max_retries):
+                            update_progress("User cancelled file write operation")
+                            return {"success": False, "error": "User cancelled file write", "cancelled": True}
+                        else:
+                            update_progress(f"Retrying file write (attempt {attempt + 2}/{max_retries})...")
+                    else:
+                        # Max retries reached
+                        update_progress("ERROR: Max retries reached, file could not be written")
+                        return {"success": False, "error": "Could not write file after multiple attempts"}
+            if journal:
+                journal.finish()
+        finally:
+            writer.close()
+            for name, seconds in write_stats.pop('seconds').items():
+                metrics.stages[f'write_{name}'] = seconds
+            for name, value in write_stats.items():
+                metrics.count(name, value)
+            metrics.count('output_chunks', writer.chunks)
+
+        update_progress(f"\n{'='*60}")
+        update_progress(f"SUCCESS! Extracted {pdf_count} PDFs with {row_count} line items")
+        update_progress(f"Output saved to: {output_path}")
+        update_progress(f"PDFs saved to: {pdf_base_folder}")
+        update_progress(f"{'='*60}")
+
+        callbacks.status(f"Complete! {row_count} items extracted")
+        result = {"success": True, "items": row_count, "pdfs": pdf_count}
+        if archive_failures:
+            result["archive_failures"] = len(archive_failures)
+        return result
+
+    def finish_sync(self, sync_state, sync_key, emails, incremental, start_date=None):
+        """Output is safely written - move the folder's watermark forward. A non-incremental run
+        only moves it if it started at or before the watermark: one with a later start date
+        skipped the mail in between, which the next incremental run still has to pick up."""
+        since, _ = sync_state.watermark(sync_key)
+        if not incremental and start_date and (since is None or start_date > since):
+            return
+        try:
+            sync_state.advance(sync_key, emails)
+            sync_state.save()
+        except Exception as e:
+            update_progress(f"Warning: Could not save sync state: {e}")
@@ -0,0 +1,139 @@
+"""
+Layout templates - page geometry learned from POs of a known layout
+POs come from a handful of ERP templates. A template is keyed by the positions of the label words
+on page 1 and holds the line-item table's column boundaries and the address boxes, so later POs
+of the same layout are read from their words without table detection.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from po_extractor import LINE_NUMBER, parser_fingerprint, update_progress
+
+DEFAULT_TEMPLATE_PATH = os.path.join(os.path.expanduser("~"), ".pdf_extractor_layouts.sqlite")
+
+# Bump when the fingerprint or the template contents change meaning
+LAYOUT_VERSION = "1"
+
+# Words the parsers anchor on - their positions identify the layout
+LAYOUT_LABELS = ('Ship', 'Payment', 'Ordering', 'Supplier', 'Contact', 'Buyer', 'Line', 'Part')
+
+MAX_TEMPLATES = 500
+
+
+def layout_fingerprint(page):
+    """(fingerprint, scan bottom) of a first page: page size plus text and position of every label word
+    before the first line number. Anchors a template keeps must lie above the scan bottom."""
+    labels = []
+    bottom = page.page.bbox[3]
+    for word in page.words:
+        if LINE_NUMBER.match(word['text']):
+            bottom = word['top']
+            break
+        if any(label in word['text'] for label in LAYOUT_LABELS):
+            labels.append((word['text'], round(word['x0'], 2), round(word['top'], 2)))
+    key = json.dumps([round(page.page.width, 2), round(page.page.height, 2), labels])
+    return hashlib.sha1(key.encode()).hexdigest()[:20], bottom
+
+
+def header_columns(page):
+    """x boundaries of the table whose first row is the Line/Part header, or None"""
+    for table in page.page.find_tables():
+        cells = table.rows[0].cells
+        if len(table.rows) < 2 or None in cells:
+            continue  # Merged header cells - no clean column boundaries
+        header = ' '.join(cell for cell in table.extract()[0] if cell)
+        if 'Line' in header and 'Part' in header:
+            return [cell[0] for cell in cells] + [cells[-1][2]]
+    return None
+
+
+class LayoutTemplates:
+    """SQLite map of layout fingerprint -> template, read and written by the parse workers
+
+    A template is a plain dict: {'layout': 'tables' or 'text', 'columns': [x, ...],
+    'ship_to': [label top, stop top], 'ordering_office': [label top, stop top]}.
+    {'layout': None} marks a layout that didn't reproduce its full parse - it isn't learned again.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_TEMPLATE_PATH
+        self.version = f"{LAYOUT_VERSION}-{parser_fingerprint()}"
+        self.conn = None
+        self.templates = {}  # fingerprint -> template, for this process
+
+    def open(self):
+        """Open (or create) the store and drop templates of other parser versions"""
+        # Workers write concurrently (rarely) - wait for the lock instead of failing
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS layout_templates (
+                fingerprint TEXT NOT NULL,
+                parser_version TEXT NOT NULL,
+                template TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (fingerprint, parser_version)
+            )
+        """)
+        self.prune()
+        return self
+
+    def get(self, fingerprint):
+        """Template for this fingerprint, or None if the layout hasn't been seen"""
+        if fingerprint not in self.templates:
+            row = self.conn.execute(
+                "SELECT template FROM layout_templates WHERE fingerprint = ? AND parser_version = ?",
+                (fingerprint, self.version)
+            ).fetchone()
+            if row is None:
+                return None  # Not cached - another worker may learn it meanwhile
+            self.templates[fingerprint] = json.loads(row[0])
+        return self.templates[fingerprint]
+
+    def put(self, fingerprint, template):
+        """Store a learned template - the first one stored for a layout wins"""
+        self.conn.execute(
+            "INSERT OR IGNORE INTO layout_templates VALUES (?, ?, ?, ?)",
+            (fingerprint, self.version, json.dumps(template), time.time())
+        )
+        self.conn.commit()
+        self.templates[fingerprint] = template
+
+    def prune(self):
+        """Drop templates from other parser versions, then the oldest over MAX_TEMPLATES"""
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM layout_templates WHERE parser_version != ?", (self.version,))
+        removed = cur.rowcount
+        cur.execute("""
+            DELETE FROM layout_templates WHERE fingerprint NOT IN (
+                SELECT fingerprint FROM layout_templates ORDER BY created DESC LIMIT ?
+            )
+        """, (MAX_TEMPLATES,))
+        removed += cur.rowcount
+        self.conn.commit()
+        if removed:
+            update_progress(f"Layout templates: removed {removed} stale templates")
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+
+# One store per process and path - parse workers keep it open across jobs
+_shared = {}
+
+
+def shared_templates(path=None):
+    """The process's open LayoutTemplates for path (None if it can't be opened)"""
+    path = path or DEFAULT_TEMPLATE_PATH
+    if path not in _shared:
+        try:
+            _shared[path] = LayoutTemplates(path).open()
+        except Exception as e:
+            update_progress(f"Warning: Layout templates unavailable: {e}")
+            _shared[path] = None
+    return _shared[path]
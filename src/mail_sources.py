@@ -0,0 +1,404 @@
+"""
+Mail sources - where the emails and their PDF attachments come from
+The extraction pipeline only sees MailMessage / MailAttachment records, never raw COM objects
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import email.policy
+from email.parser import BytesHeaderParser, BytesParser
+import io
+import mailbox
+import os
+import shutil
+
+from po_extractor import PDFExtractor, update_progress
+
+OL_MAIL = 43  # Item.Class for mail items
+OL_USER_ITEMS = 0  # Folder.GetTable table contents
+HAS_ATTACHMENT = "urn:schemas:httpmail:hasattachment"
+
+# Table columns, in the order rows come back from GetArray
+TABLE_COLUMNS = ("EntryID", "Subject", "ReceivedTime", "MessageClass", HAS_ATTACHMENT)
+
+COPY_CHUNK = 1024 * 1024
+
+
+class MailAttachment:
+    """One attachment - file name plus a way to save (or stream) its bytes"""
+
+    def __init__(self, file_name, save_as=None, index=None, open_stream=None, size=None):
+        self.file_name = file_name
+        self.index = index  # 1-based position in the message
+        self._save_as = save_as
+        self._open_stream = open_stream
+        self._size = size  # Bytes, or a callable returning them - read without fetching the content
+
+    @property
+    def size(self):
+        """Size from the message's metadata (None if unknown) - identifies the attachment with its name"""
+        if callable(self._size):
+            self._size = self._size()
+        return self._size
+
+    def open(self):
+        """Readable binary stream of the attachment"""
+        if self._open_stream is None:
+            raise NotImplementedError(f"{self.file_name} can only be saved to a file")
+        return self._open_stream()
+
+    def save_as(self, path):
+        """Write the attachment to path"""
+        if self._save_as is not None:
+            self._save_as(path)
+            return
+        with self.open() as source, open(path, 'wb') as target:
+            shutil.copyfileobj(source, target, COPY_CHUNK)
+
+
+class MailMessage:
+    """One email - attachments are only loaded when first accessed"""
+
+    def __init__(self, entry_id, subject, received_time, load_attachments):
+        self.entry_id = entry_id
+        self.subject = subject
+        self.received_time = received_time
+        self._load_attachments = load_attachments
+        self._attachments = None
+
+    @property
+    def attachments(self):
+        if self._attachments is None:
+            self._attachments = list(self._load_attachments())
+        return self._attachments
+
+    def release(self):
+        """Drop the loaded attachments (COM objects, decoded parts) - they're loaded again if needed"""
+        self._attachments = None
+
+
+def com_attachments(item):
+    """Wrap a COM MailItem's attachments"""
+    for attachment in item.Attachments:
+        yield MailAttachment(attachment.FileName, attachment.SaveAsFile, attachment.Index,
+                             size=lambda attachment=attachment: attachment.Size)
+
+
+class MailSource:
+    """Yields the messages of one folder that match the subject/date filter, newest first
+
+    Backends: Outlook (items or GetTable), a folder of PDFs, a folder of .eml files, an mbox,
+    and an in-memory stand-in. Each message has an ID, subject, received time and attachments
+    that can be saved to a file or opened as a stream.
+    """
+
+    def messages(self, subject_text, start_date, end_date):
+        raise NotImplementedError
+
+    def close(self):
+        """Release anything held open for loading attachments later"""
+        pass
+
+
+class OutlookItemsSource(MailSource):
+    """Walks folder items over COM - one round-trip per property (original behaviour)
+
+    With the namespace, messages keep only the EntryID and the item is opened again for its
+    attachments, so a long date range doesn't hold every MailItem.
+    """
+
+    def __init__(self, folder, extractor=None, namespace=None):
+        self.folder = folder
+        self.extractor = extractor or PDFExtractor()
+        self.namespace = namespace
+
+    def messages(self, subject_text, start_date, end_date):
+        messages = []
+        for item in self.extractor.iter_matching_emails(self.folder, subject_text, start_date, end_date):
+            if self.namespace is not None:
+                load = lambda entry_id=item.EntryID: self.open_attachments(entry_id)
+            else:
+                load = lambda item=item: com_attachments(item)
+            messages.append(MailMessage(item.EntryID, item.Subject, item.ReceivedTime, load))
+        return messages
+
+    def open_attachments(self, entry_id):
+        item = self.namespace.GetItemFromID(entry_id, self.folder.StoreID)
+        return com_attachments(item)
+
+
+class TableMailSource(MailSource):
+    """Reads message metadata as batched rows and opens full messages only for candidates
+
+    Subclasses supply the rows (fetch_batches) and the attachments (open_attachments).
+    """
+
+    def __init__(self, batch_size=250, extractor=None):
+        self.batch_size = batch_size
+        self.extractor = extractor or PDFExtractor()
+        self.rows_read = 0
+        self.batches_read = 0
+
+    def fetch_batches(self, restriction):
+        """Yield lists of row dicts keyed by TABLE_COLUMNS, newest first"""
+        raise NotImplementedError
+
+    def open_attachments(self, entry_id):
+        """Yield MailAttachment records for one message"""
+        raise NotImplementedError
+
+    def messages(self, subject_text, start_date, end_date):
+        restriction = self.extractor.build_restrict_filter(subject_text, start_date, end_date)
+        messages = []
+        for batch in self.fetch_batches(restriction):
+            self.batches_read += 1
+            for row in batch:
+                self.rows_read += 1
+                # The restriction is a superset - verify each row like filter_emails does
+                if not str(row["MessageClass"] or "").startswith("IPM.Note"):
+                    continue
+                if not row[HAS_ATTACHMENT]:
+                    continue
+                if not self.extractor.email_matches(row["Subject"], row["ReceivedTime"],
+                                                    subject_text, start_date, end_date):
+                    continue
+                entry_id = row["EntryID"]
+                messages.append(MailMessage(
+                    entry_id, row["Subject"], row["ReceivedTime"],
+                    lambda entry_id=entry_id: self.open_attachments(entry_id)
+                ))
+        return messages
+
+
+class OutlookTableSource(TableMailSource):
+    """Folder.GetTable rows fetched with GetArray - a few COM calls per batch instead of per item"""
+
+    def __init__(self, namespace, folder, batch_size=250, extractor=None):
+        super().__init__(batch_size, extractor)
+        self.namespace = namespace
+        self.folder = folder
+
+    def fetch_batches(self, restriction):
+        table = self.folder.GetTable(restriction, OL_USER_ITEMS)
+        table.Columns.RemoveAll()
+        for column in TABLE_COLUMNS:
+            table.Columns.Add(column)
+        table.Sort("[ReceivedTime]", True)
+        while not table.EndOfTable:
+            rows = table.GetArray(self.batch_size)
+            if not rows:
+                break
+            yield [dict(zip(TABLE_COLUMNS, row)) for row in rows]
+
+    def open_attachments(self, entry_id):
+        item = self.namespace.GetItemFromID(entry_id, self.folder.StoreID)
+        return com_attachments(item)
+
+    def messages(self, subject_text, start_date, end_date):
+        try:
+            return super().messages(subject_text, start_date, end_date)
+        except Exception as e:
+            update_progress(f"Warning: Outlook table read failed, scanning items instead: {e}")
+            return OutlookItemsSource(self.folder, self.extractor, self.namespace).messages(
+                subject_text, start_date, end_date)
+
+
+class InMemoryMailSource(TableMailSource):
+    """Stand-in for Outlook - rows and attachment bytes held in memory
+
+    messages: dicts with entry_id, subject, received_time, attachments ({file_name: bytes}),
+    and optionally message_class (default IPM.Note).
+    """
+
+    def __init__(self, messages, batch_size=250, extractor=None):
+        super().__init__(batch_size, extractor)
+        self.store = {m['entry_id']: m for m in messages}
+        self.opened = []  # entry IDs whose attachments were read
+
+    def add(self, message):
+        """Deliver a new message (same dict shape as the constructor's) - e.g. for watch mode"""
+        self.store[message['entry_id']] = message
+
+    def fetch_batches(self, restriction):
+        self.restriction = restriction
+        ordered = sorted(self.store.values(), key=lambda m: m['received_time'], reverse=True)
+        rows = [{
+            "EntryID": m['entry_id'],
+            "Subject": m['subject'],
+            "ReceivedTime": m['received_time'],
+            "MessageClass": m.get('message_class', "IPM.Note"),
+            HAS_ATTACHMENT: bool(m.get('attachments')),
+        } for m in ordered]
+        for start in range(0, len(rows), self.batch_size):
+            yield rows[start:start + self.batch_size]
+
+    def open_attachments(self, entry_id):
+        self.opened.append(entry_id)
+        for index, (file_name, data) in enumerate(self.store[entry_id].get('attachments', {}).items(), 1):
+            yield MailAttachment(file_name, index=index, open_stream=lambda data=data: io.BytesIO(data),
+                                 size=len(data))
+
+
+class LocalMailSource(MailSource):
+    """Mail replayed from local files - metadata of all files is read in parallel
+
+    Subclasses list the files (paths) and turn one file into MailMessage records (read_file).
+    """
+
+    def __init__(self, location, workers=None, extractor=None):
+        self.location = location
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 4)  # Disk bound, not CPU bound
+        self.extractor = extractor or PDFExtractor()
+
+    def paths(self):
+        raise NotImplementedError
+
+    def read_file(self, path):
+        """MailMessage records in one file"""
+        raise NotImplementedError
+
+    def messages(self, subject_text, start_date, end_date):
+        paths = self.paths()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            found = [m for messages in pool.map(self._read_file_safe, paths) for m in messages]
+        messages = [m for m in found
+                    if self.extractor.email_matches(m.subject, m.received_time, subject_text, start_date, end_date)]
+        messages.sort(key=lambda m: m.received_time, reverse=True)
+        return messages
+
+    def _read_file_safe(self, path):
+        try:
+            return self.read_file(path)
+        except Exception as e:
+            update_progress(f"  Warning: Could not read {path}: {e}")
+            return []
+
+    def walk(self, extensions):
+        """Files under the location with one of the extensions, in name order"""
+        paths = []
+        for root, _, files in os.walk(self.location):
+            for file_name in sorted(files):
+                if file_name.lower().endswith(extensions):
+                    paths.append(os.path.join(root, file_name))
+        return paths
+
+
+class PdfDirectorySource(LocalMailSource):
+    """A folder of PDFs replayed as mail - one message per file, subject is the file name,
+    received time is the file's modification time"""
+
+    def paths(self):
+        return self.walk(('.pdf',))
+
+    def read_file(self, path):
+        file_name = os.path.basename(path)
+        received = datetime.fromtimestamp(os.path.getmtime(path))
+        attachment = MailAttachment(
+            file_name, lambda target: shutil.copyfile(path, target), 1,
+            open_stream=lambda: open(path, 'rb'), size=lambda: os.path.getsize(path)
+        )
+        return [MailMessage(os.path.relpath(path, self.location), file_name, received, lambda: [attachment])]
+
+
+class EmlDirectorySource(LocalMailSource):
+    """A folder of saved .eml messages - headers are read up front, bodies when attachments are needed"""
+
+    def paths(self):
+        return self.walk(('.eml',))
+
+    def read_file(self, path):
+        with open(path, 'rb') as f:
+            headers = BytesHeaderParser(policy=email.policy.default).parse(f)
+        return [MailMessage(
+            str(headers['Message-ID'] or os.path.relpath(path, self.location)),
+            str(headers['Subject'] or ""),
+            message_time(headers, path),
+            lambda: email_attachments(_parse_file(path))
+        )]
+
+
+class MboxSource(LocalMailSource):
+    """An mbox file (or a folder of them) - each file is one sequential read, files are read in parallel.
+    Only headers are kept; a message body is read back from the file when its attachments are needed."""
+
+    def __init__(self, location, workers=None, extractor=None):
+        super().__init__(location, workers, extractor)
+        self.boxes = {}  # path -> open mailbox.mbox, indexed once
+
+    def paths(self):
+        if os.path.isfile(self.location):
+            return [self.location]
+        return self.walk(('.mbox', '.mbx'))
+
+    def read_file(self, path):
+        box = mailbox.mbox(path, create=False)
+        self.boxes[path] = box
+        messages = []
+        for key in box.keys():
+            headers = BytesHeaderParser(policy=email.policy.default).parsebytes(box.get_bytes(key))
+            # Message-ID if there is one - mbox keys change when the file is rewritten
+            entry_id = str(headers['Message-ID'] or f"{os.path.basename(path)}#{key}")
+            messages.append(MailMessage(
+                entry_id, str(headers['Subject'] or ""), message_time(headers, path),
+                lambda path=path, key=key: email_attachments(
+                    BytesParser(policy=email.policy.default).parsebytes(self.boxes[path].get_bytes(key)))
+            ))
+        return messages
+
+    def close(self):
+        for box in self.boxes.values():
+            box.close()
+        self.boxes = {}
+
+
+def _parse_file(path):
+    with open(path, 'rb') as f:
+        return BytesParser(policy=email.policy.default).parse(f)
+
+
+def message_time(headers, path):
+    """Date header as local wall-clock time (like Outlook's ReceivedTime), else the file's mtime"""
+    try:
+        value = headers['Date'].datetime
+        if value.tzinfo is not None:
+            value = value.astimezone().replace(tzinfo=None)
+        return value
+    except Exception:
+        return datetime.fromtimestamp(os.path.getmtime(path))
+
+
+def email_attachments(message):
+    """Wrap the attachments of a parsed email.message.EmailMessage"""
+    for index, part in enumerate(message.iter_attachments(), 1):
+        file_name = part.get_filename()
+        if not file_name:
+            continue
+        yield MailAttachment(
+            file_name, index=index,
+            open_stream=lambda part=part: io.BytesIO(part.get_payload(decode=True) or b""),
+            size=lambda part=part: len(part.get_payload())  # Encoded size - no decoding needed
+        )
+
+
+# Local backends by name - the CLI's --source values
+LOCAL_SOURCES = {
+    'pdf-dir': PdfDirectorySource,
+    'eml-dir': EmlDirectorySource,
+    'mbox': MboxSource,
+}
+
+
+def open_local_source(kind, location, workers=None):
+    """Mail source for local files - kind is one of LOCAL_SOURCES"""
+    if kind not in LOCAL_SOURCES:
+        raise ValueError(f"Unknown mail source '{kind}' (use one of: {', '.join(LOCAL_SOURCES)})")
+    if not os.path.exists(location):
+        raise FileNotFoundError(f"Mail source not found: {location}")
+    return LOCAL_SOURCES[kind](location, workers)
+
+
+def open_outlook_source(namespace, folder, mode="table", batch_size=250):
+    """Mail source for an Outlook folder - 'table' (batched metadata) or 'items' (per-item COM)"""
+    if mode == "items":
+        return OutlookItemsSource(folder, namespace=namespace)
+    return OutlookTableSource(namespace, folder, batch_size)
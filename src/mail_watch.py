@@ -0,0 +1,140 @@
+"""
+Mail watch - hands new messages in a folder to the pipeline within seconds of their arrival
+New messages are always found by polling from the folder's sync watermark, so the folder is never
+rescanned. Outlook's Items.ItemAdd event only makes the next poll happen right away.
+"""
+
+from datetime import datetime
+import queue
+import threading
+import time
+
+from po_extractor import PDFExtractor, update_progress
+
+
+class MailWatcher:
+    """Polls a mail source for matching messages newer than the folder's watermark
+
+    The caller processes each batch and then advances the watermark (SyncState.advance), so a
+    batch that fails is simply found again by the next poll. Batches only ever come from a poll:
+    it sees every message past the watermark, so advancing to a batch's newest message can't
+    skip one that arrived earlier.
+    """
+
+    def __init__(self, mail_source, sync_state, sync_key, subject_text, start_date=None,
+                 poll_interval=30, extractor=None):
+        self.mail_source = mail_source
+        self.sync_state = sync_state
+        self.sync_key = sync_key
+        self.subject_text = subject_text
+        self.start_date = start_date  # Only used until the folder has a watermark
+        self.poll_interval = poll_interval
+        self.extractor = extractor or PDFExtractor()
+        self.next_poll = 0.0
+        self.polls = 0
+
+    def next_batch(self, stop):
+        """Block until there are new messages (returned as a list) or stop is set (empty list)"""
+        while not stop.is_set():
+            if time.monotonic() >= self.next_poll:
+                self.next_poll = time.monotonic() + self.poll_interval
+                messages = self.poll()
+                if messages:
+                    return messages
+            if self.wait_for_events(stop, min(1.0, max(0.0, self.next_poll - time.monotonic()))):
+                self.next_poll = 0.0  # New mail announced - poll now
+        return []
+
+    def poll(self):
+        """Matching messages since the watermark's day, minus those already processed"""
+        self.polls += 1
+        since, _ = self.sync_state.watermark(self.sync_key)
+        start_date = datetime(since.year, since.month, since.day) if since else self.start_date
+        messages = self.mail_source.messages(self.subject_text, start_date, None)
+        return self.sync_state.new_messages(self.sync_key, messages)
+
+    def wait_for_events(self, stop, timeout):
+        """True if the source announced new mail within timeout - polling only, so just wait"""
+        stop.wait(timeout)
+        return False
+
+    def close(self):
+        pass
+
+
+class OutlookMailWatcher(MailWatcher):
+    """MailWatcher that also listens to the folder's Items.ItemAdd event
+
+    COM events are delivered on this thread while it pumps messages, so next_batch has to be
+    called from the thread that created the watcher. An event only triggers a poll: ItemAdd
+    doesn't fire for large batches (more than 16 items at once), and a batch built from events
+    alone could move the watermark past those.
+    """
+
+    def __init__(self, mail_source, folder, sync_state, sync_key, subject_text,
+                 start_date=None, poll_interval=60, extractor=None):
+        super().__init__(mail_source, sync_state, sync_key, subject_text, start_date, poll_interval, extractor)
+        self.folder = folder
+        self.added = queue.Queue()
+        self.items = None
+        self.events = None
+
+    def start(self):
+        """Subscribe to ItemAdd - falls back to polling only if the event can't be connected"""
+        import win32com.client
+
+        watcher = self
+
+        class ItemsEvents:
+            def OnItemAdd(self, item):
+                watcher.added.put(True)
+
+        try:
+            # Keep the Items collection referenced - Outlook stops raising events when it's released
+            self.items = self.folder.Items
+            self.events = win32com.client.WithEvents(self.items, ItemsEvents)
+            update_progress(f"Watching {self.folder.Name} for new mail")
+        except Exception as e:
+            self.items = self.events = None
+            update_progress(f"Warning: New-mail notifications unavailable, polling every {self.poll_interval:g}s: {e}")
+        return self
+
+    def wait_for_events(self, stop, timeout):
+        import pythoncom
+
+        deadline = time.monotonic() + timeout
+        while self.added.empty() and not stop.is_set() and time.monotonic() < deadline:
+            pythoncom.PumpWaitingMessages()
+            time.sleep(0.1)
+        announced = False
+        while not self.added.empty():
+            self.added.get()
+            announced = True
+        return announced
+
+    def close(self):
+        if self.events is not None:
+            try:
+                self.events.close()
+            except Exception:
+                pass
+        self.items = self.events = None
+
+
+def watch(watcher, process_batch, stop=None, max_batches=None):
+    """Hand each batch of new messages to process_batch(messages) until stop is set (or
+    max_batches were processed). Returns the number of batches."""
+    stop = stop or threading.Event()
+    batches = 0
+    while not stop.is_set() and (max_batches is None or batches < max_batches):
+        messages = watcher.next_batch(stop)
+        if not messages:
+            continue
+        update_progress(f"\n{len(messages)} new email(s) at {datetime.now().strftime('%H:%M:%S')}")
+        try:
+            process_batch(messages)
+        except Exception as e:
+            # The watermark wasn't advanced - the next poll finds the batch again
+            update_progress(f"Error processing new emails, retrying on the next poll: {e}")
+        batches += 1
+    return batches
@@ -0,0 +1,184 @@
+"""
+Output store - SQLite source of truth for extracted line items
+New rows are upserted on (PDF File, Order Number, Line); the Excel/CSV file is an export of it
+"""
+
+import os
+import sqlite3
+
+from po_extractor import timed, update_progress
+
+FIELDNAMES = ['pdf_file', 'order_number', 'order_date', 'line',
+              'part_number', 'quantity', 'unit_price', 'amount',
+              'delivery_date', 'ordering_office', 'ship_to']
+
+COLUMN_TITLES = ['PDF File', 'Order Number', 'Order Date', 'Line',
+                 'Part Number', 'Quantity', 'Unit Price', 'Amount',
+                 'Delivery Date', 'Ordering Office', 'Ship To']
+
+# Rows a run holds before upserting them (settings: output_chunk_rows)
+DEFAULT_CHUNK_ROWS = 5000
+
+
+class OutputStore:
+    """Keyed line-item table next to the output file (PO_Data.xlsx -> PO_Data.sqlite)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+
+    @staticmethod
+    def path_for(output_path):
+        return os.path.splitext(output_path)[0] + '.sqlite'
+
+    def open(self):
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS po_lines (
+                pdf_file TEXT, order_number INTEGER, order_date TEXT, line TEXT,
+                part_number TEXT, quantity INTEGER, unit_price REAL, amount REAL,
+                delivery_date TEXT, ordering_office TEXT, ship_to TEXT
+            )
+        """)
+        # Same key as the old drop_duplicates - a missing order number counts as one value
+        self.conn.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS po_lines_key
+            ON po_lines (pdf_file, IFNULL(order_number, ''), line)
+        """)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+        return self
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+        self.conn.commit()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM po_lines").fetchone()[0]
+
+    def upsert(self, df):
+        """Insert or replace rows of a title-case DataFrame; returns number of rows replaced.
+        A replaced row moves to the end, like drop_duplicates(keep='last') did."""
+        rows = df[COLUMN_TITLES].astype(object).where(df[COLUMN_TITLES].notna(), None)
+        before = self.count()
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO po_lines ({', '.join(FIELDNAMES)}) VALUES ({', '.join('?' * len(FIELDNAMES))})",
+            rows.itertuples(index=False, name=None)
+        )
+        self.conn.commit()
+        return before + len(rows) - self.count()
+
+    def max_rowid(self):
+        """rowid of the newest row (0 if empty) - rows added later have larger rowids"""
+        return self.conn.execute("SELECT IFNULL(MAX(rowid), 0) FROM po_lines").fetchone()[0]
+
+    def to_dataframe(self, since_rowid=0):
+        """All rows (or those added after since_rowid) in insertion order with the output column names and types"""
+        import pandas as pd
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(FIELDNAMES)} FROM po_lines WHERE rowid > ? ORDER BY rowid",
+            self.conn, params=(since_rowid,)
+        )
+        df.columns = COLUMN_TITLES
+        df['Order Number'] = pd.to_numeric(df['Order Number'], errors='coerce').astype('Int64')
+        # Whole quantities come back as ints, as pd.to_numeric gave them before the store - stores
+        # created with a REAL quantity column hand back floats (138 would be written as 138.0)
+        quantity = df['Quantity']
+        if quantity.dtype.kind == 'f' and quantity.notna().all() and (quantity == quantity.round()).all():
+            df['Quantity'] = quantity.astype('int64')
+        return df
+
+    def import_existing(self, output_path, normalize):
+        """Seed an empty store from an output file written before the store existed"""
+        import pandas as pd
+        if output_path.endswith('.xlsx'):
+            existing_df = pd.read_excel(output_path, dtype={'Line': str})
+        else:
+            existing_df = pd.read_csv(output_path, dtype={'Line': str})
+        existing_df = normalize(existing_df.reindex(columns=COLUMN_TITLES))
+        self.upsert(existing_df)
+        update_progress(f"Imported {len(existing_df)} rows from existing file into {os.path.basename(self.path)}")
+
+    def csv_is_current(self, output_path, rowid):
+        """True if the CSV is unchanged since our last export and that export ended at rowid,
+        so the rows added after it can just be appended"""
+        try:
+            stat = os.stat(output_path)
+        except OSError:
+            return False
+        return (self.get_meta('export_signature') == f"{output_path}|{stat.st_size}|{stat.st_mtime_ns}"
+                and self.get_meta('export_rowid') == str(rowid))
+
+    def remember_export(self, output_path):
+        stat = os.stat(output_path)
+        self.set_meta('export_rowid', self.max_rowid())
+        self.set_meta('export_signature', f"{output_path}|{stat.st_size}|{stat.st_mtime_ns}")
+
+
+class OutputWriter:
+    """Upserts rows into the output store as they're parsed, a chunk at a time
+
+    A run holds at most chunk_rows unwritten rows (None: everything until flush). The store is
+    opened - and seeded from an output file written before it existed - on the first flush, so
+    a run without rows doesn't create it. stats ({'seconds': {}}) gets the upsert timings.
+    """
+
+    def __init__(self, output_path, normalize, chunk_rows=DEFAULT_CHUNK_ROWS, stats=None):
+        self.output_path = output_path
+        self.normalize = normalize
+        self.chunk_rows = chunk_rows
+        self.stats = stats
+        self.store = None
+        self.start_rowid = None  # Newest row of the store before this writer's rows
+        self.pending = []
+        self.rows_written = 0
+        self.rows_replaced = 0
+        self.chunks = 0
+
+    def add(self, rows):
+        """Queue parsed rows - upserts once a chunk is full"""
+        self.pending.extend(rows)
+        if self.chunk_rows and len(self.pending) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        """Upsert the queued rows"""
+        if not self.pending:
+            return
+        import pandas as pd
+        if self.store is None:
+            self.open()
+        # Title Case columns like the export
+        df = pd.DataFrame(self.pending, columns=FIELDNAMES)
+        df.columns = COLUMN_TITLES
+        df = self.normalize(df)
+        with timed(self.stats, 'upsert'):
+            self.rows_replaced += self.store.upsert(df)
+        self.rows_written += len(df)
+        self.chunks += 1
+        self.pending = []
+
+    def open(self):
+        self.store = OutputStore(OutputStore.path_for(self.output_path)).open()
+        if self.store.count() == 0 and os.path.exists(self.output_path):
+            # First run with the store - existing file holds the history
+            update_progress(f"File exists, importing it into the output store: {self.output_path}")
+            with timed(self.stats, 'import_existing'):
+                self.store.import_existing(self.output_path, self.normalize)
+        elif self.store.count() == 0:
+            update_progress(f"Creating new file: {self.output_path}")
+        self.start_rowid = self.store.max_rowid()
+
+    def close(self):
+        if self.store:
+            self.store.close()
+            self.store = None
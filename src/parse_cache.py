@@ -0,0 +1,104 @@
+"""
+Parse cache - persistent PDF parse results keyed by content hash and parser version
+Lets re-runs over overlapping date ranges skip pdfplumber for PDFs seen before
+"""
+
+import os
+import json
+import time
+import sqlite3
+
+from po_extractor import parser_fingerprint, update_progress
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".pdf_extractor_cache.sqlite")
+
+
+class ParseCache:
+    """SQLite map of (PDF hash, parser version) -> parsed line-item rows, with size/age eviction"""
+
+    def __init__(self, path=None, max_mb=200, max_age_days=90):
+        self.path = path or DEFAULT_CACHE_PATH
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age = max_age_days * 86400
+        self.version = parser_fingerprint()
+        self.conn = None
+        self.hits = 0
+        self.misses = 0
+
+    def open(self):
+        """Open (or create) the cache and evict stale entries"""
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS parse_results (
+                pdf_hash TEXT NOT NULL,
+                parser_version TEXT NOT NULL,
+                rows TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (pdf_hash, parser_version)
+            )
+        """)
+        self.prune()
+        return self
+
+    def get(self, pdf_hash, pdf_name):
+        """Cached rows for this PDF content, relabelled with pdf_name, or None on a miss"""
+        row = self.conn.execute(
+            "SELECT rows FROM parse_results WHERE pdf_hash = ? AND parser_version = ?",
+            (pdf_hash, self.version)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute(
+            "UPDATE parse_results SET last_used = ? WHERE pdf_hash = ? AND parser_version = ?",
+            (time.time(), pdf_hash, self.version)
+        )
+        self.conn.commit()
+        data = json.loads(row[0])
+        # The same PDF can arrive under another attachment name
+        for item in data:
+            item['pdf_file'] = pdf_name
+        return data
+
+    def put(self, pdf_hash, data):
+        """Store parsed rows for this PDF content"""
+        rows = json.dumps(data)
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO parse_results VALUES (?, ?, ?, ?, ?, ?)",
+            (pdf_hash, self.version, rows, len(rows), now, now)
+        )
+        self.conn.commit()
+
+    def prune(self):
+        """Drop entries from other parser versions, older than max age, then least recently used over max size"""
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM parse_results WHERE parser_version != ?", (self.version,))
+        removed = cur.rowcount
+        cur.execute("DELETE FROM parse_results WHERE last_used < ?", (time.time() - self.max_age,))
+        removed += cur.rowcount
+        
+        # Keep the most recently used entries that fit in the size budget
+        total = 0
+        evict = []
+        for pdf_hash, size in cur.execute(
+                "SELECT pdf_hash, size FROM parse_results ORDER BY last_used DESC").fetchall():
+            total += size
+            if total > self.max_bytes:
+                evict.append((pdf_hash,))
+        if evict:
+            cur.executemany("DELETE FROM parse_results WHERE pdf_hash = ?", evict)
+            removed += len(evict)
+        self.conn.commit()
+        
+        if removed:
+            update_progress(f"Parse cache: evicted {removed} stale entries")
+            self.conn.execute("VACUUM")
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
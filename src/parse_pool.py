@@ -0,0 +1,171 @@
+"""
+Parse pool - runs PDFExtractor.parse_pdf in worker processes
+The Outlook COM thread only hands over saved attachments; results come back in submission order
+"""
+
+import os
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from po_extractor import parse_pdf_job, update_progress
+
+
+def default_worker_count():
+    """Leave one core for Outlook and the UI"""
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+class ParsePool:
+    """Producer/consumer parse stage: bounded job queue -> worker processes -> ordered results"""
+
+    def __init__(self, workers=None, queue_size=None, layout_path=None):
+        self.workers = workers if workers else default_worker_count()
+        self.queue_size = queue_size if queue_size else self.workers * 2
+        self.layout_path = layout_path  # Layout template store for the workers (None: no templates)
+        self.executor = None
+        self.jobs = queue.Queue(maxsize=self.queue_size)
+        # Limits parsed results not yet taken, so finished work can't pile up in memory. A slot is
+        # freed when the result is taken, not when the worker finishes
+        self.in_flight = threading.BoundedSemaphore(self.workers * 2)
+        self.parsing = set()  # seqs handed to the workers whose results haven't been taken
+        self.results = {}  # seq -> (pdf_name, future, tag) or (pdf_name, data, messages, tag, stats)
+        self.lock = threading.Lock()
+        self.next_submit = 0
+        self.next_result = 0
+        self.dispatcher = None
+
+    def start(self):
+        """Start worker processes; falls back to in-process parsing if the pool can't start"""
+        if self.workers > 1:
+            try:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self.dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+                self.dispatcher.start()
+                update_progress(f"Parsing PDFs with {self.workers} worker processes")
+            except Exception as e:
+                update_progress(f"Warning: Could not start parse workers, parsing in-process: {e}")
+                self.executor = None
+        return self
+
+    def submit(self, pdf_source, pdf_name, tag=None):
+        """Queue one PDF (file path or bytes) for parsing - blocks while the queue is full.
+        tag is handed back with the result."""
+        seq = self.next_submit
+        self.next_submit += 1
+        if self.executor is None:
+            # In-process: parse right away on this thread. Every seq needs a result, or the
+            # ordered output would stop there
+            try:
+                data, messages, stats = parse_pdf_job(pdf_source, pdf_name, self.layout_path)
+            except Exception as e:
+                data, messages, stats = [], [f"    ERROR parsing PDF: {e}"], None
+            with self.lock:
+                self.results[seq] = (pdf_name, data, messages, tag, stats)
+        else:
+            with self.lock:
+                self.parsing.add(seq)
+            self.jobs.put((seq, pdf_source, pdf_name, tag))
+        return seq
+
+    def make_room(self):
+        """Yield results in submission order (waiting for them) while submit could block for good.
+        Only the submitting thread takes results, so with every slot and the queue full it has to
+        take some before it submits again."""
+        while self.executor is not None and len(self.parsing) >= self.queue_size + self.workers * 2:
+            # The oldest result is already with the workers - they're dispatched in order
+            entry = self._take(self.next_result, block=True)
+            if entry is None:
+                return
+            self.next_result += 1
+            yield entry
+
+    def add_result(self, pdf_name, data, messages=None, tag=None):
+        """Slot an already known result (e.g. from the parse cache) into the ordered output"""
+        seq = self.next_submit
+        self.next_submit += 1
+        with self.lock:
+            self.results[seq] = (pdf_name, data, messages or [], tag, None)
+        return seq
+
+    def _dispatch(self):
+        """Move queued jobs to the executor, keeping at most 2x workers results not yet taken"""
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            seq, pdf_source, pdf_name, tag = job
+            self.in_flight.acquire()
+            try:
+                future = self.executor.submit(parse_pdf_job, pdf_source, pdf_name, self.layout_path)
+            except Exception as e:
+                self.in_flight.release()
+                with self.lock:
+                    self.results[seq] = (pdf_name, [], [f"    ERROR parsing PDF: {e}"], tag, None)
+                continue
+            with self.lock:
+                self.results[seq] = (pdf_name, future, tag)
+
+    def _take(self, seq, block):
+        """Pop the result for seq as (pdf_name, data, messages, tag, stats), or None if not ready.
+        stats is None for results that weren't parsed here (cache hits, failures)."""
+        with self.lock:
+            entry = self.results.get(seq)
+        if entry is None:
+            return None
+        if len(entry) == 3:
+            pdf_name, future, tag = entry
+            if not block and not future.done():
+                return None
+            try:
+                data, messages, stats = future.result()
+            except Exception as e:
+                data, messages, stats = [], [f"    ERROR parsing PDF: {e}"], None
+            entry = (pdf_name, data, messages, tag, stats)
+            self.in_flight.release()
+        with self.lock:
+            del self.results[seq]
+            self.parsing.discard(seq)
+        return entry
+
+    def ready_results(self):
+        """Yield finished results that are next in submission order, without blocking"""
+        while self.next_result < self.next_submit:
+            entry = self._take(self.next_result, block=False)
+            if entry is None:
+                break
+            self.next_result += 1
+            yield entry
+
+    def finish(self):
+        """Wait for all submitted PDFs and yield the remaining results in submission order"""
+        if self.dispatcher:
+            self.jobs.put(None)
+        while self.next_result < self.next_submit:
+            entry = self._take(self.next_result, block=True)
+            while entry is None and self.dispatcher and self.dispatcher.is_alive():
+                # Still queued - the dispatcher gets a slot as results are taken
+                self.dispatcher.join(0.05)
+                entry = self._take(self.next_result, block=True)
+            if entry is None:
+                # Can't happen once every seq gets a result - keep the order going rather than
+                # handing callers a None they'd read as the end of the results
+                entry = ("(unknown)", [], ["    ERROR parsing PDF: result missing"], None, None)
+            yield entry
+            self.next_result += 1
+        self.close()
+
+    def close(self):
+        """Shut down worker processes"""
+        if self.dispatcher and self.dispatcher.is_alive():
+            try:
+                self.jobs.put_nowait(None)
+            except queue.Full:
+                pass
+        if self.executor:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,306 @@
+"""
+PDF archive - where extracted attachments are kept under PDFs/
+'dated' (default) moves each attachment into PDFs/<YYYY-MM-DD>/<name>. 'content' stores each
+distinct PDF once under its content hash; the date folders hold hardlinks to it, and a manifest
+lists every (date, name) -> hash so views exist even where hardlinks aren't supported
+ArchiveWriter places PDFs from background threads, for archives on slow network shares
+"""
+
+import errno
+import os
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+from po_extractor import file_md5
+
+OBJECTS_FOLDER = ".objects"
+MANIFEST_NAME = ".manifest.sqlite"
+
+
+def move_into(source, target):
+    """Rename source to target; across volumes (local staging -> share) copy next to the target
+    first and rename that, so the target never holds a partial file. Returns the placed file's
+    (size, mtime_ns) - taken before the rename, so a file replacing it meanwhile can't be mistaken for it."""
+    try:
+        stat = os.stat(source)
+        os.replace(source, target)  # Atomic rename, same volume - the file keeps its size and mtime
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        partial = f"{target}.{uuid.uuid4().hex}.part"
+        try:
+            shutil.copyfile(source, partial)
+            stat = os.stat(partial)
+            os.replace(partial, target)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        os.remove(source)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class DatedArchive:
+    """PDFs/<date>/<name> - a later attachment with the same name on the same day replaces the file"""
+
+    def __init__(self, base_folder):
+        self.base_folder = base_folder
+        self.lock = threading.Lock()  # ArchiveWriter places from several threads
+        self.stored = 0  # Files written
+        self.deduplicated = 0  # PDFs already stored (content archive only)
+        self.placed_files = {}  # (pdf hash, date folder, name) -> (size, mtime_ns) of files placed this run
+
+    def open(self):
+        return self
+
+    def target(self, date_folder, name):
+        return os.path.join(self.base_folder, date_folder, name)
+
+    def contains(self, pdf_hash, date_folder, name, archived=None):
+        """True if the PDF is archived for this date and name. A later attachment with the same
+        name may have replaced the file: it's hashed unless its size and mtime still match
+        archived, the (size, mtime_ns) recorded when the PDF was placed."""
+        path = self.target(date_folder, name)
+        try:
+            stat = os.stat(path)
+            if archived is not None and (stat.st_size, stat.st_mtime_ns) == tuple(archived):
+                return True
+            return file_md5(path) == pdf_hash
+        except OSError:
+            return False
+
+    def file_stat(self, date_folder, name):
+        """(size, mtime_ns) of the archived file for this date and name, or None"""
+        try:
+            stat = os.stat(self.target(date_folder, name))
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def placed_stat(self, pdf_hash, date_folder, name):
+        """(size, mtime_ns) the PDF was placed with in this run, or None"""
+        with self.lock:
+            return self.placed_files.get((pdf_hash, date_folder, name))
+
+    def place(self, staged, pdf_hash, date_folder, name, entry_id=None):
+        """Move a staged PDF into the archive; returns its path relative to the archive.
+        Raises PermissionError (file open) so the caller can retry."""
+        placed = move_into(staged, self.target(date_folder, name))
+        with self.lock:
+            self.stored += 1
+            self.placed_files[(pdf_hash, date_folder, name)] = placed
+        return f"{date_folder}/{name}"
+
+    def add_view(self, pdf_hash, date_folder, name, entry_id=None):
+        """Make an archived PDF show up in the date folder - here contains() found it there already"""
+        return f"{date_folder}/{name}"
+
+    def close(self):
+        pass
+
+
+class ContentArchive(DatedArchive):
+    """PDFs/.objects/<ab>/<hash>.pdf once per distinct PDF, hardlinked into PDFs/<date>/<name>
+
+    A different PDF with a name already used that day gets '<name> (<hash prefix>).pdf'
+    instead of replacing it. Every view is recorded in the manifest, also when the volume
+    can't hardlink (the date folder then only lists what the manifest points to).
+    """
+
+    def __init__(self, base_folder):
+        super().__init__(base_folder)
+        self.conn = None
+        self.linked = 0
+
+    def open(self):
+        """Open (or create) the manifest"""
+        os.makedirs(os.path.join(self.base_folder, OBJECTS_FOLDER), exist_ok=True)
+        # Shared by ArchiveWriter threads - manifest access holds self.lock
+        self.conn = sqlite3.connect(os.path.join(self.base_folder, MANIFEST_NAME), check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS views (
+                date_folder TEXT NOT NULL,
+                file_name TEXT NOT NULL,
+                pdf_hash TEXT NOT NULL,
+                entry_id TEXT,
+                linked INTEGER NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (date_folder, file_name)
+            );
+            CREATE INDEX IF NOT EXISTS views_by_hash ON views (pdf_hash);
+        """)
+        self.conn.commit()
+        return self
+
+    def object_path(self, pdf_hash):
+        return os.path.join(self.base_folder, OBJECTS_FOLDER, pdf_hash[:2], f"{pdf_hash}.pdf")
+
+    def contains(self, pdf_hash, date_folder, name, archived=None):
+        """True if the PDF content is stored - a view can always be added without its bytes"""
+        return os.path.exists(self.object_path(pdf_hash))
+
+    def file_stat(self, date_folder, name):
+        return None  # Objects are named by their content - contains never hashes
+
+    def placed_stat(self, pdf_hash, date_folder, name):
+        return None
+
+    def views(self, pdf_hash):
+        """(date folder, file name) views of a stored PDF"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT date_folder, file_name FROM views WHERE pdf_hash = ? ORDER BY date_folder, file_name",
+                (pdf_hash,)
+            ).fetchall()
+
+    def view_name(self, pdf_hash, date_folder, name):
+        """File name for the PDF in the date folder - None if it's already there"""
+        stem, extension = os.path.splitext(name)
+        for candidate in (name, f"{stem} ({pdf_hash[:8]}){extension}"):
+            row = self.conn.execute(
+                "SELECT pdf_hash FROM views WHERE date_folder = ? AND file_name = ?", (date_folder, candidate)
+            ).fetchone()
+            if row is None and not os.path.exists(self.target(date_folder, candidate)):
+                return candidate
+            if row is not None and row[0] == pdf_hash:
+                return None
+        # Both names taken by other content (e.g. files from before the content archive) - keep them
+        return f"{stem} ({pdf_hash}){extension}"
+
+    def place(self, staged, pdf_hash, date_folder, name, entry_id=None):
+        stored = self.object_path(pdf_hash)
+        if not os.path.exists(stored):
+            # Same content either way if two threads store the same PDF at once
+            os.makedirs(os.path.dirname(stored), exist_ok=True)
+            move_into(staged, stored)
+            with self.lock:
+                self.stored += 1
+        elif os.path.exists(staged):  # (a retry after a failed link has nothing left to move)
+            os.remove(staged)
+            with self.lock:
+                self.deduplicated += 1
+        return self.add_view(pdf_hash, date_folder, name, entry_id)
+
+    def add_view(self, pdf_hash, date_folder, name, entry_id=None):
+        """Hardlink a stored PDF into the date folder and record it; returns the view's relative path"""
+        with self.lock:
+            view_name = self.view_name(pdf_hash, date_folder, name)
+            if view_name is None:
+                return f"{date_folder}/{name}"
+            try:
+                os.link(self.object_path(pdf_hash), self.target(date_folder, view_name))
+                linked = True
+                self.linked += 1
+            except OSError:
+                linked = False  # No hardlinks here (FAT, some shares) - the manifest is the view
+            self.conn.execute(
+                "INSERT OR REPLACE INTO views VALUES (?, ?, ?, ?, ?, ?)",
+                (date_folder, view_name, pdf_hash, entry_id, int(linked), time.time())
+            )
+            self.conn.commit()
+        return f"{date_folder}/{view_name}"
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+
+class ArchiveWriter:
+    """Write-behind placement: staged PDFs are queued and moved into the archive by background
+    threads, retrying failed writes (locked file, share hiccup) with exponential backoff
+
+    submit() only blocks while the queue is full. finish() waits for the queue and returns the
+    failures as (file name, error) - reported once at the end instead of per file.
+    """
+
+    def __init__(self, archive, workers=4, queue_size=None, retries=5, backoff=0.5, max_backoff=30.0):
+        self.archive = archive
+        self.workers = max(1, workers)
+        self.jobs = queue.Queue(maxsize=queue_size or self.workers * 8)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self.threads = []
+        self.placed = 0
+        self.retried = 0
+        self.failures = []
+        self.busy_seconds = 0.0  # Summed over the writer threads
+
+    def start(self):
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._run, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def submit(self, staged, pdf_hash, date_folder, name, entry_id=None):
+        """Queue a staged PDF for the archive - the writer owns (and removes) the staged file"""
+        self.jobs.put((staged, pdf_hash, date_folder, name, entry_id))
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            start = time.perf_counter()
+            self._place(*job)
+            with self.lock:
+                self.busy_seconds += time.perf_counter() - start
+
+    def _place(self, staged, pdf_hash, date_folder, name, entry_id):
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            try:
+                self.archive.place(staged, pdf_hash, date_folder, name, entry_id)
+                with self.lock:
+                    self.placed += 1
+                return
+            except FileNotFoundError as e:
+                error = e
+                break  # Staged file (or date folder) is gone - retrying can't bring it back
+            except OSError as e:
+                error = e
+                if isinstance(e, PermissionError) and not os.path.exists(staged):
+                    break  # Nothing left to move - only a locked target is worth waiting for
+                if attempt < self.retries:
+                    with self.lock:
+                        self.retried += 1
+                    time.sleep(delay)
+                    delay = min(delay * 2, self.max_backoff)
+            except Exception as e:
+                error = e
+                break
+        with self.lock:
+            self.failures.append((f"{date_folder}/{name}", str(error)))
+        try:
+            os.remove(staged)
+        except OSError:
+            pass
+
+    def finish(self):
+        """Wait for all queued PDFs and stop the threads; returns the failures"""
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        return self.failures
+
+
+# Archive layouts by name - settings key pdf_archive, CLI --archive
+ARCHIVES = {
+    'dated': DatedArchive,
+    'content': ContentArchive,
+}
+
+
+def open_archive(kind, base_folder):
+    """Archive of the given layout under base_folder (the PDFs folder next to the output)"""
+    if kind not in ARCHIVES:
+        raise ValueError(f"Unknown PDF archive '{kind}' (use one of: {', '.join(ARCHIVES)})")
+    return ARCHIVES[kind](base_folder).open()
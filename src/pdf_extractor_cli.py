@@ -0,0 +1,258 @@
+"""
+PDF Extractor - headless command line
+Runs the parse -> dedup -> write pipeline without Eel/tkinter, e.g. from a scheduled task or on Linux
+
+    python -m pdf_extractor_cli --pdf-dir D:\\POs --output D:\\PO_Data.xlsx
+    python -m pdf_extractor_cli --mbox archive/2025-06.mbox --subject PO --output PO_Data.csv
+    python -m pdf_extractor_cli --email me@company.com --folder "Purchase Orders" --subject PO --output PO_Data.xlsx --incremental
+    python -m pdf_extractor_cli --email me@company.com --folder "Purchase Orders" --subject PO --output PO_Data.xlsx --watch
+    python -m pdf_extractor_cli --resume
+    python -m pdf_extractor_cli --profile-startup
+"""
+
+import argparse
+from datetime import datetime
+import importlib
+import multiprocessing
+import os
+import sys
+import time
+
+# Modules a run can load - project modules are imported inside main() so --profile-startup can time them.
+# Each time includes any dependencies that weren't loaded yet.
+STARTUP_MODULES = [
+    'sqlite3', 'po_extractor', 'mail_sources', 'sync_state', 'parse_cache', 'attachment_index', 'layout_templates',
+    'parse_pool', 'pdf_archive', 'output_store', 'run_journal', 'extraction_pipeline', 'mail_watch', 'pdfplumber', 'pandas', 'openpyxl', 'win32com.client'
+]
+
+
+def profile_startup():
+    """Import each module a run uses and print what it cost"""
+    print(f"{'Module':<24}{'Import (ms)':>12}")
+    total = 0.0
+    for name in STARTUP_MODULES:
+        if name in sys.modules:
+            print(f"{name:<24}{'loaded':>12}")
+            continue
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            print(f"{name:<24}{'missing':>12}")
+            continue
+        elapsed = (time.perf_counter() - start) * 1000
+        total += elapsed
+        print(f"{name:<24}{elapsed:>12.1f}")
+    print(f"{'Total':<24}{total:>12.1f}")
+
+
+def parse_date(value, label):
+    """MM/DD/YYYY like the GUI, or None"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%m/%d/%Y")
+    except ValueError:
+        raise SystemExit(f"Invalid {label} date format. Use MM/DD/YYYY")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pdf_extractor_cli",
+        description="Extract purchase order line items from Outlook, saved mail (.eml, mbox) or a folder of PDFs"
+    )
+    parser.add_argument("--output", help="Excel (.xlsx) or CSV output file")
+    local = parser.add_mutually_exclusive_group()
+    local.add_argument("--pdf-dir", help="Read PDFs from this folder instead of Outlook")
+    local.add_argument("--eml-dir", help="Read saved .eml messages from this folder instead of Outlook")
+    local.add_argument("--mbox", help="Read messages from this mbox file (or folder of .mbox files)")
+    parser.add_argument("--email", help="Outlook account (email address) to search")
+    parser.add_argument("--folder", help="Text contained in the Outlook folder name")
+    parser.add_argument("--subject", default="", help="Text contained in the email subject (file name for --pdf-dir)")
+    parser.add_argument("--read-workers", type=int, help="Threads reading local mail files (default: cores x 4, max 32)")
+    parser.add_argument("--start", help="Emails on or after this date (MM/DD/YYYY)")
+    parser.add_argument("--end", help="Emails on or before this date (MM/DD/YYYY)")
+    parser.add_argument("--incremental", action="store_true", help="Only process mail newer than the last run")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and process new emails as they arrive (Ctrl+C to stop)")
+    parser.add_argument("--poll-interval", type=float,
+                        help="Seconds between checks for new mail in --watch mode (default: 60 for Outlook, 10 otherwise)")
+    parser.add_argument("--workers", type=int, help="Parse worker processes (default: saved setting or cores - 1)")
+    parser.add_argument("--no-cache", action="store_true", help="Don't use the parse cache")
+    parser.add_argument("--no-templates", action="store_true",
+                        help="Don't use layout templates - run full table detection on every PDF")
+    parser.add_argument("--no-export", action="store_true", help="Update the output store only, skip the Excel/CSV export")
+    parser.add_argument("--chunk-rows", type=int,
+                        help="Line items held before they're written to the output store (default: saved setting or 5000)")
+    parser.add_argument("--archive", choices=["dated", "content"],
+                        help="PDF archive layout - 'content' stores each PDF once and hardlinks it into the date folders")
+    parser.add_argument("--write-behind", action="store_true",
+                        help="Stage PDFs locally and write them to the archive from background threads (slow shares)")
+    parser.add_argument("--retry-delay", type=float, default=10,
+                        help="Seconds to wait before retrying a locked file (default: 10)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume the last interrupted run (GUI or CLI) with its original options")
+    parser.add_argument("--prometheus", help="Also write the run report as a Prometheus textfile to this path")
+    parser.add_argument("--profile-startup", action="store_true", help="Report the import cost of each module")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.profile_startup:
+        profile_startup()
+        if not args.output:
+            return 0
+    if not args.output and not args.resume:
+        raise SystemExit("--output is required")
+
+    from po_extractor import PDFExtractor, update_progress
+    from extraction_pipeline import ExtractionRun, RunCallbacks
+    from sync_state import SyncState
+
+    class CliCallbacks(RunCallbacks):
+        """Nobody to ask - locked files are retried after a pause"""
+
+        def ask_retry_pdf(self, file_name):
+            update_progress(f"  PDF is locked, retrying in {args.retry_delay:g}s: {file_name}")
+            time.sleep(args.retry_delay)
+            return True
+
+        def ask_retry_file(self, output_path, attempt, max_retries):
+            update_progress(f"Output file is locked, retrying in {args.retry_delay:g}s...")
+            time.sleep(args.retry_delay)
+            return True
+
+    extractor = PDFExtractor()
+    settings = extractor.load_settings()
+    if args.workers is not None:
+        settings['parse_workers'] = args.workers
+    if args.no_cache:
+        settings['parse_cache'] = False
+    if args.no_templates:
+        settings['layout_templates'] = False
+    if args.no_export:
+        settings['output_export'] = 'skip'
+    if args.chunk_rows:
+        settings['output_chunk_rows'] = args.chunk_rows
+    if args.prometheus:
+        settings['run_report_prometheus'] = args.prometheus
+    if args.archive:
+        settings['pdf_archive'] = args.archive
+    if args.write_behind:
+        settings['archive_write_behind'] = True
+
+    if args.resume:
+        params = ExtractionRun(settings, extractor=extractor).last_run()
+        if not params:
+            update_progress("No interrupted run to resume")
+            return 1
+        # The interrupted run's options replace the mail and output options given here
+        args.output, args.subject = params['output'], params['subject']
+        args.start, args.end, args.incremental = params['start'], params['end'], params['incremental']
+        args.email, args.folder = params.get('email'), params.get('folder')
+        args.pdf_dir, args.eml_dir, args.mbox = (
+            params.get('location') if params['source'] == kind else None for kind in ('pdf-dir', 'eml-dir', 'mbox'))
+        update_progress(f"Resuming run into {args.output}")
+
+    local_source = next(((kind, location) for kind, location in (
+        ('pdf-dir', args.pdf_dir), ('eml-dir', args.eml_dir), ('mbox', args.mbox)) if location), None)
+    if not local_source and not (args.email and args.folder):
+        raise SystemExit("Give --pdf-dir, --eml-dir or --mbox, or --email and --folder for Outlook")
+    if local_source:
+        params = {'source': local_source[0], 'location': os.path.abspath(local_source[1])}
+    else:
+        # Same shape as the GUI's, so either front end can resume the other's run
+        params = {'source': 'outlook', 'email': args.email, 'folder': args.folder}
+    params.update(subject=args.subject, start=args.start, end=args.end, output=args.output,
+                  incremental=bool(args.incremental))
+
+    start_date = parse_date(args.start, "start")
+    end_date = parse_date(args.end, "end")
+    run = ExtractionRun(settings, CliCallbacks(), extractor)
+    sync_state = SyncState()
+    com_initialized = False
+    mail_source = None
+
+    try:
+        if local_source:
+            from mail_sources import open_local_source
+            kind, location = local_source
+            try:
+                mail_source = open_local_source(kind, location, args.read_workers)
+            except (ValueError, OSError) as e:
+                update_progress(f"ERROR: {e}")
+                return 1
+            sync_key = sync_state.key(None, kind, os.path.abspath(location), args.subject)
+        else:
+            import pythoncom
+            from mail_sources import open_outlook_source
+            pythoncom.CoInitialize()
+            com_initialized = True
+
+            update_progress("Connecting to Outlook...")
+            with run.metrics.stage('connect_outlook'):
+                outlook = extractor.connect_outlook()
+            update_progress(f"Searching for folder containing: '{args.folder}'")
+            extractor.folder_search_depth = settings.get('folder_search_depth', 8)
+            with run.metrics.stage('find_folder'):
+                target_folder = extractor.find_folder(outlook, args.email, args.folder)
+            if not target_folder:
+                update_progress(f"ERROR: Could not find folder containing '{args.folder}' in {args.email}")
+                return 1
+            update_progress(f"Found folder: {target_folder.Name}")
+            mail_source = open_outlook_source(outlook, target_folder, settings.get('mail_source', 'table'))
+            sync_key = sync_state.key(target_folder, args.email, args.folder, args.subject)
+
+        if args.watch:
+            from mail_watch import MailWatcher, OutlookMailWatcher, watch
+            if args.workers is None:
+                # A batch is an email or two - starting worker processes for it costs more than it saves
+                settings['parse_workers'] = 1
+            poll_interval = args.poll_interval or settings.get('watch_poll_seconds', 10 if local_source else 60)
+            if local_source:
+                watcher = MailWatcher(mail_source, sync_state, sync_key, args.subject, start_date,
+                                      poll_interval, extractor)
+            else:
+                watcher = OutlookMailWatcher(mail_source, target_folder, sync_state, sync_key, args.subject,
+                                             start_date, poll_interval, extractor).start()
+
+            def process_batch(messages):
+                """One pipeline run per batch - rows are upserted into the output store as usual"""
+                batch_run = ExtractionRun(settings, CliCallbacks(), extractor)
+                if batch_run.run(messages, args.output)["success"]:
+                    batch_run.finish_sync(sync_state, sync_key, messages, incremental=True)
+
+            update_progress("Watching for new emails - press Ctrl+C to stop")
+            try:
+                watch(watcher, process_batch)
+            except KeyboardInterrupt:
+                update_progress("Watch stopped")
+            finally:
+                watcher.close()
+            return 0
+
+        emails = run.find_messages(mail_source, args.subject, start_date, end_date,
+                                   sync_state, sync_key, args.incremental)
+        if not emails:
+            update_progress("No new emails since the last run" if args.incremental
+                            else "No emails match the filter criteria")
+            return 0
+
+        result = run.run(emails, args.output, params, args.resume)
+        if not result["success"]:
+            return 1
+        run.finish_sync(sync_state, sync_key, emails, args.incremental, start_date)
+        return 0
+    finally:
+        if mail_source:
+            mail_source.close()
+        if com_initialized:
+            pythoncom.CoUninitialize()
+
+
+if __name__ == "__main__":
+    # Required for parse worker processes in a frozen build
+    multiprocessing.freeze_support()
+    sys.exit(main())
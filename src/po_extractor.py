@@ -0,0 +1,1454 @@
+"""
+PDF Extractor core - PO parsing and Outlook access without the GUI stack
+Imported by the Eel app and by parse worker processes, so it must not pull in eel
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import hashlib
+import io
+from itertools import accumulate
+import json
+from operator import itemgetter
+import os
+import re
+import time
+
+# pdfplumber and pandas are imported on first use - the CLI and GUI start without them
+
+
+def _print_progress(message):
+    print(message)
+
+
+# Progress handler - the Eel app installs one that also forwards to the UI
+_progress_handler = _print_progress
+
+
+def set_progress_handler(handler):
+    """Route progress messages (e.g. to the UI); None restores console printing"""
+    global _progress_handler
+    _progress_handler = handler or _print_progress
+
+
+def update_progress(message):
+    """Report a progress message through the installed handler"""
+    _progress_handler(message)
+
+
+LINE_NUMBER = re.compile(r'^\d+\.\d+$')  # "1.1", "14.2" - a line item's first cell
+LINE_NUMBER_IN_TEXT = re.compile(r'(?<!\S)\d+\.\d+(?!\S)')
+DATE_IN_TEXT = re.compile(r'\d{1,2}-[A-Za-z]{3}-\d{4}')  # "12-DEC-2025"
+PRICE_IN_TEXT = re.compile(r'\$?\d+\.\d{2}')  # "$12.34" or "12.34"
+FOOTER_WORDS = ('terms', 'conditions', 'page')  # Start of the footer/terms area below the line items
+BAND_MARGIN = 20  # Points kept above the header row, so its cell borders are inside the crop
+EDGE_TOLERANCE = 1  # A table this close to the crop edge may have been cut off
+CROP_MAX_FRACTION = 0.8  # A band taller than this share of the page isn't worth cropping
+EDGE_SNAP = 3  # pdfplumber's snap/join tolerance - ruling lines this close are the same line
+TEXT_TOLERANCE = 3  # x/y tolerance of pdfplumber's table cell text
+
+
+def new_parse_stats():
+    """Per-PDF counters and stage timings filled in by parse_pdf (plain dict - travels back from workers)"""
+    return {'pages': 0, 'tables': 0, 'parser': None, 'layout': None, 'seconds': {}}
+
+
+@contextmanager
+def timed(stats, name):
+    """Add the block's duration to stats['seconds'][name] - no-op without stats"""
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = stats['seconds']
+        seconds[name] = seconds.get(name, 0.0) + time.perf_counter() - start
+
+
+class WordIndex:
+    """A page's words indexed for the field extractors - by text for label lookups, and sorted by
+    top for same-line and band queries. Results come back in reading order (extract_words order),
+    which is what the extractors' original word-by-word scans saw."""
+
+    def __init__(self, words):
+        self.words = words
+        tops = [word['top'] for word in words]
+        self.by_top = sorted(range(len(words)), key=tops.__getitem__)
+        self.tops = [tops[i] for i in self.by_top]
+        # first_from[k]: earliest reading position among by_top[k:]
+        self.first_from = list(accumulate(reversed(self.by_top), min))[::-1]
+        self.by_text = {}
+        for i, word in enumerate(words):
+            self.by_text.setdefault(word['text'], []).append(i)
+        self._containing = {}
+
+    def containing(self, *fragments):
+        """Reading positions of the words whose text contains any of the fragments"""
+        if len(fragments) > 1:
+            return sorted(set().union(*(self.containing(fragment) for fragment in fragments)))
+        fragment = fragments[0]
+        if fragment not in self._containing:
+            # One pass over the distinct texts, not the words
+            self._containing[fragment] = sorted([i for text, positions in self.by_text.items()
+                                                 if fragment in text for i in positions])
+        return self._containing[fragment]
+
+    def first(self, fragment, below=None):
+        """First word containing fragment (with top > below), or None"""
+        for i in self.containing(fragment):
+            if below is None or self.words[i]['top'] > below:
+                return self.words[i]
+        return None
+
+    def on_line(self, top, tolerance):
+        """Words whose top is within tolerance of top"""
+        start = bisect_right(self.tops, top - tolerance)
+        end = bisect_left(self.tops, top + tolerance)
+        return [self.words[i] for i in sorted(self.by_top[start:end])]
+
+    def below(self, top, stop=None):
+        """Words with top > top that a reading-order scan collects before it reaches its first
+        word at or below stop"""
+        start = bisect_right(self.tops, top)
+        if stop is None:
+            return [self.words[i] for i in sorted(self.by_top[start:])]
+        end = max(start, bisect_left(self.tops, stop))
+        limit = self.first_from[end] if end < len(self.by_top) else len(self.words)
+        return [self.words[i] for i in sorted(self.by_top[start:end]) if i < limit]
+
+
+class PageAnalysis:
+    """Lazily computed text, tables and words for a single PDF page"""
+
+    def __init__(self, page, stats=None):
+        self.page = page
+        self.stats = stats
+        self.layout = None  # Layout template of the document, if one matched
+        self._text = None
+        self._tables = None
+        self._line_item_tables = None
+        self._layout_tables = None
+        self._words = None
+        self._word_index = None
+
+    @property
+    def text(self):
+        """Page text - extracted once on first use"""
+        if self._text is None:
+            with timed(self.stats, 'text'):
+                self._text = self.page.extract_text() or ""
+        return self._text
+
+    @property
+    def tables(self):
+        """Page tables - table detection is the expensive step, so run it once"""
+        if self._tables is None:
+            with timed(self.stats, 'tables'):
+                self._tables = self.detect_tables(self.page)
+            if self.stats is not None:
+                self.stats['tables'] += len(self._tables)
+        return self._tables
+
+    @property
+    def line_item_tables(self):
+        """Tables in the line-item band only (header row through the footer/terms boundary).
+        Pages without line numbers or a Line/Part header have none. A band starting inside a ruled
+        row is widened to the row's top border. If a table touches the edge of the crop the band
+        was too tight, and the whole page is used instead."""
+        tables = self.layout_tables()
+        if tables is not None:
+            return tables
+        if self._tables is not None:
+            return self._tables  # Whole page already done (e.g. by has_tables)
+        if self._line_item_tables is None:
+            band = self.line_item_band()
+            if band is None:
+                self._line_item_tables = []
+                return self._line_item_tables
+            x0, top, x1, bottom = self.page.bbox
+            crop_top, crop_bottom = max(top, self.ruled_top(band[0])), min(bottom, band[1])
+            if crop_bottom - crop_top > CROP_MAX_FRACTION * (bottom - top):
+                return self.tables  # Cropping costs more than it saves
+            with timed(self.stats, 'tables'):
+                found = self.page.crop((x0, crop_top, x1, crop_bottom)).find_tables()
+                cut = any((crop_top > top and table.bbox[1] <= crop_top + EDGE_TOLERANCE) or
+                          (crop_bottom < bottom and table.bbox[3] >= crop_bottom - EDGE_TOLERANCE)
+                          for table in found)
+            if cut:
+                return self.tables
+            with timed(self.stats, 'tables'):
+                self._line_item_tables = [table.extract() for table in found]
+            if self.stats is not None:
+                self.stats['tables'] += len(self._line_item_tables)
+        return self._line_item_tables
+
+    def ruled_top(self, top):
+        """top moved up to the top of the vertical ruling lines crossing it - a tall first row's
+        number sits more than BAND_MARGIN below its border, and a crop through the row loses it"""
+        crossing = [edge['top'] for edge in self.page.vertical_edges if edge['top'] < top < edge['bottom']]
+        return min(crossing) - BAND_MARGIN if crossing else top
+    
+    def line_item_band(self):
+        """(top, bottom) of the line items from the word positions, or None if there are none"""
+        # The page text is already extracted - only pages that may have line items need words
+        text = self.text
+        if not LINE_NUMBER_IN_TEXT.search(text) and not ('Line' in text and 'Part' in text):
+            return None
+        words = self.words
+        numbers = [w for w in words if LINE_NUMBER.match(w['text'])]
+        if numbers:
+            # Only the Line column - decimals in terms or notes text further right don't count
+            first = min(numbers, key=lambda w: w['x0'])
+            numbers = [w for w in numbers if w['x0'] < first['x1'] and w['x1'] > first['x0']]
+        index = self.word_index
+        header_tops = [index.words[i]['top'] for i in index.containing('Line')
+                       if any('Part' in other['text'] for other in index.on_line(index.words[i]['top'], 3))]
+        if not numbers and not header_tops:
+            return None
+        top = min(header_tops + [w['top'] for w in numbers])
+        last = max(w['bottom'] for w in numbers) if numbers else max(header_tops)
+        footer = [w['top'] for w in words if w['top'] > last and w['text'].lower().startswith(FOOTER_WORDS)]
+        return top - BAND_MARGIN, min(footer) if footer else self.page.bbox[3]
+
+    def layout_tables(self):
+        """Tables rebuilt from the layout template's columns, or None without a template or if the
+        page doesn't fit it (its tables are then detected as usual)"""
+        if not (self.layout and self.layout.get('columns')):
+            return None
+        if self._layout_tables is None:
+            with timed(self.stats, 'layout'):
+                tables = self.build_layout_tables(self.layout['columns'])
+            self._layout_tables = tables if tables is not None else False
+            if tables and self.stats is not None:
+                self.stats['tables'] += len(tables)
+        return self._layout_tables if self._layout_tables is not False else None
+
+    def build_layout_tables(self, columns):
+        """The cells table detection would find, from the ruling lines and words: rows are the gaps
+        between horizontal lines across the Line column, runs of rows ruled at every template column
+        are tables. None if the grid isn't exactly the template's (extra lines, merged cells, text
+        across a cell border, a line number outside the grid)."""
+        from pdfplumber.utils import cluster_objects
+        
+        text = self.text
+        if not LINE_NUMBER_IN_TEXT.search(text) and not ('Line' in text and 'Part' in text):
+            return []
+        words = self.words
+        left, right = columns[0], columns[-1]
+        numbers = [w for w in words if LINE_NUMBER.match(w['text'])]
+        if numbers and not columns[0] <= min(w['x0'] for w in numbers) < columns[1]:
+            return None  # Line column isn't where the template has it
+        
+        edges = self.page.edges
+        horizontal = [e for e in edges if e['orientation'] == 'h']
+        
+        # Row boundaries - horizontal lines across the Line column
+        boundaries = []
+        for top in sorted(e['top'] for e in horizontal
+                          if e['x0'] <= columns[0] + EDGE_SNAP and e['x1'] >= columns[1] - EDGE_SNAP):
+            if not boundaries or top - boundaries[-1] > EDGE_SNAP:
+                boundaries.append(top)
+        
+        # Vertical lines per column boundary, joined like pdfplumber joins collinear edges;
+        # any other vertical line inside the table is a stray
+        spans = [[] for _ in columns]
+        stray_vertical = []
+        for e in edges:
+            if e['orientation'] != 'v' or not left - EDGE_SNAP <= e['x0'] <= right + EDGE_SNAP:
+                continue
+            index = bisect_left(columns, e['x0'])
+            index = min((i for i in (index - 1, index) if 0 <= i < len(columns)),
+                        key=lambda i: abs(columns[i] - e['x0']))
+            if abs(columns[index] - e['x0']) <= EDGE_SNAP:
+                spans[index].append((e['top'], e['bottom']))
+            else:
+                stray_vertical.append(e)
+        for index, column in enumerate(spans):
+            joined = []
+            for top, bottom in sorted(column):
+                if joined and top <= joined[-1][1] + EDGE_SNAP:
+                    joined[-1][1] = max(joined[-1][1], bottom)
+                else:
+                    joined.append([top, bottom])
+            spans[index] = ([top for top, _ in joined], [bottom for _, bottom in joined])
+        stray_horizontal = sorted(e['top'] for e in horizontal
+                                  if e['x1'] > left + EDGE_SNAP and e['x0'] < right - EDGE_SNAP)
+        
+        def ruled_columns(top, bottom):
+            count = 0
+            for tops, bottoms in spans:
+                index = bisect_right(tops, top + EDGE_SNAP) - 1
+                if index >= 0 and bottoms[index] >= bottom - EDGE_SNAP:
+                    count += 1
+            return count
+        
+        rows = []  # (top, bottom, ruled at every column, ruled at some)
+        for top, bottom in zip(boundaries, boundaries[1:]):
+            ruled = ruled_columns(top, bottom)
+            if ruled == len(columns):
+                if any(e['top'] < bottom - EDGE_SNAP and e['bottom'] > top + EDGE_SNAP for e in stray_vertical):
+                    return None  # Split cell
+                index = bisect_right(stray_horizontal, top + EDGE_SNAP)
+                if index < len(stray_horizontal) and stray_horizontal[index] < bottom - EDGE_SNAP:
+                    return None  # Split row
+            rows.append((top, bottom, ruled == len(columns), ruled > 0))
+        for index, (top, bottom, ruled, partial) in enumerate(rows):
+            # A partly ruled row joined to the grid would be part of the detected table
+            if partial and not ruled and any(0 <= other < len(rows) and rows[other][2]
+                                             for other in (index - 1, index + 1)):
+                return None
+        
+        # Words into cells - each word must sit inside one cell, as pdfplumber assigns characters
+        in_table = sorted((w for w in words if left <= (w['x0'] + w['x1']) / 2 < right),
+                          key=lambda w: (w['top'] + w['bottom']) / 2)
+        middles = [(w['top'] + w['bottom']) / 2 for w in in_table]
+        tables = []
+        current = None
+        placed = 0
+        for top, bottom, ruled, _ in rows:
+            if not ruled:
+                current = None
+                continue
+            cells = [[] for _ in columns[1:]]
+            row_words = in_table[bisect_left(middles, top):bisect_left(middles, bottom)]
+            for word in row_words:
+                index = bisect_right(columns, (word['x0'] + word['x1']) / 2) - 1
+                if (word['x0'] < columns[index] - 1 or word['x1'] > columns[index + 1] + 1 or
+                        word['top'] < top - 1 or word['bottom'] > bottom + 1):
+                    return None
+                cells[index].append(word)
+            placed += sum(1 for word in row_words if LINE_NUMBER.match(word['text']) and
+                          columns[0] <= (word['x0'] + word['x1']) / 2 < columns[1])
+            row = ['\n'.join(' '.join(word['text'] for word in line)
+                             for line in cluster_objects(cell, itemgetter('top'), TEXT_TOLERANCE))
+                   for cell in cells]
+            if current is None:
+                current = []
+                tables.append(current)
+            current.append(row)
+        
+        line_numbers = sum(1 for w in numbers if columns[0] <= (w['x0'] + w['x1']) / 2 < columns[1])
+        if placed != line_numbers:
+            return None  # A line item outside the grid
+        return tables
+
+    def release(self, keep_text=False):
+        """Drop pdfplumber's parsed page objects, and the text unless keep_text - for callers done
+        with the page. Tables and words stay; anything else is extracted again on use."""
+        if not keep_text:
+            self._text = None
+        self.page.close()
+
+    @staticmethod
+    def detect_tables(page):
+        """extract_tables, skipping pages without ruled lines - the default "lines" strategy
+        can't find a table without them"""
+        if not (page.lines or page.rects or page.curves):
+            return []
+        return page.extract_tables()
+
+    @property
+    def words(self):
+        """Page words with coordinates - shared by the address extractors"""
+        if self._words is None:
+            self._words = self.page.extract_words()
+        return self._words
+
+    @property
+    def word_index(self):
+        """WordIndex of the page words - built once, for label, line and band queries"""
+        if self._word_index is None:
+            self._word_index = WordIndex(self.words)
+        return self._word_index
+
+
+class PDFAnalysis:
+    """Per-document page analysis shared by every parser and extractor"""
+
+    def __init__(self, pdf, stats=None):
+        self.pdf = pdf
+        self.stats = stats
+        self.pages = [PageAnalysis(page, stats) for page in pdf.pages]
+        if stats is not None:
+            stats['pages'] = len(self.pages)
+        self.layout = None
+        self.layout_key = None  # (fingerprint, scan bottom) once looked up
+        self._full_text = None
+
+    @property
+    def full_text(self):
+        """Text of all pages joined with newlines"""
+        if self._full_text is None:
+            self._full_text = "".join(page.text + "\n" for page in self.pages)
+        return self._full_text
+
+    @property
+    def first_page(self):
+        return self.pages[0] if self.pages else None
+
+    def has_tables(self):
+        """True if any page has a table (stops at the first one found)
+
+        Pages without tables are read to text on the way and their pdfplumber objects dropped -
+        both parsers need the text, and a long text-layout PO then holds one parsed page at a time.
+        Page 1 keeps its objects for the address extractors.
+        """
+        first_page = self.first_page
+        if first_page and first_page.layout_tables():
+            return True  # The template's grid is on page 1
+        for page in self.pages:
+            if page.tables:
+                return True
+            if page is not first_page:
+                page.text
+                page.release(keep_text=True)
+        return False
+
+    def use_layout(self, template):
+        """Read the pages with a layout template's geometry (None for full detection)"""
+        self.layout = template
+        for page in self.pages:
+            page.layout = template
+            page._layout_tables = None
+
+    def with_layout(self, template):
+        """Another analysis of the same pages that uses template - shares the extracted text and
+        words, keeps no stats"""
+        other = PDFAnalysis(self.pdf)
+        for page, done in zip(other.pages, self.pages):
+            page._text, page._words = done._text, done._words
+            page._tables, page._line_item_tables = done._tables, done._line_item_tables
+        other.use_layout(template)
+        return other
+
+    def layout_box(self, name):
+        """(label top, stop top) of an address block from the layout template, or None"""
+        box = self.layout.get(name) if self.layout else None
+        return tuple(box) if box else None
+
+
+class PDFExtractor:
+    def __init__(self):
+        self.settings_file = os.path.join(os.path.expanduser("~"), ".pdf_extractor_settings.json")
+        # Resolved folder IDs per (email, folder text) - saves walking every account
+        self.folder_cache_file = os.path.join(os.path.expanduser("~"), ".pdf_extractor_folders.json")
+        self.folder_search_depth = 8
+        # LayoutTemplates store - set it to read known layouts from learned geometry
+        self.layout_templates = None
+        # Don't store outlook - create fresh connection each time
+    
+    def load_settings(self):
+        """Saved settings, or {} if there are none"""
+        try:
+            if os.path.exists(self.settings_file):
+                with open(self.settings_file, 'r') as f:
+                    return json.load(f)
+        except:
+            pass
+        return {}
+        
+    def connect_outlook(self):
+        """Connect to Outlook - creates fresh connection each time"""
+        try:
+            import win32com.client
+            
+            # Create a new connection each time
+            outlook = win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
+            return outlook
+        except Exception as e:
+            update_progress(f"Error connecting to Outlook: {e}")
+            raise
+    
+    def find_folder(self, outlook, email_addr, folder_text):
+        """Find folder in Outlook - reopens the cached location, walks accounts on a miss"""
+        cache_key = f"{email_addr}|{folder_text}".lower()
+        folder = self.open_cached_folder(outlook, cache_key, folder_text)
+        if folder:
+            return folder
+        
+        try:
+            folder = None
+            # Try to get account by email
+            for account in outlook.Folders:
+                if email_addr.lower() in account.Name.lower():
+                    folder = self.search_subfolder(account, folder_text)
+                    break
+            else:
+                # If not found, search all folders
+                for account in outlook.Folders:
+                    folder = self.search_subfolder(account, folder_text)
+                    if folder:
+                        break
+            
+            if folder:
+                self.remember_folder(cache_key, folder)
+            return folder
+        except Exception as e:
+            update_progress(f"Error finding folder: {e}")
+            return None
+    
+    def search_subfolder(self, parent_folder, search_text, max_depth=None):
+        """Breadth-first search for a subfolder - finds the shallowest match, stops at max_depth"""
+        if max_depth is None:
+            max_depth = self.folder_search_depth
+        search_text = search_text.lower()
+        pending = deque([(parent_folder, 0)])
+        while pending:
+            folder, depth = pending.popleft()
+            try:
+                if search_text in folder.Name.lower():
+                    return folder
+                if depth < max_depth:
+                    for subfolder in folder.Folders:
+                        pending.append((subfolder, depth + 1))
+            except:
+                continue  # Inaccessible folder (e.g. permissions) - skip it
+        return None
+    
+    def load_folder_cache(self):
+        try:
+            if os.path.exists(self.folder_cache_file):
+                with open(self.folder_cache_file, 'r') as f:
+                    return json.load(f)
+        except:
+            pass
+        return {}
+    
+    def open_cached_folder(self, outlook, cache_key, folder_text):
+        """Reopen a previously found folder by ID; None if not cached or the ID went stale"""
+        entry = self.load_folder_cache().get(cache_key)
+        if not entry:
+            return None
+        try:
+            folder = outlook.GetFolderFromID(entry['entry_id'], entry['store_id'])
+            # Folder may have been renamed or the ID reused - must still match the search text
+            if folder_text.lower() in folder.Name.lower():
+                update_progress("Using cached folder location")
+                return folder
+        except Exception:
+            pass
+        update_progress("Cached folder location is stale, searching again")
+        return None
+    
+    def remember_folder(self, cache_key, folder):
+        """Cache the folder's StoreID/EntryID for the next run"""
+        try:
+            cache = self.load_folder_cache()
+            cache[cache_key] = {'store_id': folder.StoreID, 'entry_id': folder.EntryID}
+            with open(self.folder_cache_file, 'w') as f:
+                json.dump(cache, f, indent=2)
+        except Exception as e:
+            update_progress(f"Warning: Could not cache folder location: {e}")
+    
+    def build_restrict_filter(self, subject_text, start_date, end_date):
+        """Build a DASL query for Items.Restrict so Outlook does the filtering server-side.
+        
+        The query is a superset of what filter_emails accepts - the Python checks still verify
+        every item, so the date bounds get a day of slack for time zones (DASL compares in UTC).
+        """
+        def dasl_date(value):
+            # Naive dates are local midnight; ISO format parses the same in every Outlook locale
+            return value.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M')
+        
+        conditions = [
+            '"http://schemas.microsoft.com/mapi/proptag/0x001A001F" LIKE \'IPM.Note%\'',  # Message class
+            '"urn:schemas:httpmail:hasattachment" = 1'
+        ]
+        if subject_text:
+            escaped = subject_text.replace("'", "''")
+            conditions.append(f'"urn:schemas:httpmail:subject" LIKE \'%{escaped}%\'')
+        if start_date:
+            conditions.append(f'"urn:schemas:httpmail:datereceived" >= \'{dasl_date(start_date - timedelta(days=1))}\'')
+        if end_date:
+            # End date is inclusive (whole day), plus a day of slack
+            conditions.append(f'"urn:schemas:httpmail:datereceived" < \'{dasl_date(end_date + timedelta(days=2))}\'')
+        return "@SQL=" + " AND ".join(f"({c})" for c in conditions)
+    
+    def filter_emails(self, folder, subject_text, start_date, end_date):
+        """Filter emails by criteria - Outlook narrows the items, EXACT ORIGINAL LOGIC verifies them"""
+        return list(self.iter_matching_emails(folder, subject_text, start_date, end_date))
+    
+    def iter_matching_emails(self, folder, subject_text, start_date, end_date):
+        """filter_emails one item at a time - callers that keep only IDs never hold every MailItem"""
+        try:
+            items = folder.Items
+            
+            # Let Outlook filter first instead of reading every item over COM
+            restriction = self.build_restrict_filter(subject_text, start_date, end_date)
+            try:
+                items = items.Restrict(restriction)
+            except Exception as e:
+                update_progress(f"Warning: Outlook filter not supported, scanning all items: {e}")
+                items = folder.Items
+            
+            items.Sort("[ReceivedTime]", True)  # Sort by received time, descending
+            
+            for item in items:
+                try:
+                    # Check if it's a mail item
+                    if item.Class != 43:  # 43 = olMail
+                        continue
+                    
+                    if not self.email_matches(item.Subject, item.ReceivedTime, subject_text, start_date, end_date):
+                        continue
+                except:
+                    continue
+                yield item
+        
+        except Exception as e:
+            update_progress(f"Error filtering emails: {e}")
+    
+    def email_matches(self, subject, received_date, subject_text, start_date, end_date):
+        """Check subject and received date against the filter - EXACT ORIGINAL LOGIC"""
+        # Check subject
+        if subject_text and subject_text.lower() not in (subject or "").lower():
+            return False
+        
+        # Check date range
+        try:
+            # Compare just the date parts (year, month, day) to avoid type issues
+            received_date_only = datetime(received_date.year, received_date.month, received_date.day)
+            
+            # Check start date
+            if start_date and received_date_only < start_date:
+                return False
+            
+            # Check end date
+            if end_date and received_date_only > end_date:
+                return False
+        except Exception as date_err:
+            # If date conversion fails, log and skip date check for this email
+            update_progress(f"    Warning: Date conversion failed: {date_err}")
+        
+        return True
+    
+    def parse_pdf(self, pdf_path, pdf_name, stats=None, report=update_progress):
+        """Parse PDF using pdfplumber - EXACT ORIGINAL LOGIC
+        
+        stats (from new_parse_stats) collects page/table counts and stage timings.
+        report receives the progress messages (parse_pdf_job collects them for the pool).
+        """
+        import pdfplumber
+        data = []
+        start = time.perf_counter()
+        
+        try:
+            with pdfplumber.open(pdf_path) as pdf:
+                # Text, tables and words are computed once per page and shared
+                analysis = PDFAnalysis(pdf, stats)
+                template = self.match_layout(analysis, report)
+                
+                # Check for tables
+                has_tables = analysis.has_tables()
+                
+                report(f"    Tables detected: {has_tables}")
+                
+                # Use table-based parsing if available
+                if has_tables:
+                    data = self.parse_pdf_tables(analysis, pdf_name, report)
+                else:
+                    data = self.parse_pdf_text(analysis, pdf_name, report)
+                if stats is not None:
+                    stats['parser'] = 'tables' if has_tables else 'text'
+                
+                report(f"    Extracted {len(data)} line items")
+                
+                if template is None and self.layout_templates is not None:
+                    self.learn_layout(analysis, pdf_name, data, 'tables' if has_tables else 'text', report)
+        
+        except Exception as e:
+            report(f"    ERROR parsing PDF: {e}")
+        
+        if stats is not None:
+            stats['seconds']['total'] = time.perf_counter() - start
+        return data
+    
+    def match_layout(self, analysis, report=update_progress):
+        """Apply the learned template of this PDF's layout. Returns the template (also one marked
+        as not fitting), or None for a layout not seen before or without a template store."""
+        from layout_templates import layout_fingerprint
+        
+        if self.layout_templates is None or not analysis.first_page:
+            return None
+        try:
+            with timed(analysis.stats, 'layout'):
+                analysis.layout_key = layout_fingerprint(analysis.first_page)
+                template = self.layout_templates.get(analysis.layout_key[0])
+        except Exception as e:
+            report(f"    Warning: Layout template lookup failed: {e}")
+            return None
+        if template and template.get('layout'):
+            analysis.use_layout(template)
+            if analysis.stats is not None:
+                analysis.stats['layout'] = 'matched'
+        return template
+    
+    def learn_layout(self, analysis, pdf_name, data, parser, report=update_progress):
+        """Store this PDF's layout as a template - only if reading the PDF with the template gives
+        exactly the rows full detection gave. Otherwise the layout is marked as not fitting."""
+        from layout_templates import header_columns
+        
+        if not data or not analysis.layout_key:
+            return
+        fingerprint, scan_bottom = analysis.layout_key
+        first_page = analysis.first_page
+        try:
+            with timed(analysis.stats, 'layout'):
+                template = {'layout': parser}
+                # Address anchors only from the fingerprinted area, so every PDF with this
+                # fingerprint has them in the same place
+                for name, find_box in (('ship_to', self.ship_to_box), ('ordering_office', self.ordering_office_box)):
+                    box = find_box(first_page)
+                    if box and None not in box and max(box) < scan_bottom - 10:
+                        template[name] = list(box)
+                if parser == 'tables':
+                    template['columns'] = header_columns(first_page)
+                
+                # The check parse reports nothing - the PDF's messages were already shown
+                check = analysis.with_layout(template)
+                quiet = lambda message: None
+                if parser == 'tables':
+                    rows = self.parse_pdf_tables(check, pdf_name, report=quiet)
+                else:
+                    rows = self.parse_pdf_text(check, pdf_name, report=quiet)
+                if rows != data or (parser == 'tables' and not check.first_page.layout_tables()):
+                    template = {'layout': None}
+                self.layout_templates.put(fingerprint, template)
+            if analysis.stats is not None:
+                analysis.stats['layout'] = 'learned' if template['layout'] else 'unfit'
+        except Exception as e:
+            report(f"    Warning: Could not learn layout template: {e}")
+    
+    def parse_pdf_tables(self, analysis, pdf_name, report=update_progress):
+        """Parse PDF using table extraction - handles multi-page line items - EXACT ORIGINAL LOGIC
+        report receives the progress messages (learn_layout's check parse discards them)."""
+        data = []
+        
+        try:
+            # Extract order info from text and coordinates
+            full_text = analysis.full_text
+            
+            order_number = self.extract_order_number(full_text)
+            order_date = self.extract_order_date(full_text)
+            
+            # Use first page for coordinate-based extraction of addresses
+            first_page = analysis.first_page
+            with timed(analysis.stats, 'addresses'):
+                ship_to = self.extract_ship_to_coordinates(
+                    first_page, analysis.layout_box('ship_to'), report) if first_page else ""
+                ordering_office = self.extract_ordering_office_coordinates(
+                    first_page, analysis.layout_box('ordering_office'), report) if first_page else ""
+            
+            # Track column mappings for continuation pages
+            col_line = 0  # Line is always first
+            col_part = None
+            col_date = None
+            col_qty = None
+            col_unit_price = None
+            col_amount = None
+            found_header = False
+            
+            # Look for line items table - check all pages
+            for page_num, page in enumerate(analysis.pages):
+                # Only the line-item band of each page - headers, terms and footers are never line items
+                tables = page.line_item_tables
+                
+                # Check all tables on this page
+                for table_idx, table in enumerate(tables):
+                    if not table or len(table) < 1:
+                        continue
+                    
+                    # Try to detect if this is a line items table
+                    first_row = table[0]
+                    first_cell = str(first_row[0]).strip() if first_row and first_row[0] else ""
+                    
+                    # Check if first row is a header (contains "Line" and "Part")
+                    is_header = False
+                    if len(table) >= 2:
+                        header = ' '.join([str(cell) for cell in first_row if cell])
+                        if 'Line' in header and 'Part' in header:
+                            is_header = True
+                            found_header = True
+                            
+                            # Parse column indices from header
+                            col_line = 0  # Line is always first
+                            for idx, cell in enumerate(first_row):
+                                if cell:
+                                    cell_lower = str(cell).lower()
+                                    if 'part' in cell_lower:
+                                        col_part = idx
+                                    elif 'delivery' in cell_lower or 'date' in cell_lower:
+                                        col_date = idx
+                                    elif 'quantity' in cell_lower:
+                                        col_qty = idx
+                                    elif 'unit price' in cell_lower or 'price' in cell_lower:
+                                        col_unit_price = idx
+                                    elif 'amount' in cell_lower or 'total' in cell_lower:
+                                        col_amount = idx
+                    
+                    # Check if this is a continuation table (starts with line number like "4.1")
+                    is_continuation = False
+                    if not is_header and found_header and re.match(r'^\d+\.\d+$', first_cell):
+                        is_continuation = True
+
+                        # For continuation tables, detect columns from first data row
+                        # because page breaks can shift column positions (extra None columns may appear)
+                        if len(first_row) > 1:
+                            # Find all decimal number columns (prices/amounts) from right to left
+                            # Amount is always the rightmost decimal column, Unit Price is second from right
+                            decimal_columns = []
+
+                            # Examine first row to find column positions
+                            for idx, cell in enumerate(first_row):
+                                cell_str = str(cell).strip() if cell else ""
+                                # Date column - look for date pattern
+                                if re.search(r'\d{1,2}-[A-Za-z]{3}-\d{4}', cell_str):
+                                    col_date = idx
+                                # Quantity - numeric value (but not price with decimal)
+                                elif cell_str.isdigit():
+                                    col_qty = idx
+                                # UOM - typically "Each"
+                                elif cell_str.lower() == 'each':
+                                    pass  # We don't need UOM column index
+                                # Decimal numbers - collect all, then assign unit price/amount from right
+                                elif re.match(r'^[\d,]+\.\d{2,}$', cell_str):
+                                    decimal_columns.append(idx)
+
+                            # Assign columns: Amount is rightmost, Unit Price is second from right
+                            if len(decimal_columns) >= 2:
+                                col_unit_price = decimal_columns[-2]
+                                col_amount = decimal_columns[-1]
+                            elif len(decimal_columns) == 1:
+                                # Only one decimal found - likely amount only
+                                col_amount = decimal_columns[-1]
+                    
+                    # Skip if this is neither a header table nor a continuation
+                    if not is_header and not is_continuation:
+                        continue
+                    
+                    # Process data rows (skip header if present)
+                    start_row = 1 if is_header else 0
+                    for row in table[start_row:]:
+                        if not row:
+                            continue
+                        
+                        line_num = str(row[col_line]).strip() if row[col_line] else ""
+                        
+                        # Check if valid line number (e.g., "1.1", "2.1", "4.1")
+                        if re.match(r'^\d+\.\d+$', line_num):
+                            part_num = str(row[col_part]).strip() if col_part and len(row) > col_part and row[col_part] else ""
+                            delivery_date = str(row[col_date]).strip() if col_date and len(row) > col_date and row[col_date] else ""
+                            quantity = str(row[col_qty]).strip() if col_qty and len(row) > col_qty and row[col_qty] else ""
+                            unit_price = str(row[col_unit_price]).strip() if col_unit_price and len(row) > col_unit_price and row[col_unit_price] else ""
+                            amount = str(row[col_amount]).strip() if col_amount and len(row) > col_amount and row[col_amount] else ""
+                            
+                            # Clean part number (remove /REV: and newlines)
+                            if '/' in part_num:
+                                part_num = part_num.split('/')[0].strip()
+                            part_num = part_num.replace('\n', ' ').strip()
+                            
+                            # Format delivery date to YYYYMMDD
+                            delivery_date = self.format_date_to_yyyymmdd(delivery_date)
+                            
+                            data.append({
+                                'pdf_file': pdf_name,
+                                'order_number': order_number,
+                                'order_date': order_date,
+                                'line': line_num,
+                                'part_number': part_num,
+                                'quantity': quantity,
+                                'unit_price': unit_price,
+                                'amount': amount,
+                                'delivery_date': delivery_date,
+                                'ship_to': ship_to,
+                                'ordering_office': ordering_office
+                            })
+
+            # Fallback: Check for line items in raw text that weren't captured by table extraction
+            # This handles cases where pdfplumber doesn't include a row in the table boundaries
+            extracted_lines = {item['line'] for item in data}
+            page_text = page.text
+
+            # Pattern to match line items in text format:
+            # "11.1 13P1025X001-7001 / REV: A 12-DEC-2025 540 Each 12.0700 6,517.8000"
+            text_line_pattern = re.compile(
+                r'^(\d+\.\d+)\s+'  # Line number (e.g., "11.1")
+                r'(\S+)\s*/\s*REV:\s*\S+\s+'  # Part number with REV
+                r'(\d{1,2}-[A-Z]{3}-\d{4})\s+'  # Delivery date (e.g., "12-DEC-2025")
+                r'(\d+)\s+'  # Quantity
+                r'Each\s+'  # UOM
+                r'([\d.]+)\s+'  # Unit price
+                r'([\d,.]+)',  # Amount
+                re.MULTILINE | re.IGNORECASE
+            )
+
+            for match in text_line_pattern.finditer(page_text):
+                line_num = match.group(1)
+                if line_num not in extracted_lines:
+                    part_num = match.group(2).strip()
+                    delivery_date = self.format_date_to_yyyymmdd(match.group(3))
+                    quantity = match.group(4)
+                    unit_price = match.group(5)
+                    amount = match.group(6).replace(',', '')
+
+                    report(f"    Recovered line {line_num} from text (outside table boundary)")
+
+                    data.append({
+                        'pdf_file': pdf_name,
+                        'order_number': order_number,
+                        'order_date': order_date,
+                        'line': line_num,
+                        'part_number': part_num,
+                        'quantity': quantity,
+                        'unit_price': unit_price,
+                        'amount': amount,
+                        'delivery_date': delivery_date,
+                        'ship_to': ship_to,
+                        'ordering_office': ordering_office
+                    })
+                    extracted_lines.add(line_num)
+
+        except Exception as e:
+            report(f"    Error in table parsing: {e}")
+
+        # Sort data by line number to maintain order
+        data.sort(key=lambda x: float(x['line']) if x['line'] else 0)
+
+        return data
+    
+    def parse_pdf_text(self, analysis, pdf_name, report=update_progress):
+        """Parse PDF using text extraction (for vertical format) - EXACT ORIGINAL LOGIC
+        
+        One forward pass over the lines, a page at a time: a line number opens an item that reads
+        the next 10 lines for its part number, delivery date, quantity and price. Items overlap, so
+        several are open at once. Each page's text is released once its lines are read.
+        """
+        data = []
+        
+        try:
+            # Use coordinate-based extraction for addresses
+            first_page = analysis.first_page
+            with timed(analysis.stats, 'addresses'):
+                ship_to = self.extract_ship_to_coordinates(
+                    first_page, analysis.layout_box('ship_to'), report) if first_page else ""
+                ordering_office = self.extract_ordering_office_coordinates(
+                    first_page, analysis.layout_box('ordering_office'), report) if first_page else ""
+            
+            # Order number/date: first match in the document - a match can't span pages
+            order = {'number': "", 'date': ""}
+            
+            def text_lines():
+                """Lines of the document text, page by page"""
+                for page in analysis.pages:
+                    text = page.text
+                    if not order['number']:
+                        order['number'] = self.extract_order_number(text)
+                    if not order['date']:
+                        order['date'] = self.extract_order_date(text)
+                    page.release()
+                    yield from text.split('\n')
+                yield ""  # The document text ends with a newline
+            
+            # Find line items section
+            in_line_items = False
+            open_items = deque()  # Items still reading their 10-line window, oldest first
+            items = []
+            
+            for line in text_lines():
+                line = line.strip()
+                
+                # Feed the line to the items opened on the lines before it
+                for item in open_items:
+                    item['window'] -= 1
+                    
+                    # Get part number from next line
+                    if item['part_num'] is None:
+                        item['part_num'] = line.split('/')[0].strip() if '/' in line else line
+                    
+                    # Check for date pattern
+                    if not item['delivery_date']:
+                        date_match = DATE_IN_TEXT.search(line)
+                        if date_match:
+                            item['delivery_date'] = date_match.group()
+                    
+                    # Check for quantity (numeric, after date)
+                    if item['delivery_date'] and not item['quantity']:
+                        if line.isdigit() and len(line) < 10:
+                            item['quantity'] = line
+                    
+                    # Check for price patterns (e.g., "$12.34" or "12.34")
+                    if not item['unit_price']:
+                        price_match = PRICE_IN_TEXT.search(line)
+                        if price_match and not item['amount']:
+                            item['unit_price'] = price_match.group()
+                        elif price_match:
+                            item['amount'] = price_match.group()
+                while open_items and open_items[0]['window'] == 0:
+                    items.append(open_items.popleft())
+                
+                # Detect start of line items
+                if not in_line_items and 'line' in line.lower() and len(line) < 50:
+                    in_line_items = True
+                    continue
+                
+                # Check for line number (e.g., "1.1", "2.1")
+                if in_line_items and LINE_NUMBER.match(line):
+                    open_items.append({'line': line, 'part_num': None, 'delivery_date': "", 'quantity': "",
+                                       'unit_price': "", 'amount': "", 'window': 10})
+            items.extend(open_items)  # Windows cut short by the end of the document
+            
+            for item in items:
+                if item['part_num']:
+                    data.append({
+                        'pdf_file': pdf_name,
+                        'order_number': order['number'],
+                        'order_date': order['date'],
+                        'line': item['line'],
+                        'part_number': item['part_num'],
+                        'quantity': item['quantity'],
+                        'unit_price': item['unit_price'],
+                        'amount': item['amount'],
+                        # Format delivery date to YYYYMMDD
+                        'delivery_date': self.format_date_to_yyyymmdd(item['delivery_date']),
+                        'ship_to': ship_to,
+                        'ordering_office': ordering_office
+                    })
+        
+        except Exception as e:
+            report(f"    Error in text parsing: {e}")
+        
+        return data
+    
+    def extract_order_number(self, text):
+        """Extract 10-digit order number - EXACT ORIGINAL LOGIC"""
+        match = re.search(r'\b(\d{10})\b', text)
+        return match.group(1) if match else ""
+    
+    def extract_order_date(self, text):
+        """Extract order date and format as YYYYMMDD - EXACT ORIGINAL LOGIC"""
+        match = re.search(r'\d{1,2}-[A-Za-z]{3}-\d{4}', text)
+        if match:
+            try:
+                # Parse the date (format like "1-Jan-2024")
+                date_obj = datetime.strptime(match.group(), "%d-%b-%Y")
+                # Return in YYYYMMDD format
+                return date_obj.strftime("%Y%m%d")
+            except ValueError:
+                # If parsing fails, return the original
+                return match.group()
+        return ""
+    
+    def format_date_to_yyyymmdd(self, date_str):
+        """Convert date string to YYYYMMDD format - EXACT ORIGINAL LOGIC"""
+        if not date_str:
+            return ""
+        try:
+            # Parse the date (format like "1-Jan-2024" or "01-Jan-2024")
+            date_obj = datetime.strptime(date_str.strip(), "%d-%b-%Y")
+            # Return in YYYYMMDD format
+            return date_obj.strftime("%Y%m%d")
+        except ValueError:
+            # If parsing fails, return the original
+            return date_str
+    
+    def ship_to_box(self, page):
+        """(Ship To label top, Payment Terms top or None), or None without the label - EXACT ORIGINAL LOGIC"""
+        index = page.word_index
+        
+        # Find "Ship To Address" label position
+        ship_label = index.first('Ship', below=100)  # Skip header
+        ship_label_y = ship_label['top'] if ship_label else None
+        
+        if not ship_label_y:
+            return None
+        
+        # Find "Payment Terms" label to know where to stop
+        payment_terms = index.first('Payment', below=ship_label_y)
+        payment_terms_y = payment_terms['top'] if payment_terms else None
+        return ship_label_y, payment_terms_y
+    
+    def extract_ship_to_coordinates(self, page, box=None, report=update_progress):
+        """Extract ship to address using pdfplumber coordinate-based extraction - EXACT ORIGINAL LOGIC
+        
+        box: (label top, stop top) from a layout template - skips the label search.
+        """
+        try:
+            box = box or self.ship_to_box(page)
+            if not box:
+                return ""
+            ship_label_y, payment_terms_y = box
+            
+            # Extract words in LEFT column (x < 300) between ship_label and payment_terms
+            ship_words = []
+            # Must be below the "Ship To Address" label (start below the label) and above "Payment Terms"
+            for word in page.word_index.below(ship_label_y + 10, payment_terms_y or None):
+                # Left column only (ship-to, not invoice)
+                if word['x0'] < 300:  # Adjust threshold as needed
+                    ship_words.append((word['top'], word['x0'], word['text']))
+            
+            # Sort by y-coordinate first, then x-coordinate (to get correct reading order)
+            ship_words.sort(key=lambda w: (w[0], w[1]))
+            
+            # Group words by line (same Y coordinate within tolerance)
+            lines = []
+            current_line = []
+            last_y = None
+            
+            for word_y, word_x, text in ship_words:
+                if last_y is None or abs(word_y - last_y) < 2:  # Same line
+                    current_line.append(text)
+                    last_y = word_y
+                else:  # New line
+                    if current_line:
+                        lines.append(' '.join(current_line))
+                    current_line = [text]
+                    last_y = word_y
+            
+            if current_line:  # Don't forget the last line
+                lines.append(' '.join(current_line))
+            
+            # Join all lines and clean up
+            address = ', '.join(lines[:5])  # Limit to first 5 lines
+            address = address.replace(', ,', ',').strip(' ,')
+            return address[:300] if address else ""
+        
+        except Exception as e:
+            report(f"Error in coordinate extraction for ship_to: {e}")
+            return ""
+    
+    def ordering_office_box(self, page):
+        """(Ordering Office label top, Supplier Contact/Buyer top or None), or None without the label - EXACT ORIGINAL LOGIC"""
+        index = page.word_index
+        
+        # Find "Ordering Office" label position
+        ordering_label = index.first('Ordering')
+        ordering_label_y = ordering_label['top'] if ordering_label else None
+        
+        if not ordering_label_y:
+            return None
+        
+        # Find "Supplier Contact" or "Buyer" to know where to stop
+        stop_y = None
+        for position in index.containing('Supplier', 'Buyer'):
+            word = index.words[position]
+            if word['top'] > ordering_label_y:
+                if 'Supplier' in word['text'] and 'Contact' in [w['text'] for w in index.on_line(word['top'], 5)]:
+                    stop_y = word['top']
+                    break
+                if 'Buyer' in word['text']:
+                    stop_y = word['top']
+                    break
+        return ordering_label_y, stop_y
+    
+    def extract_ordering_office_coordinates(self, page, box=None, report=update_progress):
+        """Extract ordering office using pdfplumber coordinate-based extraction - EXACT ORIGINAL LOGIC
+        
+        box: (label top, stop top) from a layout template - skips the label search.
+        """
+        try:
+            box = box or self.ordering_office_box(page)
+            if not box:
+                return ""
+            ordering_label_y, stop_y = box
+            
+            # Extract words in RIGHT column (x > 300) between ordering_label and stop
+            ordering_words = []
+            # Must be below the "Ordering Office" label
+            for word in page.word_index.below(ordering_label_y + 10, stop_y or None):
+                # Right column only (x > 300)
+                if word['x0'] > 300:
+                    ordering_words.append((word['top'], word['x0'], word['text']))
+            
+            # Sort by y-coordinate first, then x-coordinate (to get correct reading order)
+            ordering_words.sort(key=lambda w: (w[0], w[1]))
+            
+            # Group words by line (same Y coordinate within tolerance)
+            lines = []
+            current_line = []
+            last_y = None
+            
+            for word_y, word_x, text in ordering_words:
+                if last_y is None or abs(word_y - last_y) < 2:  # Same line
+                    current_line.append(text)
+                    last_y = word_y
+                else:  # New line
+                    if current_line:
+                        lines.append(' '.join(current_line))
+                    current_line = [text]
+                    last_y = word_y
+            
+            if current_line:  # Don't forget the last line
+                lines.append(' '.join(current_line))
+            
+            # Join all lines and clean up
+            office = ', '.join(lines[:6])  # Limit to first 6 lines
+            office = office.replace(', ,', ',').strip(' ,')
+            return office[:300] if office else ""
+        
+        except Exception as e:
+            report(f"Error in coordinate extraction for ordering_office: {e}")
+            return ""
+    
+    def normalize_output_frame(self, df):
+        """Convert title-case output columns to the stored types - EXACT ORIGINAL LOGIC"""
+        import pandas as pd
+        # Convert numeric columns to proper numeric types
+        numeric_columns = ['Quantity', 'Unit Price', 'Amount']
+        for col in numeric_columns:
+            if col in df.columns:
+                # Remove commas and convert to numeric
+                df[col] = df[col].astype(str).str.replace(',', '')
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+        
+        # Convert identifier columns to numeric to prevent Excel warnings
+        # Order Number: convert to integer
+        if 'Order Number' in df.columns:
+            df['Order Number'] = pd.to_numeric(df['Order Number'], errors='coerce').astype('Int64')
+        
+        # Line: keep as string
+        if 'Line' in df.columns:
+            df['Line'] = df['Line'].astype(str)
+        
+        return df
+    
+    def write_output(self, output_path, data, export=True, stats=None):
+        """Upsert data into the output store, then export it to Excel or CSV - WITH RETRY
+        
+        The store (PO_Data.sqlite next to PO_Data.xlsx) is keyed on (PDF File, Order Number, Line),
+        so a run costs O(new rows) there; export=False skips the file export.
+        stats ({'seconds': {}}) gets row counts and upsert/export timings.
+        """
+        if not data:
+            update_progress("Warning: No data to write")
+            return
+        writer = self.open_output(output_path, chunk_rows=None, stats=stats)
+        try:
+            writer.add(data)
+            self.finish_output(writer, export)
+        finally:
+            writer.close()
+    
+    def open_output(self, output_path, chunk_rows=None, stats=None):
+        """OutputWriter for output_path - rows added to it are upserted into the store every
+        chunk_rows rows (None: on finish_output)"""
+        from output_store import OutputWriter
+        
+        output_path = os.path.abspath(os.path.normpath(output_path))
+        return OutputWriter(output_path, self.normalize_output_frame, chunk_rows, stats)
+    
+    def finish_output(self, writer, export=True):
+        """Upsert the writer's last rows, then export the store to Excel or CSV.
+        Rows already in the store stay there if the export fails - calling it again retries the export."""
+        stats = writer.stats
+        try:
+            writer.flush()
+            if writer.store is None:
+                writer.open()  # Resumed run whose rows all reached the store before it stopped
+            total_rows = writer.store.count()
+            if stats is not None:
+                stats.update(rows_written=writer.rows_written, rows_replaced=writer.rows_replaced,
+                             rows_total=total_rows)
+            if writer.rows_replaced > 0:
+                update_progress(f"Removed {writer.rows_replaced} duplicate line items")
+            update_progress(f"Appended {writer.rows_written} new rows, total rows: {total_rows}")
+            
+            if not export:
+                update_progress(f"Export skipped - data saved in {writer.store.path}")
+                return
+            with timed(stats, 'export'):
+                # Without replacements the new rows are exactly those after the writer's start
+                self.export_output(writer.output_path, writer.store,
+                                   writer.start_rowid if writer.rows_replaced == 0 else None)
+        
+        except PermissionError:
+            # Excel file is open - re-raise to be handled by retry logic
+            update_progress("ERROR: Cannot write to file (file is open or locked)")
+            raise
+        except Exception as e:
+            update_progress(f"Error writing output file: {e}")
+            raise
+    
+    def export_output(self, output_path, store=None, appended_since=None):
+        """Write the output file from the store. appended_since: rowid after which only new rows were
+        added (no replacements) - for a CSV unchanged since an export ending there, only those rows
+        are appended instead of rewriting the file."""
+        from output_store import OutputStore
+        
+        output_path = os.path.abspath(os.path.normpath(output_path))
+        own_store = store is None
+        if own_store:
+            store = OutputStore(OutputStore.path_for(output_path)).open()
+        try:
+            if output_path.endswith('.xlsx'):
+                # Write Excel with proper formatting and auto-fit columns
+                self.write_excel_with_formatting(output_path, store.to_dataframe())
+                update_progress(f"Excel file written successfully: {output_path}")
+            else:
+                if appended_since is not None and store.csv_is_current(output_path, appended_since):
+                    # Read back from the store - same number formatting as a full export
+                    store.to_dataframe(appended_since).to_csv(output_path, mode='a', header=False,
+                                                              index=False, encoding='utf-8')
+                else:
+                    store.to_dataframe().to_csv(output_path, index=False, encoding='utf-8')
+                store.remember_export(output_path)
+                update_progress(f"CSV file written successfully: {output_path}")
+        finally:
+            if own_store:
+                store.close()
+    
+    def excel_column_widths(self, df):
+        """Auto-fit widths from the DataFrame (vectorized) - same rule as the old per-cell walk:
+        longest non-empty value or header, plus 2, capped at 50"""
+        widths = []
+        for col in df.columns:
+            values = df[col].dropna()
+            values = values[values.astype(bool)]  # Empty/zero cells never counted
+            max_length = int(values.astype(str).str.len().max()) if len(values) else 0
+            widths.append(min(max(max_length, len(str(col))) + 2, 50))  # Cap at 50 characters
+        return widths
+    
+    def write_excel_with_formatting(self, output_path, df):
+        """Write DataFrame to Excel in one streaming pass with formatting and auto-fit columns
+        
+        Uses openpyxl's write-only mode: widths are computed from the DataFrame and number formats
+        are decided per column up front, so the workbook is never loaded back into memory.
+        """
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Alignment, Border, Font, Side
+        from openpyxl.utils import get_column_letter
+        
+        # Order Number as integer (no decimals, no separators), quantities without decimals,
+        # prices with 2 decimals; Line column is kept as text (no special formatting needed)
+        column_formats = {
+            'Order Number': '0',
+            'Quantity': '#,##0',
+            'Unit Price': '#,##0.00',
+            'Amount': '#,##0.00',
+        }
+        
+        try:
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet('PO Data')
+            
+            for idx, width in enumerate(self.excel_column_widths(df), 1):
+                ws.column_dimensions[get_column_letter(idx)].width = width
+            
+            # Header styled like pandas' to_excel header
+            thin = Side(style='thin')
+            header_font = Font(bold=True)
+            header_border = Border(left=thin, right=thin, top=thin, bottom=thin)
+            header_alignment = Alignment(horizontal='center', vertical='top')
+            header = []
+            for col in df.columns:
+                cell = WriteOnlyCell(ws, value=str(col))
+                cell.font = header_font
+                cell.border = header_border
+                cell.alignment = header_alignment
+                header.append(cell)
+            ws.append(header)
+            
+            formats = [column_formats.get(col) for col in df.columns]
+            values = df.astype(object).where(df.notna(), None)
+            for row in values.itertuples(index=False, name=None):
+                cells = []
+                for value, number_format in zip(row, formats):
+                    if number_format and value is not None:
+                        cell = WriteOnlyCell(ws, value=value)
+                        cell.number_format = number_format
+                        cells.append(cell)
+                    else:
+                        cells.append(value)
+                ws.append(cells)
+            
+            wb.save(output_path)
+        
+        except PermissionError:
+            # File is locked or open - re-raise to trigger retry logic
+            update_progress("ERROR: Cannot write Excel file (file is open or locked)")
+            raise
+        except Exception as e:
+            # If formatting fails, at least write the basic file
+            update_progress(f"Warning: Could not apply Excel formatting: {e}")
+            df.to_excel(output_path, index=False, sheet_name='PO Data', engine='openpyxl')
+
+# Bump to force re-parsing of cached results when parsing behaviour changes in ways
+# the code fingerprint can't see (e.g. a pdfplumber setting passed in from outside)
+PARSER_VERSION = "1"
+
+
+def _hash_code(digest, code):
+    """Feed a code object's bytecode, names and constants (recursively) into digest"""
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            _hash_code(digest, const)
+        elif isinstance(const, frozenset):
+            digest.update(repr(sorted(map(repr, const))).encode())  # set order varies per process
+        else:
+            digest.update(repr(const).encode())
+
+
+# Module-level values the parsers read - their code only names them, so the values are hashed too
+PARSING_CONSTANTS = ('LINE_NUMBER', 'LINE_NUMBER_IN_TEXT', 'DATE_IN_TEXT', 'PRICE_IN_TEXT', 'FOOTER_WORDS',
+                     'BAND_MARGIN', 'EDGE_TOLERANCE', 'CROP_MAX_FRACTION', 'EDGE_SNAP', 'TEXT_TOLERANCE')
+
+
+def parser_fingerprint():
+    """Version string that changes whenever the parsing code or pdfplumber changes"""
+    import pdfplumber
+    from layout_templates import LAYOUT_LABELS, header_columns, layout_fingerprint  # (imports this module)
+    digest = hashlib.sha256()
+    digest.update(PARSER_VERSION.encode())
+    digest.update(str(getattr(pdfplumber, '__version__', '')).encode())
+    for cls in (WordIndex, PageAnalysis, PDFAnalysis, PDFExtractor):
+        for name in sorted(vars(cls)):
+            if cls is PDFExtractor and not (name.startswith(('parse_', 'extract_', 'format_')) or
+                                            name.endswith('_box')):
+                continue  # Outlook and output code doesn't affect parsed rows
+            member = vars(cls)[name]
+            func = member.fget if isinstance(member, property) else member
+            if hasattr(func, '__code__'):
+                digest.update(name.encode())
+                _hash_code(digest, func.__code__)
+    for name in PARSING_CONSTANTS:
+        value = globals()[name]
+        digest.update(f"{name}={getattr(value, 'pattern', value)!r}".encode())  # Regexes by pattern
+    # Template learning reads the page through these
+    digest.update(repr(LAYOUT_LABELS).encode())
+    for func in (layout_fingerprint, header_columns):
+        digest.update(func.__name__.encode())
+        _hash_code(digest, func.__code__)
+    return f"{PARSER_VERSION}-{digest.hexdigest()[:16]}"
+
+
+def file_md5(path, chunk_size=1024 * 1024):
+    """MD5 hex digest of a file, read in chunks so large PDFs aren't held in memory"""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_pdf_job(pdf_source, pdf_name, layout_path=None):
+    """Parse-pool worker entry point - pdf_source is a file path or the PDF bytes,
+    layout_path the layout template store to use (None: no templates).
+    Returns (rows, progress messages, parse stats) for one PDF."""
+    messages = []
+    stats = new_parse_stats()
+    if isinstance(pdf_source, bytes):
+        pdf_source = io.BytesIO(pdf_source)
+    extractor = PDFExtractor()
+    if layout_path:
+        from layout_templates import shared_templates
+        extractor.layout_templates = shared_templates(layout_path)
+    # Messages go back with the result - not through the progress handler, which in-process
+    # parsing shares with the rest of the run
+    data = extractor.parse_pdf(pdf_source, pdf_name, stats, report=messages.append)
+    return data, messages, stats
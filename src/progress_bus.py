@@ -0,0 +1,78 @@
+"""
+Progress bus - buffers log lines and coalesces status/progress updates for the UI
+The extraction thread never waits on the browser; a flusher thread sends batches at a fixed interval
+"""
+
+import threading
+import time
+
+
+class ProgressBus:
+    """Queue of UI updates flushed every `interval` seconds in one call per kind
+
+    send_log(messages), send_status(text) and send_progress(current, total) deliver to the UI.
+    Log lines are batched; status and progress only keep the latest value.
+    """
+
+    def __init__(self, send_log, send_status, send_progress, interval=0.2, max_buffered=500):
+        self.send_log = send_log
+        self.send_status = send_status
+        self.send_progress = send_progress
+        self.interval = interval
+        self.max_buffered = max_buffered  # The page only shows the last lines anyway
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.messages = []
+        self.dropped = 0
+        self.pending_status = None
+        self.pending_progress = None
+        self.thread = None
+
+    def _ensure_started(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def log(self, message):
+        with self.lock:
+            self.messages.append(message)
+            if len(self.messages) > self.max_buffered:
+                overflow = len(self.messages) - self.max_buffered
+                del self.messages[:overflow]
+                self.dropped += overflow
+            self._ensure_started()
+
+    def status(self, text):
+        with self.lock:
+            self.pending_status = text
+            self._ensure_started()
+
+    def progress(self, current, total):
+        with self.lock:
+            self.pending_progress = (current, total)
+            self._ensure_started()
+
+    def flush(self):
+        """Send everything pending now - call before anything that blocks on the UI (dialogs)"""
+        with self.flush_lock:
+            with self.lock:
+                messages, self.messages = self.messages, []
+                dropped, self.dropped = self.dropped, 0
+                status, self.pending_status = self.pending_status, None
+                progress, self.pending_progress = self.pending_progress, None
+            try:
+                if dropped:
+                    messages.insert(0, f"  ... {dropped} earlier lines not shown")
+                if messages:
+                    self.send_log(messages)
+                if status is not None:
+                    self.send_status(status)
+                if progress is not None:
+                    self.send_progress(*progress)
+            except Exception as e:
+                print(f"Warning: Could not send progress to UI: {e}")
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
@@ -0,0 +1,125 @@
+"""
+Run journal - crash-safe record of the current extraction run
+Logs each finished attachment (EntryID, attachment index, content hash) with its rows, so an
+interrupted run can be resumed: finished messages are skipped and rows not yet in the output store are replayed
+"""
+
+import os
+import json
+import time
+import sqlite3
+
+from po_extractor import update_progress
+
+DEFAULT_JOURNAL_PATH = os.path.join(os.path.expanduser("~"), ".pdf_extractor_journal.sqlite")
+
+
+class RunJournal:
+    """SQLite journal of one run - its parameters, finished attachments and finished messages"""
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_JOURNAL_PATH
+        self.conn = None
+
+    def open(self):
+        """Open (or create) the journal"""
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS run (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE TABLE IF NOT EXISTS attachments (
+                entry_id TEXT NOT NULL,
+                attachment_index INTEGER NOT NULL,
+                pdf_hash TEXT,
+                pdf_name TEXT NOT NULL,
+                rows TEXT NOT NULL,
+                row_count INTEGER NOT NULL,
+                stored INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (entry_id, attachment_index)
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                entry_id TEXT PRIMARY KEY
+            );
+        """)
+        self.conn.commit()
+        return self
+
+    def start(self, params):
+        """Begin a new run with these parameters - forgets the previous run, finished or not"""
+        if self.last_run():
+            update_progress("Discarding the journal of an unfinished earlier run")
+        self.conn.execute("DELETE FROM attachments")
+        self.conn.execute("DELETE FROM messages")
+        self.conn.execute("DELETE FROM run")
+        self.conn.executemany("INSERT INTO run VALUES (?, ?)", [
+            ('params', json.dumps(params)),
+            ('status', 'running'),
+            ('started', time.strftime("%Y-%m-%d %H:%M:%S"))
+        ])
+        self.conn.commit()
+
+    def last_run(self):
+        """Parameters of the journaled run if it didn't finish, else None"""
+        values = dict(self.conn.execute("SELECT key, value FROM run").fetchall())
+        if values.get('status') != 'running':
+            return None
+        return json.loads(values['params'])
+
+    def is_message_done(self, entry_id):
+        return self.conn.execute(
+            "SELECT 1 FROM messages WHERE entry_id = ?", (entry_id,)).fetchone() is not None
+
+    def done_attachments(self, entry_id):
+        """Indexes of the message's attachments that are already journaled"""
+        return {index for (index,) in self.conn.execute(
+            "SELECT attachment_index FROM attachments WHERE entry_id = ?", (entry_id,))}
+
+    def seen_hashes(self):
+        """Content hashes of the PDFs the run has processed"""
+        return {pdf_hash for (pdf_hash,) in self.conn.execute(
+            "SELECT pdf_hash FROM attachments WHERE pdf_hash IS NOT NULL")}
+
+    def totals(self):
+        """(PDFs, line items) the run has processed so far"""
+        pdfs, rows = self.conn.execute(
+            "SELECT COUNT(pdf_hash), IFNULL(SUM(row_count), 0) FROM attachments").fetchone()
+        return pdfs, rows
+
+    def record_attachment(self, entry_id, index, pdf_hash, pdf_name, rows):
+        """An attachment is finished - pdf_hash None for a skipped duplicate"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO attachments VALUES (?, ?, ?, ?, ?, ?, 0)",
+            (entry_id, index, pdf_hash, pdf_name, json.dumps(rows), len(rows))
+        )
+        self.conn.commit()
+
+    def record_message(self, entry_id):
+        """All of the message's attachments are finished"""
+        self.conn.execute("INSERT OR IGNORE INTO messages VALUES (?)", (entry_id,))
+        self.conn.commit()
+
+    def mark_stored(self):
+        """The journaled rows have been upserted into the output store"""
+        self.conn.execute("UPDATE attachments SET stored = 1 WHERE stored = 0")
+        self.conn.commit()
+
+    def unstored_rows(self):
+        """Yield the row lists that hadn't reached the output store when the run stopped"""
+        cur = self.conn.execute(
+            "SELECT rows FROM attachments WHERE stored = 0 AND row_count > 0 ORDER BY rowid")
+        for (rows,) in cur:
+            yield json.loads(rows)
+
+    def finish(self):
+        """Output is written - the run no longer needs resuming, drop its rows"""
+        self.conn.execute("DELETE FROM attachments")
+        self.conn.execute("DELETE FROM messages")
+        self.conn.execute("UPDATE run SET value = 'complete' WHERE key = 'status'")
+        self.conn.commit()
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,151 @@
+"""
+Run metrics - stage timers, counters and per-PDF parse stats for one extraction run
+Written next to the output file as PO_Data.run.json, optionally also as a Prometheus textfile
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import math
+import os
+import time
+
+SLOWEST_DOCUMENTS = 10
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(len(ordered) * fraction)) - 1]
+
+
+class RunMetrics:
+    """Where a run's time went
+
+    stages: wall-clock seconds on the run thread (save_attachment, hash, parse_wait, write_output, ...).
+    parse_stages: seconds inside the parsers, summed over PDFs (text, tables, addresses, total) -
+    these run in worker processes, so they overlap the run thread's stages.
+    """
+
+    def __init__(self):
+        self.started = datetime.now()
+        self.start_clock = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.parse_stages = {}
+        self.documents = []  # one dict per parsed PDF
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_parse(self, pdf_name, rows, stats):
+        """Record one parsed PDF from the stats dict parse_pdf filled in"""
+        self.count('pdfs_parsed')
+        self.count('pages', stats['pages'])
+        self.count('tables', stats['tables'])
+        if stats.get('layout'):
+            self.count(f"layout_{stats['layout']}")  # matched / learned / unfit template
+        for name, seconds in stats['seconds'].items():
+            self.parse_stages[name] = self.parse_stages.get(name, 0.0) + seconds
+        self.documents.append({
+            'pdf_file': pdf_name,
+            'seconds': round(stats['seconds'].get('total', 0.0), 4),
+            'pages': stats['pages'],
+            'tables': stats['tables'],
+            'rows': rows,
+            'parser': stats['parser'],
+            'layout': stats.get('layout'),
+            'stages': {name: round(seconds, 4) for name, seconds in stats['seconds'].items() if name != 'total'},
+        })
+
+    def report(self, output_path=None, result=None):
+        latencies = [doc['seconds'] for doc in self.documents]
+        result = result or {}
+        return {
+            'started': self.started.strftime("%Y-%m-%d %H:%M:%S"),
+            'duration_seconds': round(time.perf_counter() - self.start_clock, 3),
+            'success': bool(result.get('success')),
+            'error': result.get('error'),
+            'output_path': output_path,
+            'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            'counters': dict(self.counters),
+            'parse_stages': {name: round(seconds, 4) for name, seconds in self.parse_stages.items()},
+            'parse_latency': {
+                'count': len(latencies),
+                'p50': percentile(latencies, 0.50),
+                'p95': percentile(latencies, 0.95),
+                'max': max(latencies) if latencies else None,
+                'mean': round(sum(latencies) / len(latencies), 4) if latencies else None,
+            },
+            'slowest': sorted(self.documents, key=lambda doc: doc['seconds'], reverse=True)[:SLOWEST_DOCUMENTS],
+        }
+
+    @staticmethod
+    def path_for(output_path):
+        """PO_Data.xlsx -> PO_Data.run.json"""
+        return os.path.splitext(output_path)[0] + '.run.json'
+
+    def write(self, output_path, result=None, prometheus_path=None):
+        """Write the JSON report next to the output (and the Prometheus textfile if given); returns the report"""
+        report = self.report(output_path, result)
+        _write_atomic(self.path_for(output_path), json.dumps(report, indent=2))
+        if prometheus_path:
+            _write_atomic(prometheus_path, self.prometheus_text(report))
+        return report
+
+    def prometheus_text(self, report):
+        """Report in the Prometheus text format, for node_exporter's textfile collector"""
+        lines = [
+            "# HELP pdf_extractor_run_success 1 if the last run wrote its output",
+            "# TYPE pdf_extractor_run_success gauge",
+            f"pdf_extractor_run_success {int(report['success'])}",
+            "# HELP pdf_extractor_run_timestamp_seconds Start of the last run",
+            "# TYPE pdf_extractor_run_timestamp_seconds gauge",
+            f"pdf_extractor_run_timestamp_seconds {self.started.timestamp():.0f}",
+            "# HELP pdf_extractor_run_duration_seconds Duration of the last run",
+            "# TYPE pdf_extractor_run_duration_seconds gauge",
+            f"pdf_extractor_run_duration_seconds {report['duration_seconds']}",
+            "# HELP pdf_extractor_stage_seconds Run thread time per stage in the last run",
+            "# TYPE pdf_extractor_stage_seconds gauge",
+        ]
+        lines += [f'pdf_extractor_stage_seconds{{stage="{name}"}} {seconds}'
+                  for name, seconds in sorted(report['stages'].items())]
+        lines += [
+            "# HELP pdf_extractor_parse_stage_seconds Parser time per stage, summed over PDFs",
+            "# TYPE pdf_extractor_parse_stage_seconds gauge",
+        ]
+        lines += [f'pdf_extractor_parse_stage_seconds{{stage="{name}"}} {seconds}'
+                  for name, seconds in sorted(report['parse_stages'].items())]
+        lines += [
+            "# HELP pdf_extractor_items Counters of the last run",
+            "# TYPE pdf_extractor_items gauge",
+        ]
+        lines += [f'pdf_extractor_items{{counter="{name}"}} {value}'
+                  for name, value in sorted(report['counters'].items())]
+        lines += [
+            "# HELP pdf_extractor_parse_latency_seconds Per-PDF parse time in the last run",
+            "# TYPE pdf_extractor_parse_latency_seconds gauge",
+        ]
+        for key, quantile in (('p50', '0.5'), ('p95', '0.95'), ('max', '1')):
+            value = report['parse_latency'][key]
+            if value is not None:
+                lines.append(f'pdf_extractor_parse_latency_seconds{{quantile="{quantile}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path, text):
+    """Readers (and the textfile collector) never see a half-written file"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_path, path)
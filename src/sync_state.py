@@ -0,0 +1,77 @@
+"""
+Sync state - per-folder watermarks for incremental extraction runs
+Stores the newest processed ReceivedTime and the EntryIDs received at that instant
+"""
+
+import os
+import json
+from datetime import datetime
+
+DEFAULT_SYNC_PATH = os.path.join(os.path.expanduser("~"), ".pdf_extractor_sync.json")
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def naive_time(value):
+    """Wall-clock time without tzinfo - COM dates carry a misleading tzinfo"""
+    return datetime(value.year, value.month, value.day, value.hour, value.minute, value.second)
+
+
+class SyncState:
+    """Watermarks keyed by folder and subject filter, persisted as JSON"""
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_SYNC_PATH
+        self.folders = {}
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    self.folders = json.load(f).get('folders', {})
+        except Exception:
+            self.folders = {}  # Unreadable state just means a full scan
+
+    def key(self, folder, email_addr, folder_text, subject_text):
+        """Folder identity plus subject filter - a watermark only covers what that filter saw"""
+        folder_id = getattr(folder, 'EntryID', None) or f"{email_addr}|{folder_text}".lower()
+        return f"{folder_id}|{(subject_text or '').lower()}"
+
+    def watermark(self, key):
+        """(last processed received time, EntryIDs at that time) or (None, empty set)"""
+        state = self.folders.get(key)
+        if not state:
+            return None, set()
+        return datetime.strptime(state['last_received'], TIME_FORMAT), set(state.get('boundary_ids', []))
+
+    def new_messages(self, key, messages):
+        """Messages received after the watermark (and boundary messages not yet processed)"""
+        since, seen = self.watermark(key)
+        if since is None:
+            return list(messages)
+        new = []
+        for message in messages:
+            received = naive_time(message.received_time)
+            if received > since or (received == since and message.entry_id not in seen):
+                new.append(message)
+        return new
+
+    def advance(self, key, messages):
+        """Move the watermark forward to the newest of messages (never backwards)"""
+        since, seen = self.watermark(key)
+        for message in messages:
+            received = naive_time(message.received_time)
+            if since is None or received > since:
+                since, seen = received, {message.entry_id}
+            elif received == since:
+                seen.add(message.entry_id)
+        if since is not None:
+            self.folders[key] = {
+                'last_received': since.strftime(TIME_FORMAT),
+                'boundary_ids': sorted(seen),
+                'updated': datetime.now().strftime(TIME_FORMAT)
+            }
+
+    def save(self):
+        """Write state atomically so a crash can't leave a half-written file"""
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'folders': self.folders}, f, indent=2)
+        os.replace(temp_path, self.path)
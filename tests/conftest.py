@@ -0,0 +1,6 @@
+"""Modules in src/ import each other by bare name, like the app and CLI run them"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
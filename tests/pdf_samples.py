@@ -0,0 +1,96 @@
+"""Small purchase-order PDFs written by hand - no PDF library needed"""
+
+
+def text_pdf(lines):
+    """Single-page PDF with each (x, top, text) written in Helvetica 10 - no ruling lines, so it's
+    read by the text parser"""
+    return pdf_pages([(lines, ())])
+
+
+def pdf_pages(pages):
+    """PDF with one page per (lines, rules): lines as in text_pdf, rules are (x0, top, x1, bottom)
+    lines stroked 0.5pt wide - horizontal or vertical, like a table's cell borders"""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages)),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, (lines, rules) in enumerate(pages):
+        content = "".join(f"BT /F1 10 Tf 1 0 0 1 {x} {792 - top - 10} Tm ({text}) Tj ET\n" for x, top, text in lines)
+        content += "".join(f"0.5 w {x0} {792 - top} m {x1} {792 - bottom} l S\n" for x0, top, x1, bottom in rules)
+        objects += [
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {5 + 2 * i} 0 R >>",
+            f"<< /Length {len(content)} >>\nstream\n{content}endstream",
+        ]
+    pdf = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return pdf.encode()
+
+
+def ruled_table(columns, rows):
+    """(lines, rules) of a table: rows are (top, bottom, [(x, top, text), ...]), ruled at every
+    column boundary"""
+    lines = [line for _, _, cells in rows for line in cells]
+    top, bottom = rows[0][0], rows[-1][1]
+    rules = [(columns[0], border, columns[-1], border) for border in [top] + [row[1] for row in rows]]
+    rules += [(x, top, x, bottom) for x in columns]
+    return lines, rules
+
+
+def purchase_order(order_number, items):
+    lines = [
+        (50, 40, f"Purchase Order {order_number}"),
+        (50, 55, "Order Date 12-Dec-2025"),
+        (50, 120, "Ship To Address"), (350, 120, "Ordering Office"),
+        (50, 140, "Acme Plant 7"), (350, 140, "Central Purchasing"),
+        (50, 155, "1 Main Street"), (350, 155, "PO Box 99"),
+        (50, 180, "Payment Terms Net 30"), (350, 180, "Buyer Jane Roe"),
+        (50, 220, "Line Part Description"),
+    ]
+    top = 240
+    for line, part, date, quantity, price, amount in items:
+        for text in (line, f"{part} / Widget", date, quantity, price, amount):
+            lines.append((50, top, text))
+            top += 15
+    return text_pdf(lines)
+
+
+TABLE_COLUMNS = [40, 80, 230, 320, 380, 450, 540]
+
+
+def item_row(top, bottom, line, part, date, quantity, price, amount, text_top=None, description=()):
+    """Table row with its cells' text at text_top (default 5pt below the border) and extra
+    description lines below the part number"""
+    text_top = top + 5 if text_top is None else text_top
+    cells = [(x + 3, text_top, text) for x, text in zip(TABLE_COLUMNS, (line, part, date, quantity, price, amount))]
+    cells += [(TABLE_COLUMNS[1] + 3, text_top + 12 * i, text) for i, text in enumerate(description, 1)]
+    return top, bottom, cells
+
+
+def two_page_order():
+    """Ruled purchase order - page 2 continues the table with a tall first row - its line number is centred, so the row's
+    top border is far more than BAND_MARGIN above it"""
+    header = (100, 120, [(x + 3, 105, text) for x, text in zip(
+        TABLE_COLUMNS, ("Line", "Part Number", "Delivery Date", "Quantity", "Unit Price", "Amount"))])
+    first_lines, first_rules = ruled_table(TABLE_COLUMNS, [
+        header,
+        item_row(120, 140, "1.1", "P-1", "15-Jan-2026", "10", "12.50", "125.00"),
+        item_row(140, 160, "2.1", "P-2", "16-Jan-2026", "20", "1.25", "25.00"),
+    ])
+    first_lines += [(50, 40, "Purchase Order 4500000077"), (50, 55, "Order Date 12-Dec-2025")]
+    second_lines, second_rules = ruled_table(TABLE_COLUMNS, [
+        item_row(50, 120, "3.1", "P-3 / Widget", "17-Jan-2026", "30", "2.00", "60.00", text_top=75,
+                 description=("Steel", "Zinc plated")),
+        item_row(120, 140, "4.1", "P-4", "18-Jan-2026", "40", "3.00", "120.00"),
+    ])
+    second_lines.append((50, 200, "Terms and conditions apply"))
+    return pdf_pages([(first_lines, first_rules), (second_lines, second_rules)])
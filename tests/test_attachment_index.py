@@ -0,0 +1,64 @@
+import sqlite3
+
+import pytest
+
+from attachment_index import AttachmentIndex
+from po_extractor import set_progress_handler
+
+
+@pytest.fixture
+def index(tmp_path):
+    set_progress_handler(lambda message: None)
+    index = AttachmentIndex(str(tmp_path / "attachments.sqlite")).open()
+    yield index
+    index.close()
+    set_progress_handler(None)
+
+
+def test_lookup_returns_the_recorded_hash(index):
+    index.put("msg-1", 0, "PO.pdf", 1234, "hash-a")
+    assert index.lookup("msg-1", 0, "PO.pdf", 1234) == "hash-a"
+    assert index.hits == 1
+
+
+def test_unknown_attachment_is_missing(index):
+    index.put("msg-1", 0, "PO.pdf", 1234, "hash-a")
+    assert index.lookup("msg-1", 1, "PO.pdf", 1234) is None
+    assert index.lookup("msg-2", 0, "PO.pdf", 1234) is None
+    assert (index.hits, index.invalidated) == (0, 0)
+
+
+@pytest.mark.parametrize("file_name, size", [("PO renamed.pdf", 1234), ("PO.pdf", 1235)])
+def test_changed_attachment_is_forgotten(index, file_name, size):
+    index.put("msg-1", 0, "PO.pdf", 1234, "hash-a")
+    assert index.lookup("msg-1", 0, file_name, size) is None
+    assert index.invalidated == 1
+    assert index.lookup("msg-1", 0, "PO.pdf", 1234) is None  # Dropped - fetched and recorded again
+
+
+def test_archived_stat_is_recorded_and_reset_by_put(index):
+    index.put("msg-1", 0, "PO.pdf", 1234, "hash-a")
+    assert index.archived("msg-1", 0) is None
+    index.set_archived("msg-1", 0, 1100, 1_700_000_000_000_000_000)
+    assert index.archived("msg-1", 0) == (1100, 1_700_000_000_000_000_000)
+
+    index.put("msg-1", 0, "PO.pdf", 1234, "hash-b")  # Fetched again - not placed yet
+    assert index.archived("msg-1", 0) is None
+
+
+def test_index_without_archived_columns_is_upgraded(tmp_path):
+    path = str(tmp_path / "attachments.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE attachments (entry_id TEXT NOT NULL, position INTEGER NOT NULL, "
+                 "file_name TEXT NOT NULL, size INTEGER NOT NULL, pdf_hash TEXT NOT NULL, "
+                 "last_seen REAL NOT NULL, PRIMARY KEY (entry_id, position))")
+    conn.execute("INSERT INTO attachments VALUES ('msg-1', 0, 'PO.pdf', 1234, 'hash-a', strftime('%s', 'now'))")
+    conn.commit()
+    conn.close()
+
+    index = AttachmentIndex(path).open()
+    assert index.lookup("msg-1", 0, "PO.pdf", 1234) == "hash-a"
+    assert index.archived("msg-1", 0) is None
+    index.set_archived("msg-1", 0, 1100, 5)
+    assert index.archived("msg-1", 0) == (1100, 5)
+    index.close()
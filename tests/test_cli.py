@@ -0,0 +1,72 @@
+import csv
+from datetime import datetime
+import json
+import os
+
+import pytest
+
+import pdf_extractor_cli
+import sync_state
+from pdf_samples import purchase_order
+from po_extractor import set_progress_handler
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    """Settings and every store under tmp_path"""
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setattr(sync_state, 'DEFAULT_SYNC_PATH', str(home / "sync.json"))
+    (home / ".pdf_extractor_settings.json").write_text(json.dumps({
+        'parse_cache_path': str(home / "parse_cache.sqlite"),
+        'attachment_index_path': str(home / "attachments.sqlite"),
+        'run_journal_path': str(home / "journal.sqlite"),
+    }))
+    set_progress_handler(lambda message: None)
+    yield home
+    set_progress_handler(None)
+
+
+def pdf_dir(tmp_path, orders):
+    """Folder of purchase order PDFs, each dated (mtime) on its day of January 2026"""
+    folder = tmp_path / "pdfs"
+    folder.mkdir(exist_ok=True)
+    for order_number, day, part in orders:
+        path = folder / f"PO {order_number}.pdf"
+        path.write_bytes(purchase_order(order_number, [("1.1", part, "15-Jan-2026", "10", "$12.34", "$123.40")]))
+        stamp = datetime(2026, 1, day, 12).timestamp()
+        os.utime(path, (stamp, stamp))
+    return folder
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8-sig') as f:
+        return list(csv.DictReader(f))
+
+
+def test_pdf_dir_to_csv(tmp_path, home):
+    folder = pdf_dir(tmp_path, [("4500000001", 5, "P-1"), ("4500000002", 6, "P-2"), ("4500000003", 9, "P-3")])
+    output = tmp_path / "PO_Data.csv"
+
+    assert pdf_extractor_cli.main(["--pdf-dir", str(folder), "--output", str(output), "--workers", "1",
+                                   "--no-templates", "--end", "01/08/2026"]) == 0
+
+    rows = read_csv(output)
+    assert sorted((row['Order Number'], row['Part Number'], row['Quantity']) for row in rows) == [
+        ("4500000001", "P-1", "10"), ("4500000002", "P-2", "10")]
+    assert (tmp_path / "PO_Data.run.json").exists()
+
+
+def test_pdf_dir_incremental_run_only_reads_new_files(tmp_path, home):
+    folder = pdf_dir(tmp_path, [("4500000001", 5, "P-1")])
+    output = tmp_path / "PO_Data.csv"
+    args = ["--pdf-dir", str(folder), "--output", str(output), "--workers", "1", "--no-templates", "--incremental"]
+    assert pdf_extractor_cli.main(args) == 0
+
+    pdf_dir(tmp_path, [("4500000002", 7, "P-2")])
+    assert pdf_extractor_cli.main(args) == 0
+
+    assert sorted(row['Part Number'] for row in read_csv(output)) == ["P-1", "P-2"]
+    report = json.loads((tmp_path / "PO_Data.run.json").read_text())
+    assert report['counters']['pdfs_parsed'] == 1  # Only the new file
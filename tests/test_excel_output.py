@@ -0,0 +1,40 @@
+from openpyxl import load_workbook
+import pandas as pd
+
+from po_extractor import PDFExtractor, set_progress_handler
+
+
+def test_excel_output_keeps_its_formatting(tmp_path):
+    df = pd.DataFrame({
+        'Order Number': [4500000001, 4500000002],
+        'Line': ["1.1", "10"],
+        'Quantity': [1200, 5],
+        'Unit Price': [12.5, 0.333],
+        'Amount': [15000.0, None],
+        'Description': ["Bracket", "x" * 80],
+    })
+    path = str(tmp_path / "PO_Data.xlsx")
+    messages = []
+    set_progress_handler(messages.append)
+    try:
+        PDFExtractor().write_excel_with_formatting(path, df)
+    finally:
+        set_progress_handler(None)
+    assert messages == []  # No fallback to the unformatted writer
+
+    ws = load_workbook(path)['PO Data']
+    header = ws[1]
+    assert [cell.value for cell in header] == list(df.columns)
+    for cell in header:
+        assert cell.font.bold
+        assert cell.border.left.style == cell.border.bottom.style == 'thin'
+        assert cell.alignment.horizontal == 'center'
+
+    first, second = ws[2], ws[3]
+    assert [cell.number_format for cell in first] == ['0', 'General', '#,##0', '#,##0.00', '#,##0.00', 'General']
+    assert [cell.value for cell in first] == [4500000001, "1.1", 1200, 12.5, 15000, "Bracket"]
+    assert second[1].value == "10"  # Line stays text
+    assert second[4].value is None  # Missing amount left empty
+
+    widths = {letter: ws.column_dimensions[letter].width for letter in "ABCDEF"}
+    assert widths == {'A': 14, 'B': 6, 'C': 10, 'D': 12, 'E': 9, 'F': 50}
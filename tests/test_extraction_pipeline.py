@@ -0,0 +1,170 @@
+import csv
+from datetime import datetime
+from email.message import EmailMessage
+import os
+import sqlite3
+import time
+
+import pytest
+
+from extraction_pipeline import STAGING_FOLDER, STALE_STAGING_SECONDS, ExtractionRun, make_staging_folder
+from mail_sources import InMemoryMailSource, open_local_source
+from output_store import OutputStore
+from pdf_archive import MANIFEST_NAME
+from pdf_samples import purchase_order
+from po_extractor import set_progress_handler
+
+
+def test_each_run_gets_its_own_staging_folder(tmp_path):
+    first = make_staging_folder(str(tmp_path))
+    open(os.path.join(first, "a.pdf"), "wb").close()
+    second = make_staging_folder(str(tmp_path))
+
+    assert first != second
+    assert os.path.dirname(first) == os.path.dirname(second) == str(tmp_path / STAGING_FOLDER)
+    assert os.path.exists(os.path.join(first, "a.pdf"))  # A concurrent run's PDFs are left alone
+
+
+def test_stale_staging_leftovers_are_removed(tmp_path):
+    root = tmp_path / STAGING_FOLDER
+    crashed = root / "run_crashed"
+    crashed.mkdir(parents=True)
+    (crashed / "a.pdf").write_bytes(b"%PDF")
+    old_file = root / "0123abcd.pdf"
+    old_file.write_bytes(b"%PDF")
+    stale = time.time() - STALE_STAGING_SECONDS - 60
+    for path in (crashed, old_file):
+        os.utime(path, (stale, stale))
+
+    current = make_staging_folder(str(tmp_path))
+
+    assert sorted(os.listdir(root)) == [os.path.basename(current)]
+
+
+def pipeline_settings(tmp_path, **settings):
+    """Every store under tmp_path, parsing in-process"""
+    return dict({
+        'parse_workers': 1,
+        'parse_cache_path': str(tmp_path / "parse_cache.sqlite"),
+        'attachment_index_path': str(tmp_path / "attachments.sqlite"),
+        'run_journal_path': str(tmp_path / "journal.sqlite"),
+        'layout_templates': False,
+        'run_report': False,
+    }, **settings)
+
+
+def po_message(entry_id, day, order_number):
+    pdf = purchase_order(order_number, [("1.1", f"P-{entry_id}", "15-Jan-2026", "10", "$12.34", "$123.40")])
+    return {'entry_id': entry_id, 'subject': f"PO {order_number}", 'received_time': datetime(2026, 1, day, 9),
+            'attachments': {f"PO {order_number}.pdf": pdf}}
+
+
+def run_messages(settings, source, output):
+    run = ExtractionRun(settings)
+    return run.run(source.messages("PO", None, None), output)
+
+
+@pytest.fixture
+def quiet():
+    set_progress_handler(lambda message: None)
+    yield
+    set_progress_handler(None)
+
+
+def test_known_pdf_gets_its_view_back_in_the_content_archive(tmp_path, quiet):
+    settings = pipeline_settings(tmp_path, pdf_archive='content')
+    source = InMemoryMailSource([po_message("m1", 5, "4500000001")])
+    output = str(tmp_path / "out" / "PO_Data.csv")
+    os.makedirs(os.path.dirname(output))
+    assert run_messages(settings, source, output)["success"]
+    view = tmp_path / "out" / "PDFs" / "2026-01-05" / "PO 4500000001.pdf"
+    assert view.exists()
+
+    # Date folder cleaned up by hand - the stored object is still there
+    view.unlink()
+    conn = sqlite3.connect(str(tmp_path / "out" / "PDFs" / MANIFEST_NAME))
+    conn.execute("DELETE FROM views")
+    conn.commit()
+    conn.close()
+
+    source.opened.clear()
+    assert run_messages(settings, source, output)["success"]
+    assert source.opened == ["m1"]  # Listed for its attachments' metadata
+    assert view.exists()
+
+
+def test_only_pdf_attachments_of_eml_files_are_extracted(tmp_path, quiet):
+    message = EmailMessage()
+    message['Subject'] = "PO 4500000001"
+    message['Date'] = "Mon, 05 Jan 2026 09:00:00 +0000"
+    message.set_content("See attachments")
+    message.add_attachment(purchase_order("4500000001", [("1.1", "P-1", "15-Jan-2026", "10", "$12.34", "$123.40")]),
+                           maintype='application', subtype='pdf', filename="PO 4500000001.pdf")
+    message.add_attachment(b"PK-not-a-pdf", maintype='application', subtype='octet-stream', filename="terms.docx")
+    mail = tmp_path / "mail"
+    mail.mkdir()
+    (mail / "po.eml").write_bytes(message.as_bytes())
+    output = tmp_path / "out" / "PO_Data.csv"
+    output.parent.mkdir()
+
+    source = open_local_source('eml-dir', str(mail))
+    result = ExtractionRun(pipeline_settings(tmp_path)).run(source.messages(None, None, None), str(output))
+
+    assert result["success"]
+    with open(output, encoding='utf-8-sig') as f:
+        rows = list(csv.DictReader(f))
+    assert [(row['PDF File'], row['Part Number']) for row in rows] == [("PO 4500000001.pdf", "P-1")]
+    archived = [name for _, _, names in os.walk(tmp_path / "out" / "PDFs") for name in names]
+    assert archived == ["PO 4500000001.pdf"]
+
+
+class Interrupted(BaseException):
+    """Stands in for the process being killed - nothing in the run catches it"""
+
+
+class InterruptingSource(InMemoryMailSource):
+    def __init__(self, messages, interrupt_at):
+        super().__init__(messages)
+        self.interrupt_at = interrupt_at
+
+    def open_attachments(self, entry_id):
+        if entry_id == self.interrupt_at:
+            self.interrupt_at = None
+            raise Interrupted()
+        return super().open_attachments(entry_id)
+
+
+def csv_rows(path):
+    with open(path, encoding='utf-8') as f:
+        return sorted(f.read().splitlines())
+
+
+def test_interrupted_run_resumes_where_it_stopped(tmp_path, quiet):
+    messages = [po_message(f"m{day}", day, f"45000000{day:02d}") for day in range(1, 6)]
+    params = {'subject': "PO", 'start': None, 'end': None}
+
+    full_output = str(tmp_path / "full" / "PO_Data.csv")
+    os.makedirs(os.path.dirname(full_output))
+    full = InMemoryMailSource(messages)
+    assert ExtractionRun(pipeline_settings(tmp_path / "full")).run(
+        full.messages("PO", None, None), full_output, params)["success"]
+
+    output = str(tmp_path / "resumed" / "PO_Data.csv")
+    os.makedirs(os.path.dirname(output))
+    # Rows reach the output store one at a time, so some are stored before the interruption
+    settings = pipeline_settings(tmp_path / "resumed", output_chunk_rows=1)
+    source = InterruptingSource(messages, interrupt_at="m2")  # Newest first: m5, m4, m3 finish
+    with pytest.raises(Interrupted):
+        ExtractionRun(settings).run(source.messages("PO", None, None), output, params)
+    assert ExtractionRun(settings).last_run() == params
+    store = OutputStore(OutputStore.path_for(output)).open()
+    assert store.count() == 3
+    store.close()
+
+    source.opened.clear()
+    run = ExtractionRun(settings)
+    assert run.run(source.messages("PO", None, None), output, params, resume=True)["success"]
+    assert source.opened == ["m2", "m1"]  # Finished messages aren't opened again
+    assert run.metrics.counters['emails_resumed'] == 3
+    assert csv_rows(output) == csv_rows(full_output)
+    assert ExtractionRun(settings).last_run() is None
@@ -0,0 +1,102 @@
+import pytest
+
+from po_extractor import PDFExtractor, set_progress_handler
+
+
+class FakeFolder:
+    def __init__(self, name, *subfolders, entry_id=None):
+        self.Name = name
+        self.subfolders = list(subfolders)
+        self.EntryID = entry_id or name
+        self.StoreID = "store-1"
+        self.listed = 0  # Times the subfolders were listed - a search walking through
+
+    @property
+    def Folders(self):
+        self.listed += 1
+        return self.subfolders
+
+
+class FakeOutlook:
+    """MAPI namespace - accounts as top-level folders, folders reopened by ID"""
+
+    def __init__(self, *accounts):
+        self.Folders = list(accounts)
+        self.opened = []
+
+    def GetFolderFromID(self, entry_id, store_id):
+        self.opened.append(entry_id)
+        for folder in self.walk(self.Folders):
+            if folder.EntryID == entry_id:
+                return folder
+        raise LookupError("The operation failed. An object could not be found.")
+
+    def walk(self, folders):
+        for folder in folders:
+            yield folder
+            yield from self.walk(folder.subfolders)
+
+
+def mailbox(orders_name="PO Orders"):
+    orders = FakeFolder(orders_name, entry_id="orders")
+    return FakeOutlook(
+        FakeFolder("archive@example.com", FakeFolder("Inbox", FakeFolder("Old PO Orders", entry_id="old"))),
+        FakeFolder("buyer@example.com", FakeFolder("Inbox", FakeFolder("Suppliers", orders))),
+    )
+
+
+@pytest.fixture
+def progress():
+    messages = []
+    set_progress_handler(messages.append)
+    yield messages
+    set_progress_handler(None)
+
+
+@pytest.fixture
+def extractor(tmp_path):
+    extractor = PDFExtractor()
+    extractor.folder_cache_file = str(tmp_path / "folders.json")
+    return extractor
+
+
+def test_found_folder_is_reopened_from_the_cache(extractor, progress):
+    outlook = mailbox()
+    assert extractor.find_folder(outlook, "buyer@example.com", "po orders").EntryID == "orders"
+    assert outlook.opened == []
+
+    account = outlook.Folders[1]
+    account.listed = 0
+    folder = extractor.find_folder(outlook, "Buyer@Example.com", "PO Orders")
+    assert folder.EntryID == "orders"
+    assert outlook.opened == ["orders"]
+    assert account.listed == 0  # No walk
+    assert "Using cached folder location" in progress
+
+
+def test_stale_cache_entry_falls_back_to_the_search(extractor, progress):
+    outlook = mailbox()
+    extractor.find_folder(outlook, "buyer@example.com", "po orders")
+
+    # Folder renamed - its ID now opens a folder that no longer matches
+    renamed = mailbox(orders_name="Invoices")
+    renamed.Folders[1].subfolders[0].subfolders.append(FakeFolder("PO Orders 2026", entry_id="orders-2026"))
+    assert extractor.find_folder(renamed, "buyer@example.com", "po orders").EntryID == "orders-2026"
+    assert "Cached folder location is stale, searching again" in progress
+
+    # The new location replaced the stale one
+    assert extractor.find_folder(renamed, "buyer@example.com", "po orders").EntryID == "orders-2026"
+    assert renamed.opened == ["orders", "orders-2026"]
+
+
+def test_search_is_breadth_first_and_depth_limited(extractor, progress):
+    deep = FakeFolder("Inbox", FakeFolder("A", FakeFolder("B", FakeFolder("PO Orders", entry_id="deep"))))
+    account = FakeFolder("buyer@example.com", deep, FakeFolder("PO Orders Shared", entry_id="shallow"))
+    assert extractor.search_subfolder(account, "po orders").EntryID == "shallow"
+
+    account = FakeFolder("buyer@example.com", deep)
+    assert extractor.search_subfolder(account, "po orders", max_depth=3) is None
+    assert extractor.search_subfolder(account, "po orders", max_depth=4).EntryID == "deep"
+
+    extractor.folder_search_depth = 3
+    assert extractor.find_folder(FakeOutlook(account), "buyer@example.com", "po orders") is None
@@ -0,0 +1,67 @@
+import io
+
+import pytest
+
+import po_extractor
+from layout_templates import LayoutTemplates
+from pdf_samples import purchase_order
+from po_extractor import PDFExtractor, new_parse_stats, set_progress_handler, update_progress
+
+
+FIRST = purchase_order("4500012345", [("1.1", "ABC-123", "15-Jan-2026", "10", "$12.34", "$123.40"),
+                                      ("2.1", "XYZ-9", "20-Jan-2026", "3", "$5.00", "$15.00")])
+SECOND = purchase_order("4500067890", [("1.1", "QQ-77", "01-Feb-2026", "7", "$2.50", "$17.50")])
+
+
+def parse(extractor, pdf, name):
+    stats = new_parse_stats()
+    return extractor.parse_pdf(io.BytesIO(pdf), name, stats), stats
+
+
+@pytest.fixture
+def templates(tmp_path):
+    store = LayoutTemplates(str(tmp_path / "layouts.sqlite")).open()
+    yield store
+    store.close()
+
+
+def test_template_rows_match_full_detection(templates):
+    plain = PDFExtractor()
+    expected_first, _ = parse(plain, FIRST, "first.pdf")
+    expected_second, _ = parse(plain, SECOND, "second.pdf")
+    assert [row['part_number'] for row in expected_first] == ["ABC-123", "XYZ-9"]
+    assert expected_first[0]['ship_to'] == "Acme Plant 7, 1 Main Street"
+    assert expected_first[0]['ordering_office'] == "Central Purchasing, PO Box 99"
+
+    extractor = PDFExtractor()
+    extractor.layout_templates = templates
+    learned, stats = parse(extractor, FIRST, "first.pdf")
+    assert stats['layout'] == 'learned'
+    assert learned == expected_first
+
+    matched, stats = parse(extractor, SECOND, "second.pdf")
+    assert stats['layout'] == 'matched'
+    assert matched == expected_second
+
+
+def test_learning_leaves_the_progress_handler_alone(templates, monkeypatch):
+    """Messages reported elsewhere while the check parse runs (e.g. by another thread) still arrive"""
+    original = PDFExtractor.parse_pdf_text
+
+    def parse_pdf_text(self, analysis, pdf_name, report=update_progress):
+        update_progress("from elsewhere")
+        return original(self, analysis, pdf_name, report)
+
+    monkeypatch.setattr(PDFExtractor, 'parse_pdf_text', parse_pdf_text)
+    messages = []
+    set_progress_handler(messages.append)
+    try:
+        extractor = PDFExtractor()
+        extractor.layout_templates = templates
+        _, stats = parse(extractor, FIRST, "first.pdf")
+        assert po_extractor._progress_handler == messages.append
+    finally:
+        set_progress_handler(None)
+    assert stats['layout'] == 'learned'
+    assert messages.count("from elsewhere") == 2  # The parse and its check parse
+    assert sum("Extracted" in message for message in messages) == 1
@@ -0,0 +1,21 @@
+import io
+
+import pdfplumber
+
+from pdf_samples import two_page_order
+from po_extractor import EDGE_TOLERANCE, PDFAnalysis, PDFExtractor, new_parse_stats
+
+
+def test_band_crop_keeps_a_row_whose_border_is_above_the_margin():
+    pdf = two_page_order()
+    with pdfplumber.open(io.BytesIO(pdf)) as document:
+        page = PDFAnalysis(document).pages[1]
+        band_top, _ = page.line_item_band()
+        assert band_top > 50 + EDGE_TOLERANCE  # Starts inside the first row
+        tables = page.line_item_tables
+        assert page._tables is None  # The band was cropped, not the whole page detected
+    assert [row[0] for table in tables for row in table] == ["3.1", "4.1"]
+
+    rows = PDFExtractor().parse_pdf(io.BytesIO(pdf), "order.pdf", new_parse_stats(), report=lambda message: None)
+    assert [(row['line'], row['part_number'], row['quantity']) for row in rows] == [
+        ("1.1", "P-1", "10"), ("2.1", "P-2", "20"), ("3.1", "P-3", "30"), ("4.1", "P-4", "40")]
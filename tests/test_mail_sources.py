@@ -0,0 +1,279 @@
+from datetime import datetime
+from email.message import EmailMessage
+import mailbox
+import os
+import time
+
+import pytest
+
+from mail_sources import InMemoryMailSource, open_local_source
+from po_extractor import PDFExtractor, set_progress_handler
+
+SUBJECT = '"urn:schemas:httpmail:subject"'
+RECEIVED = '"urn:schemas:httpmail:datereceived"'
+BASE = ('@SQL=("http://schemas.microsoft.com/mapi/proptag/0x001A001F" LIKE \'IPM.Note%\') '
+        'AND ("urn:schemas:httpmail:hasattachment" = 1)')
+
+
+class FakeItem:
+    def __init__(self, entry_id, subject, received_time, item_class=43):
+        self.EntryID = entry_id
+        self.Subject = subject
+        self.ReceivedTime = received_time
+        self.Class = item_class
+
+
+class BrokenItem:
+    """An item whose properties can't be read (e.g. an unsent draft or a corrupt item)"""
+    Class = 43
+    EntryID = "broken"
+
+    @property
+    def Subject(self):
+        raise RuntimeError("property not available")
+
+
+class FakeItems:
+    """Folder.Items - records the restriction and sort; Restrict keeps every item (a superset)"""
+
+    def __init__(self, items, folder, restrict_error=None):
+        self.items = list(items)
+        self.folder = folder
+        self.restrict_error = restrict_error
+
+    def Restrict(self, restriction):
+        self.folder.restrictions.append(restriction)
+        if self.restrict_error:
+            raise self.restrict_error
+        return FakeItems(self.items, self.folder)
+
+    def Sort(self, key, descending):
+        self.folder.sorts.append((key, descending))
+        self.items.sort(key=lambda item: getattr(item, 'ReceivedTime', datetime.min), reverse=descending)
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+class FakeFolder:
+    def __init__(self, items, restrict_error=None):
+        self.restrictions = []
+        self.sorts = []
+        self._items = items
+        self.restrict_error = restrict_error
+
+    @property
+    def Items(self):
+        return FakeItems(self._items, self, self.restrict_error)
+
+
+@pytest.fixture
+def utc(monkeypatch):
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_restrict_filter_without_criteria():
+    assert PDFExtractor().build_restrict_filter(None, None, None) == BASE
+
+
+def test_restrict_filter_escapes_quotes_and_pads_dates(utc):
+    restriction = PDFExtractor().build_restrict_filter("Bob's PO", datetime(2026, 1, 5), datetime(2026, 1, 31))
+    assert restriction == (
+        BASE +
+        f" AND ({SUBJECT} LIKE '%Bob''s PO%')"
+        f" AND ({RECEIVED} >= '2026-01-04 00:00')"  # A day of slack before the start date
+        f" AND ({RECEIVED} < '2026-02-02 00:00')"  # Whole end day plus a day of slack
+    )
+
+
+def test_restrict_filter_converts_local_dates_to_utc(monkeypatch):
+    monkeypatch.setenv("TZ", "EST+5")
+    time.tzset()
+    try:
+        restriction = PDFExtractor().build_restrict_filter(None, datetime(2026, 1, 5), None)
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    assert restriction == BASE + f" AND ({RECEIVED} >= '2026-01-04 05:00')"
+
+
+def test_filter_emails_uses_restriction_and_reverifies_items(utc):
+    folder = FakeFolder([
+        FakeItem("match", "PO 4711", datetime(2026, 1, 10, 9)),
+        FakeItem("newest", "Re: po 4712", datetime(2026, 1, 31, 23, 59)),
+        FakeItem("meeting", "PO review", datetime(2026, 1, 12), item_class=26),
+        FakeItem("subject", "Invoice 99", datetime(2026, 1, 11)),
+        FakeItem("early", "PO 4700", datetime(2026, 1, 4, 23)),
+        FakeItem("late", "PO 4713", datetime(2026, 2, 1, 0, 30)),
+        BrokenItem(),
+    ])
+    extractor = PDFExtractor()
+    emails = extractor.filter_emails(folder, "PO", datetime(2026, 1, 5), datetime(2026, 1, 31))
+    assert [item.EntryID for item in emails] == ["newest", "match"]
+    assert folder.restrictions == [extractor.build_restrict_filter("PO", datetime(2026, 1, 5), datetime(2026, 1, 31))]
+    assert folder.sorts == [("[ReceivedTime]", True)]
+
+
+def test_filter_emails_scans_all_items_when_restrict_fails():
+    folder = FakeFolder([FakeItem("a", "PO 1", datetime(2026, 1, 10)), FakeItem("b", "Invoice", datetime(2026, 1, 10))],
+                        restrict_error=RuntimeError("DASL not supported"))
+    messages = []
+    set_progress_handler(messages.append)
+    try:
+        emails = PDFExtractor().filter_emails(folder, "PO", None, None)
+    finally:
+        set_progress_handler(None)
+    assert [item.EntryID for item in emails] == ["a"]
+    assert len(folder.restrictions) == 1
+    assert any("scanning all items" in message for message in messages)
+
+
+def stored_message(entry_id, received_time, subject="PO 4711", attachments=True, message_class="IPM.Note"):
+    return {'entry_id': entry_id, 'subject': subject, 'received_time': received_time, 'message_class': message_class,
+            'attachments': {f"{entry_id}.pdf": b"%PDF-" + entry_id.encode()} if attachments else {}}
+
+
+def test_in_memory_source_reads_rows_in_batches():
+    source = InMemoryMailSource([stored_message(str(day), datetime(2026, 1, day)) for day in range(1, 8)],
+                                batch_size=3)
+    messages = source.messages("PO", None, None)
+    assert [m.entry_id for m in messages] == ["7", "6", "5", "4", "3", "2", "1"]  # Newest first, across batches
+    assert (source.batches_read, source.rows_read) == (3, 7)
+    assert source.restriction == source.extractor.build_restrict_filter("PO", None, None)
+
+
+def test_in_memory_source_batch_size_equal_to_rows():
+    source = InMemoryMailSource([stored_message(str(day), datetime(2026, 1, day)) for day in range(1, 5)],
+                                batch_size=4)
+    assert len(source.messages(None, None, None)) == 4
+    assert source.batches_read == 1
+
+
+def test_in_memory_source_reverifies_rows(utc):
+    source = InMemoryMailSource([
+        stored_message("match", datetime(2026, 1, 10, 9)),
+        stored_message("last-day", datetime(2026, 1, 31, 23, 59), subject="re: po 4712"),
+        stored_message("meeting", datetime(2026, 1, 10), message_class="IPM.Schedule.Meeting.Request"),
+        stored_message("report", datetime(2026, 1, 10), message_class="REPORT.IPM.Note.NDR"),
+        stored_message("no-pdf", datetime(2026, 1, 10), attachments=False),
+        stored_message("subject", datetime(2026, 1, 10), subject="Invoice 99"),
+        stored_message("early", datetime(2026, 1, 4, 23)),
+        stored_message("late", datetime(2026, 2, 1)),
+    ], batch_size=2)
+    messages = source.messages("PO", datetime(2026, 1, 5), datetime(2026, 1, 31))
+    assert [m.entry_id for m in messages] == ["last-day", "match"]
+    assert source.rows_read == 8
+
+
+def test_in_memory_source_opens_messages_on_demand():
+    source = InMemoryMailSource([stored_message("a", datetime(2026, 1, 2)), stored_message("b", datetime(2026, 1, 1))])
+    messages = source.messages(None, None, None)
+    assert source.opened == []  # Listing reads rows only
+
+    attachments = messages[1].attachments
+    assert source.opened == ["b"]
+    assert [(a.file_name, a.index, a.size) for a in attachments] == [("b.pdf", 1, 6)]
+    with attachments[0].open() as stream:
+        assert stream.read() == b"%PDF-b"
+
+    messages[1].attachments  # Loaded once per message
+    assert source.opened == ["b"]
+    messages[1].release()
+    messages[1].attachments
+    assert source.opened == ["b", "b"]
+
+
+def eml_bytes(subject, date=None, message_id=None, attachments=()):
+    message = EmailMessage()
+    message['Subject'] = subject
+    message['From'] = "erp@example.com"
+    if date:
+        message['Date'] = date
+    if message_id:
+        message['Message-ID'] = message_id
+    message.set_content("See attachment")
+    for file_name, data, subtype in attachments:
+        message.add_attachment(data, maintype='application', subtype=subtype, filename=file_name)
+    return message.as_bytes()
+
+
+PO_ATTACHMENTS = [("PO 4711.pdf", b"%PDF-4711", 'pdf'), ("terms.docx", b"PK-docx", 'octet-stream')]
+
+
+def attachment_bytes(attachment):
+    with attachment.open() as stream:
+        return stream.read()
+
+
+def test_eml_directory_reads_headers_and_attachments(tmp_path, utc):
+    (tmp_path / "a.eml").write_bytes(eml_bytes("PO 4711", "Mon, 05 Jan 2026 09:30:00 +0100", "<po-4711@erp>",
+                                               PO_ATTACHMENTS))
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "b.eml").write_bytes(eml_bytes("Invoice 99", "Tue, 06 Jan 2026 10:00:00 +0000"))
+    (tmp_path / "notes.txt").write_text("not mail")
+
+    source = open_local_source('eml-dir', str(tmp_path))
+    assert [(m.entry_id, m.subject) for m in source.messages(None, None, None)] == [
+        ("sub/b.eml", "Invoice 99"), ("<po-4711@erp>", "PO 4711")]  # Newest first
+
+    [message] = source.messages("PO", None, None)
+    assert message.received_time == datetime(2026, 1, 5, 8, 30)  # Local wall-clock time (UTC here)
+    attachments = message.attachments
+    assert [(a.file_name, a.index) for a in attachments] == [("PO 4711.pdf", 1), ("terms.docx", 2)]
+    assert attachment_bytes(attachments[0]) == b"%PDF-4711"
+    assert attachments[0].size > 0  # Encoded size, known without decoding
+
+
+def test_eml_without_date_uses_the_file_time(tmp_path, utc):
+    path = tmp_path / "a.eml"
+    path.write_bytes(eml_bytes("PO 1"))
+    stamp = datetime(2026, 2, 3, 4, 5, 6).timestamp()
+    os.utime(path, (stamp, stamp))
+    [message] = open_local_source('eml-dir', str(tmp_path)).messages(None, None, None)
+    assert message.received_time == datetime(2026, 2, 3, 4, 5, 6)
+    assert message.entry_id == "a.eml"
+
+
+def test_mbox_reads_every_message(tmp_path, utc):
+    path = tmp_path / "orders.mbox"
+    box = mailbox.mbox(str(path))
+    box.add(eml_bytes("PO 4711", "Mon, 05 Jan 2026 09:30:00 +0000", "<po-4711@erp>", PO_ATTACHMENTS))
+    box.add(eml_bytes("PO 4712", "Wed, 07 Jan 2026 12:00:00 +0000", None,
+                      [("PO 4712.pdf", b"%PDF-4712", 'pdf')]))
+    box.add(eml_bytes("Lunch", "Thu, 08 Jan 2026 12:00:00 +0000"))
+    box.close()
+
+    source = open_local_source('mbox', str(path))
+    try:
+        messages = source.messages("PO", datetime(2026, 1, 5), datetime(2026, 1, 7))
+        assert [(m.entry_id, m.subject, m.received_time) for m in messages] == [
+            ("orders.mbox#1", "PO 4712", datetime(2026, 1, 7, 12)),
+            ("<po-4711@erp>", "PO 4711", datetime(2026, 1, 5, 9, 30))]
+        assert [a.file_name for a in messages[1].attachments] == ["PO 4711.pdf", "terms.docx"]
+        assert attachment_bytes(messages[0].attachments[0]) == b"%PDF-4712"
+    finally:
+        source.close()
+
+
+def test_pdf_directory_dates_messages_by_file_time(tmp_path):
+    for name, day in (("PO 1.pdf", 3), ("PO 2.PDF", 5), ("PO 3.pdf", 9)):
+        path = tmp_path / name
+        path.write_bytes(b"%PDF-" + name.encode())
+        stamp = datetime(2026, 1, day, 23, 59).timestamp()
+        os.utime(path, (stamp, stamp))
+    (tmp_path / "readme.txt").write_text("not a pdf")
+
+    source = open_local_source('pdf-dir', str(tmp_path))
+    messages = source.messages(None, datetime(2026, 1, 4), datetime(2026, 1, 9))
+    assert [(m.entry_id, m.subject, m.received_time) for m in messages] == [
+        ("PO 3.pdf", "PO 3.pdf", datetime(2026, 1, 9, 23, 59)),  # End date covers the whole day
+        ("PO 2.PDF", "PO 2.PDF", datetime(2026, 1, 5, 23, 59))]
+    [attachment] = messages[1].attachments
+    assert (attachment.file_name, attachment.index, attachment.size) == ("PO 2.PDF", 1, 13)
+    target = tmp_path / "saved.pdf"
+    attachment.save_as(str(target))
+    assert target.read_bytes() == b"%PDF-PO 2.PDF"
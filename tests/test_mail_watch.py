@@ -0,0 +1,78 @@
+from datetime import datetime
+import threading
+
+from mail_sources import InMemoryMailSource
+from mail_watch import MailWatcher, watch
+from sync_state import SyncState
+
+
+def message(entry_id, day, subject="PO 4711"):
+    return {'entry_id': entry_id, 'subject': subject, 'received_time': datetime(2026, 10, day, 9),
+            'attachments': {f"{entry_id}.pdf": b"%PDF"}}
+
+
+class EventWatcher(MailWatcher):
+    """Polls only when an event was announced, like Outlook with a long poll interval"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.events = []
+
+    def wait_for_events(self, stop, timeout):
+        if self.events:
+            self.events.pop()
+            return True
+        stop.set()  # Nothing announced - end the test
+        return False
+
+
+def test_poll_picks_up_new_mail_and_honours_subject(tmp_path):
+    source = InMemoryMailSource([message("A", 1)])
+    state = SyncState(str(tmp_path / "sync.json"))
+    watcher = MailWatcher(source, state, "key", "PO", poll_interval=0.01)
+    batches = []
+
+    def process(messages):
+        batches.append([m.entry_id for m in messages])
+        state.advance("key", messages)
+        if len(batches) == 1:
+            source.add(message("B", 2))
+            source.add(message("C", 2, subject="Invoice"))
+
+    assert watch(watcher, process, threading.Event(), max_batches=2) == 2
+    assert batches == [["A"], ["B"]]
+
+
+def test_event_polls_from_watermark_so_bulk_arrivals_are_not_skipped(tmp_path):
+    source = InMemoryMailSource([message("A", 1)])
+    state = SyncState(str(tmp_path / "sync.json"))
+    watcher = EventWatcher(source, state, "key", "PO", poll_interval=3600)
+    stop = threading.Event()
+    assert [m.entry_id for m in watcher.next_batch(stop)] == ["A"]
+    state.advance("key", source.messages("PO", None, None))
+
+    # Bulk arrival without ItemAdd, then one later item that does raise it
+    for entry_id in ("B", "C"):
+        source.add(message(entry_id, 2))
+    source.add(message("D", 3))
+    watcher.events.append(True)
+
+    batch = watcher.next_batch(stop)
+    assert sorted(m.entry_id for m in batch) == ["B", "C", "D"]
+
+
+def test_failed_batch_is_found_again_by_the_next_poll(tmp_path):
+    source = InMemoryMailSource([message("A", 1)])
+    state = SyncState(str(tmp_path / "sync.json"))
+    watcher = MailWatcher(source, state, "key", "PO", poll_interval=0.01)
+    attempts = []
+
+    def process(messages):
+        attempts.append([m.entry_id for m in messages])
+        if len(attempts) == 1:
+            raise OSError("output file locked")
+        state.advance("key", messages)
+
+    assert watch(watcher, process, threading.Event(), max_batches=2) == 2
+    assert attempts == [["A"], ["A"]]
+    assert state.watermark("key")[1] == {"A"}
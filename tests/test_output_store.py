@@ -0,0 +1,131 @@
+import csv
+import os
+import sqlite3
+
+import pytest
+
+from output_store import COLUMN_TITLES, FIELDNAMES, OutputStore, OutputWriter
+from po_extractor import PDFExtractor, set_progress_handler
+
+
+def row(pdf_file, line, quantity="138", unit_price="12.34", order_number="4500012345"):
+    return {'pdf_file': pdf_file, 'order_number': order_number, 'order_date': "20251212", 'line': line,
+            'part_number': "ABC-123", 'quantity': quantity, 'unit_price': unit_price, 'amount': "1,702.92",
+            'delivery_date': "20260115", 'ordering_office': "Central Purchasing", 'ship_to': "Acme Plant 7"}
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    set_progress_handler(lambda message: None)
+    yield
+    set_progress_handler(None)
+
+
+def frame(rows):
+    import pandas as pd
+    df = pd.DataFrame(rows, columns=FIELDNAMES)
+    df.columns = COLUMN_TITLES
+    return PDFExtractor().normalize_output_frame(df)
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+
+def test_upsert_replaces_rows_with_the_same_key(tmp_path):
+    store = OutputStore(str(tmp_path / "out.sqlite")).open()
+    assert store.upsert(frame([row("a.pdf", "1.1"), row("a.pdf", "2.1")])) == 0
+    assert store.upsert(frame([row("a.pdf", "1.1", quantity="5"), row("b.pdf", "1.1")])) == 1
+    df = store.to_dataframe()
+    # The replaced row moves to the new rows, like drop_duplicates(keep='last') on old + new
+    assert list(zip(df['PDF File'], df['Line'], df['Quantity'])) == [
+        ("a.pdf", "2.1", 138), ("a.pdf", "1.1", 5), ("b.pdf", "1.1", 138)]
+
+    # A missing order number is one key value too
+    store.upsert(frame([row("c.pdf", "1.1", order_number="")]))
+    assert store.upsert(frame([row("c.pdf", "1.1", order_number="")])) == 1
+    assert store.count() == 4
+    store.close()
+
+
+def test_whole_quantities_export_as_ints(tmp_path):
+    extractor = PDFExtractor()
+    output = str(tmp_path / "PO_Data.csv")
+    extractor.write_output(output, [row("a.pdf", "1.1"), row("a.pdf", "2.1", quantity="1,000")])
+    rows = read_csv(output)
+    assert rows[0] == COLUMN_TITLES
+    assert [(r[5], r[6], r[7]) for r in rows[1:]] == [("138", "12.34", "1702.92"), ("1000", "12.34", "1702.92")]
+
+
+def test_whole_quantities_from_a_real_column_export_as_ints(tmp_path):
+    """Stores created before quantity had INTEGER affinity hand back floats"""
+    path = str(tmp_path / "PO_Data.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE po_lines (pdf_file TEXT, order_number INTEGER, order_date TEXT, line TEXT, "
+                 "part_number TEXT, quantity REAL, unit_price REAL, amount REAL, delivery_date TEXT, "
+                 "ordering_office TEXT, ship_to TEXT)")
+    conn.close()
+    store = OutputStore(path).open()
+    store.upsert(frame([row("a.pdf", "1.1")]))
+    assert store.to_dataframe()['Quantity'].tolist() == [138]
+    store.upsert(frame([row("a.pdf", "2.1", quantity="")]))
+    assert store.to_dataframe()['Quantity'].isna().sum() == 1  # Not all whole - left as floats
+    store.close()
+
+
+def test_import_existing_seeds_the_store(tmp_path):
+    output = str(tmp_path / "PO_Data.csv")
+    with open(output, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMN_TITLES)
+        writer.writerow(["old.pdf", "4500000001", "20250101", "1.10", "P-1", "2", "3.5", "7", "", "", ""])
+    extractor = PDFExtractor()
+    extractor.write_output(output, [row("new.pdf", "1.1")])
+
+    store = OutputStore(OutputStore.path_for(output)).open()
+    df = store.to_dataframe()
+    assert df['PDF File'].tolist() == ["old.pdf", "new.pdf"]
+    assert df['Line'].tolist() == ["1.10", "1.1"]  # Read as text - "1.10" isn't 1.1
+    store.close()
+    assert [r[0] for r in read_csv(output)[1:]] == ["old.pdf", "new.pdf"]
+
+
+def test_csv_export_appends_only_when_unchanged(tmp_path):
+    output = str(tmp_path / "PO_Data.csv")
+    extractor = PDFExtractor()
+    extractor.write_output(output, [row("a.pdf", "1.1")])
+    store = OutputStore(OutputStore.path_for(output)).open()
+    rowid = store.max_rowid()
+    assert store.csv_is_current(output, rowid)
+    assert not store.csv_is_current(output, rowid - 1)  # Export ended elsewhere
+
+    extractor.write_output(output, [row("b.pdf", "1.1")])  # Appended
+    assert [r[0] for r in read_csv(output)[1:]] == ["a.pdf", "b.pdf"]
+    assert store.csv_is_current(output, store.max_rowid())
+
+    with open(output, 'a', encoding='utf-8') as f:
+        f.write("edited by hand\n")
+    assert not store.csv_is_current(output, store.max_rowid())
+    extractor.write_output(output, [row("c.pdf", "1.1")])  # Rewritten from the store
+    assert [r[0] for r in read_csv(output)[1:]] == ["a.pdf", "b.pdf", "c.pdf"]
+    store.close()
+
+
+def test_writer_upserts_a_chunk_at_a_time(tmp_path):
+    output = str(tmp_path / "PO_Data.csv")
+    stats = {'seconds': {}}
+    writer = OutputWriter(output, PDFExtractor().normalize_output_frame, chunk_rows=3, stats=stats)
+    writer.add([row("a.pdf", "1.1"), row("a.pdf", "2.1")])
+    assert writer.store is None and writer.chunks == 0  # Nothing written (or created) yet
+
+    writer.add([row("b.pdf", "1.1"), row("b.pdf", "2.1")])
+    assert writer.chunks == 1 and writer.pending == []
+    assert writer.store.count() == 4
+    assert not os.path.exists(output)  # Only the store - the export comes at the end
+
+    writer.add([row("a.pdf", "1.1")])
+    writer.flush()
+    assert (writer.chunks, writer.rows_written, writer.rows_replaced) == (2, 5, 1)
+    assert 'upsert' in stats['seconds']
+    writer.close()
@@ -0,0 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import parse_pool
+import po_extractor
+from parse_pool import ParsePool
+from po_extractor import parse_pdf_job, set_progress_handler
+
+
+def fake_job(pdf_source, pdf_name, layout_path=None):
+    if pdf_name == "bad.pdf":
+        raise RuntimeError("corrupt")
+    return [{'pdf_file': pdf_name}], [], {'seconds': {}}
+
+
+def test_in_process_failure_keeps_later_results(monkeypatch):
+    monkeypatch.setattr(parse_pool, 'parse_pdf_job', fake_job)
+    pool = ParsePool(workers=1).start()
+    names = ["a.pdf", "bad.pdf", "b.pdf", "c.pdf"]
+    for name in names:
+        pool.submit(name, name, tag=name)
+
+    results = list(pool.finish())
+
+    assert [entry[3] for entry in results] == names
+    assert [len(entry[1]) for entry in results] == [1, 0, 1, 1]
+    assert "ERROR parsing PDF: corrupt" in results[1][2][0]
+
+
+def test_finish_yields_cached_and_parsed_in_order(monkeypatch):
+    monkeypatch.setattr(parse_pool, 'parse_pdf_job', fake_job)
+    pool = ParsePool(workers=1).start()
+    pool.submit("a.pdf", "a.pdf")
+    pool.add_result("cached.pdf", [{'pdf_file': "cached.pdf"}])
+    pool.submit("b.pdf", "b.pdf")
+
+    assert [entry[0] for entry in pool.finish()] == ["a.pdf", "cached.pdf", "b.pdf"]
+
+
+def threaded_pool(monkeypatch, job, workers=1, queue_size=1):
+    """ParsePool with a thread executor - the dispatch and slot logic of the process pool"""
+    monkeypatch.setattr(parse_pool, 'parse_pdf_job', job)
+    pool = ParsePool(workers=workers, queue_size=queue_size)
+    pool.executor = ThreadPoolExecutor(max_workers=workers)
+    pool.dispatcher = threading.Thread(target=pool._dispatch, daemon=True)
+    pool.dispatcher.start()
+    return pool
+
+
+def test_slots_are_held_until_results_are_taken(monkeypatch):
+    pool = threaded_pool(monkeypatch, fake_job)
+    names = [f"{i}.pdf" for i in range(12)]
+    taken = []
+    held = []
+    for name in names:
+        taken += [entry[0] for entry in pool.make_room()]
+        pool.submit(name, name)
+        held.append(len(pool.parsing))
+    taken += [entry[0] for entry in pool.finish()]
+
+    assert taken == names
+    assert max(held) <= pool.queue_size + pool.workers * 2
+    assert pool.in_flight.acquire(blocking=False)  # Every slot was freed again
+
+
+def test_untaken_results_keep_their_slot(monkeypatch):
+    pool = threaded_pool(monkeypatch, fake_job, queue_size=2)
+    for name in ("a.pdf", "b.pdf", "c.pdf"):
+        pool.submit(name, name)
+    deadline = time.monotonic() + 10
+    while len(pool.results) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    assert sorted(pool.results) == [0, 1]  # Both slots hold a finished result - c waits for one
+
+    taken = [entry[0] for entry in pool.ready_results()] + [entry[0] for entry in pool.finish()]
+    assert taken == ["a.pdf", "b.pdf", "c.pdf"]
+
+
+def test_finish_takes_results_while_jobs_wait_for_slots(monkeypatch):
+    pool = threaded_pool(monkeypatch, fake_job, queue_size=4)
+    names = [f"{i}.pdf" for i in range(6)]  # More than the slots - finish has to free them
+    for name in names:
+        pool.submit(name, name)
+
+    done = []
+    thread = threading.Thread(target=lambda: done.extend(entry[0] for entry in pool.finish()), daemon=True)
+    thread.start()
+    thread.join(10)
+    assert done == names
+
+
+def test_parse_job_returns_messages_without_touching_the_handler():
+    reported = []
+    set_progress_handler(reported.append)
+    try:
+        data, messages, stats = parse_pdf_job(b"not a pdf", "broken.pdf")
+        assert po_extractor._progress_handler == reported.append
+    finally:
+        set_progress_handler(None)
+    assert data == []
+    assert any("ERROR parsing PDF" in message for message in messages)
+    assert reported == []
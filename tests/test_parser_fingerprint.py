@@ -0,0 +1,61 @@
+import po_extractor
+import layout_templates
+from po_extractor import parser_fingerprint
+
+
+def test_fingerprint_is_stable():
+    assert parser_fingerprint() == parser_fingerprint()
+
+
+def test_fingerprint_covers_constant_values(monkeypatch):
+    before = parser_fingerprint()
+    monkeypatch.setattr(po_extractor, 'TEXT_TOLERANCE', po_extractor.TEXT_TOLERANCE + 1)
+    assert parser_fingerprint() != before
+
+
+def test_fingerprint_covers_regex_patterns(monkeypatch):
+    before = parser_fingerprint()
+    monkeypatch.setattr(po_extractor, 'LINE_NUMBER', po_extractor.re.compile(r'^\d+$'))
+    assert parser_fingerprint() != before
+
+
+def test_fingerprint_covers_layout_templates(monkeypatch):
+    before = parser_fingerprint()
+    monkeypatch.setattr(layout_templates, 'LAYOUT_LABELS', layout_templates.LAYOUT_LABELS + ('Total',))
+    assert parser_fingerprint() != before
+    monkeypatch.undo()
+
+    def header_columns(page):
+        return None
+
+    monkeypatch.setattr(layout_templates, 'header_columns', header_columns)
+    assert parser_fingerprint() != before
+
+
+def test_fingerprint_covers_text_patterns(monkeypatch):
+    before = parser_fingerprint()
+    monkeypatch.setattr(po_extractor, 'DATE_IN_TEXT', po_extractor.re.compile(r'\d{4}-\d{2}-\d{2}'))
+    assert parser_fingerprint() != before
+    monkeypatch.undo()
+    monkeypatch.setattr(po_extractor, 'PRICE_IN_TEXT', po_extractor.re.compile(r'\d+\.\d{2}'))
+    assert parser_fingerprint() != before
+
+
+def test_fingerprint_covers_band_constants(monkeypatch):
+    before = parser_fingerprint()
+    for name, value in (('BAND_MARGIN', 30), ('CROP_MAX_FRACTION', 0.9), ('EDGE_TOLERANCE', 2),
+                        ('EDGE_SNAP', 4), ('FOOTER_WORDS', ('terms',)),
+                        ('LINE_NUMBER_IN_TEXT', po_extractor.re.compile(r'\d+\.\d+'))):
+        monkeypatch.setattr(po_extractor, name, value)
+        assert parser_fingerprint() != before, name
+        monkeypatch.undo()
+
+
+def test_fingerprint_covers_word_index(monkeypatch):
+    before = parser_fingerprint()
+
+    def on_line(self, top, tolerance):
+        return []
+
+    monkeypatch.setattr(po_extractor.WordIndex, 'on_line', on_line)
+    assert parser_fingerprint() != before
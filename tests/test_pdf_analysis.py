@@ -0,0 +1,40 @@
+import io
+from collections import Counter
+
+import pdfplumber.page
+import pytest
+
+from pdf_samples import purchase_order, two_page_order
+from po_extractor import PDFExtractor, new_parse_stats
+
+TEXT_ORDER = purchase_order("4500000001", [("1.1", "P-1", "15-Jan-2026", "10", "$12.34", "$123.40"),
+                                           ("2.1", "P-2", "16-Jan-2026", "5", "$1.00", "$5.00")])
+
+
+@pytest.fixture
+def extraction_calls(monkeypatch):
+    """Counts pdfplumber's expensive page calls per (method, page number)"""
+    calls = Counter()
+    for name in ('extract_text', 'extract_words', 'extract_tables', 'find_tables'):
+        original = getattr(pdfplumber.page.Page, name)
+
+        def counted(page, *args, _name=name, _original=original, **kwargs):
+            calls[_name, page.page_number] += 1
+            return _original(page, *args, **kwargs)
+
+        monkeypatch.setattr(pdfplumber.page.Page, name, counted)
+    return calls
+
+
+@pytest.mark.parametrize('pdf, parser, lines', [
+    (TEXT_ORDER, 'text', ["1.1", "2.1"]),
+    (two_page_order(), 'tables', ["1.1", "2.1", "3.1", "4.1"]),
+])
+def test_each_page_is_analysed_once_per_parse(extraction_calls, pdf, parser, lines):
+    stats = new_parse_stats()
+    rows = PDFExtractor().parse_pdf(io.BytesIO(pdf), "order.pdf", stats, report=lambda message: None)
+    assert [row['line'] for row in rows] == lines
+    assert stats['parser'] == parser
+    assert rows[0]['order_number'] == rows[-1]['order_number'] != ""
+    # Order info, addresses, table detection and the line-item band all share one PDFAnalysis
+    assert extraction_calls and max(extraction_calls.values()) == 1, extraction_calls
@@ -0,0 +1,182 @@
+import hashlib
+import os
+import threading
+import time
+
+import pytest
+
+import pdf_archive
+from pdf_archive import ArchiveWriter, ContentArchive, DatedArchive
+
+
+def stage(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.fixture
+def dated(tmp_path):
+    archive = DatedArchive(str(tmp_path / "PDFs")).open()
+    (tmp_path / "PDFs" / "2026-01-05").mkdir(parents=True)
+    return archive
+
+
+def test_dated_archive_contains_checks_content(tmp_path, dated):
+    first, second = b"%PDF-first", b"%PDF-second"
+    first_hash = hashlib.md5(first).hexdigest()
+
+    assert not dated.contains(first_hash, "2026-01-05", "PO.pdf")
+    dated.place(stage(tmp_path, "a.pdf", first), first_hash, "2026-01-05", "PO.pdf")
+    assert dated.contains(first_hash, "2026-01-05", "PO.pdf")
+
+    # A later attachment with the same name replaced the file
+    dated.place(stage(tmp_path, "b.pdf", second), hashlib.md5(second).hexdigest(), "2026-01-05", "PO.pdf")
+    assert not dated.contains(first_hash, "2026-01-05", "PO.pdf")
+
+
+def test_recorded_stat_spares_hashing(tmp_path, dated, monkeypatch):
+    data = b"%PDF-first"
+    pdf_hash = hashlib.md5(data).hexdigest()
+    dated.place(stage(tmp_path, "a.pdf", data), pdf_hash, "2026-01-05", "PO.pdf")
+    placed = dated.placed_stat(pdf_hash, "2026-01-05", "PO.pdf")
+    assert placed == dated.file_stat("2026-01-05", "PO.pdf")
+
+    hashed = []
+    monkeypatch.setattr(pdf_archive, 'file_md5', lambda path: hashed.append(path) or pdf_hash)
+    assert dated.contains(pdf_hash, "2026-01-05", "PO.pdf", placed)
+    assert hashed == []
+
+    # Different size or mtime - the file is read to be sure
+    assert dated.contains(pdf_hash, "2026-01-05", "PO.pdf", (placed[0], placed[1] + 1))
+    assert len(hashed) == 1
+
+
+def test_placed_stat_is_the_placed_file_not_a_later_one(tmp_path, dated):
+    first, second = b"%PDF-first", b"%PDF-second!"
+    first_hash = hashlib.md5(first).hexdigest()
+    dated.place(stage(tmp_path, "a.pdf", first), first_hash, "2026-01-05", "PO.pdf")
+    dated.place(stage(tmp_path, "b.pdf", second), hashlib.md5(second).hexdigest(), "2026-01-05", "PO.pdf")
+    placed = dated.placed_stat(first_hash, "2026-01-05", "PO.pdf")
+    assert placed[0] == len(first)
+    assert not dated.contains(first_hash, "2026-01-05", "PO.pdf", placed)
+
+
+@pytest.fixture
+def content(tmp_path):
+    archive = ContentArchive(str(tmp_path / "PDFs")).open()
+    for day in ("2026-01-05", "2026-01-06"):
+        (tmp_path / "PDFs" / day).mkdir(parents=True)
+    yield archive
+    archive.close()
+
+
+def manifest(archive):
+    return archive.conn.execute(
+        "SELECT date_folder, file_name, pdf_hash, entry_id, linked FROM views ORDER BY date_folder, file_name"
+    ).fetchall()
+
+
+def test_content_archive_stores_each_pdf_once(tmp_path, content):
+    data = b"%PDF-same"
+    pdf_hash = hashlib.md5(data).hexdigest()
+    assert content.place(stage(tmp_path, "a.pdf", data), pdf_hash, "2026-01-05", "PO.pdf", "m1") == \
+        "2026-01-05/PO.pdf"
+    assert content.place(stage(tmp_path, "b.pdf", data), pdf_hash, "2026-01-06", "Copy of PO.pdf", "m2") == \
+        "2026-01-06/Copy of PO.pdf"
+
+    assert (content.stored, content.deduplicated, content.linked) == (1, 1, 2)
+    assert not (tmp_path / "b.pdf").exists()  # The duplicate's staged file is dropped
+    assert (tmp_path / "PDFs" / "2026-01-06" / "Copy of PO.pdf").read_bytes() == data
+    assert content.views(pdf_hash) == [("2026-01-05", "PO.pdf"), ("2026-01-06", "Copy of PO.pdf")]
+    assert manifest(content) == [("2026-01-05", "PO.pdf", pdf_hash, "m1", 1),
+                                 ("2026-01-06", "Copy of PO.pdf", pdf_hash, "m2", 1)]
+
+
+def test_same_name_different_content_gets_a_suffix(tmp_path, content):
+    first, second = b"%PDF-first", b"%PDF-second"
+    first_hash, second_hash = hashlib.md5(first).hexdigest(), hashlib.md5(second).hexdigest()
+    content.place(stage(tmp_path, "a.pdf", first), first_hash, "2026-01-05", "PO.pdf")
+    saved = content.place(stage(tmp_path, "b.pdf", second), second_hash, "2026-01-05", "PO.pdf")
+
+    assert saved == f"2026-01-05/PO ({second_hash[:8]}).pdf"
+    assert (tmp_path / "PDFs" / "2026-01-05" / "PO.pdf").read_bytes() == first  # Not replaced
+    # The same PDF again under that name is already there
+    assert content.view_name(second_hash, "2026-01-05", "PO.pdf") is None
+    assert len(manifest(content)) == 2
+
+
+def test_known_pdf_view_is_added_without_its_bytes(tmp_path, content):
+    data = b"%PDF-known"
+    pdf_hash = hashlib.md5(data).hexdigest()
+    content.place(stage(tmp_path, "a.pdf", data), pdf_hash, "2026-01-05", "PO.pdf")
+    assert content.contains(pdf_hash, "2026-01-06", "PO.pdf")
+
+    assert content.add_view(pdf_hash, "2026-01-06", "PO.pdf", "m2") == "2026-01-06/PO.pdf"
+    assert (tmp_path / "PDFs" / "2026-01-06" / "PO.pdf").read_bytes() == data
+    assert content.views(pdf_hash) == [("2026-01-05", "PO.pdf"), ("2026-01-06", "PO.pdf")]
+    assert content.stored == 1
+
+
+class FlakyArchive:
+    """Archive whose place() raises the queued errors first, then records the placement"""
+
+    def __init__(self, errors=(), delay=0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.placed = []
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def place(self, staged, pdf_hash, date_folder, name, entry_id=None):
+        with self.lock:
+            self.calls += 1
+            error = self.errors.pop(0) if self.errors else None
+        if error:
+            raise error
+        time.sleep(self.delay)
+        os.remove(staged)
+        with self.lock:
+            self.placed.append(name)
+        return f"{date_folder}/{name}"
+
+
+def test_writer_retries_a_transient_error(tmp_path):
+    archive = FlakyArchive([OSError("share hiccup"), PermissionError("file open")])
+    writer = ArchiveWriter(archive, workers=1, backoff=0.001).start()
+    writer.submit(stage(tmp_path, "a.pdf", b"%PDF"), "hash", "2026-01-05", "PO.pdf")
+    assert writer.finish() == []
+    assert (archive.placed, archive.calls, writer.retried, writer.placed) == (["PO.pdf"], 3, 2, 1)
+
+
+@pytest.mark.parametrize("error", [FileNotFoundError("staged file gone"), PermissionError("access denied")])
+def test_writer_gives_up_on_a_permanent_error(tmp_path, error):
+    staged = stage(tmp_path, "a.pdf", b"%PDF")
+    if isinstance(error, PermissionError):
+        os.remove(staged)  # Nothing left to move - the error can't be a locked target
+    archive = FlakyArchive([error] * 10)
+    writer = ArchiveWriter(archive, workers=1, backoff=10).start()  # A retry would hang the test
+    writer.submit(staged, "hash", "2026-01-05", "PO.pdf")
+    failures = writer.finish()
+    assert failures == [("2026-01-05/PO.pdf", str(error))]
+    assert (archive.calls, writer.retried) == (1, 0)
+    assert not os.path.exists(staged)
+
+
+def test_failed_placement_removes_the_staged_file(tmp_path):
+    staged = stage(tmp_path, "a.pdf", b"%PDF")
+    writer = ArchiveWriter(FlakyArchive([ValueError("bad name")]), workers=1).start()
+    writer.submit(staged, "hash", "2026-01-05", "PO.pdf")
+    assert writer.finish() == [("2026-01-05/PO.pdf", "bad name")]
+    assert not os.path.exists(staged)
+
+
+def test_finish_drains_the_queue(tmp_path):
+    archive = FlakyArchive(delay=0.01)
+    writer = ArchiveWriter(archive, workers=2, queue_size=2).start()
+    names = [f"{i}.pdf" for i in range(10)]
+    for name in names:
+        writer.submit(stage(tmp_path, name, b"%PDF"), "hash", "2026-01-05", name)
+    assert writer.finish() == []
+    assert sorted(archive.placed) == sorted(names)
+    assert writer.placed == 10 and writer.threads == []
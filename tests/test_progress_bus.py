@@ -0,0 +1,50 @@
+from progress_bus import ProgressBus
+
+
+class FakeUI:
+    def __init__(self):
+        self.calls = []
+
+    def bus(self, **options):
+        # Long interval - only explicit flushes send anything
+        return ProgressBus(send_log=lambda messages: self.calls.append(('log', messages)),
+                           send_status=lambda text: self.calls.append(('status', text)),
+                           send_progress=lambda current, total: self.calls.append(('progress', current, total)),
+                           interval=3600, **options)
+
+
+def test_updates_are_buffered_until_flush_and_merged():
+    ui = FakeUI()
+    bus = ui.bus()
+    bus.log("Starting")
+    bus.status("Connecting")
+    bus.progress(1, 10)
+    bus.log("Found folder")
+    bus.status("Processing")
+    bus.progress(2, 10)
+    assert ui.calls == []
+
+    bus.flush()
+    assert ui.calls == [('log', ["Starting", "Found folder"]), ('status', "Processing"), ('progress', 2, 10)]
+
+    bus.flush()  # Nothing pending - nothing sent
+    assert len(ui.calls) == 3
+
+
+def test_overflow_keeps_the_latest_lines():
+    ui = FakeUI()
+    bus = ui.bus(max_buffered=3)
+    for i in range(5):
+        bus.log(f"line {i}")
+    bus.flush()
+    assert ui.calls == [('log', ["  ... 2 earlier lines not shown", "line 2", "line 3", "line 4"])]
+
+
+def test_a_failing_ui_does_not_reach_the_caller(capsys):
+    def send_log(messages):
+        raise RuntimeError("browser closed")
+
+    bus = ProgressBus(send_log, send_status=None, send_progress=None, interval=3600)
+    bus.log("Starting")
+    bus.flush()
+    assert "browser closed" in capsys.readouterr().out
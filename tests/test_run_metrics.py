@@ -0,0 +1,122 @@
+from datetime import datetime
+import json
+
+import pytest
+
+import run_metrics
+from extraction_pipeline import ExtractionRun
+from mail_sources import InMemoryMailSource
+from pdf_samples import purchase_order
+from po_extractor import set_progress_handler
+from run_metrics import RunMetrics, percentile
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(run_metrics.time, 'perf_counter', clock)
+    return clock
+
+
+def parse_stats(seconds, pages=1, tables=1, layout=None):
+    return {'pages': pages, 'tables': tables, 'parser': 'tables', 'layout': layout,
+            'seconds': {'text': seconds / 2, 'tables': seconds / 4, 'total': seconds}}
+
+
+def test_stages_add_up_including_failed_ones(clock):
+    metrics = RunMetrics()
+    for seconds in (1.5, 0.5):
+        with metrics.stage('hash'):
+            clock.now += seconds
+    with pytest.raises(OSError):
+        with metrics.stage('save_attachment'):
+            clock.now += 2
+            raise OSError("share went away")
+    assert metrics.stages == {'hash': 2.0, 'save_attachment': 2.0}
+
+
+def test_report_summarises_counts_and_parse_latency(clock):
+    metrics = RunMetrics()
+    metrics.count('emails')
+    metrics.count('emails')
+    metrics.count('pdfs_skipped', 3)
+    for i, seconds in enumerate((0.2, 1.0, 0.4, 0.8), 1):
+        metrics.add_parse(f"PO {i}.pdf", rows=i, stats=parse_stats(seconds, pages=2, layout='matched'))
+    clock.now += 5
+
+    report = metrics.report("PO_Data.xlsx", {'success': True})
+    assert report['duration_seconds'] == 5
+    assert report['counters'] == {'emails': 2, 'pdfs_skipped': 3, 'pdfs_parsed': 4, 'pages': 8, 'tables': 4,
+                                  'layout_matched': 4}
+    assert report['parse_stages'] == {'text': 1.2, 'tables': 0.6, 'total': 2.4}
+    assert report['parse_latency'] == {'count': 4, 'p50': 0.4, 'p95': 1.0, 'max': 1.0, 'mean': 0.6}
+    assert [doc['pdf_file'] for doc in report['slowest']] == ["PO 2.pdf", "PO 4.pdf", "PO 3.pdf", "PO 1.pdf"]
+    assert report['slowest'][0]['stages'] == {'text': 0.5, 'tables': 0.25}
+
+
+def test_empty_run_has_no_latency():
+    report = RunMetrics().report()
+    assert report['parse_latency'] == {'count': 0, 'p50': None, 'p95': None, 'max': None, 'mean': None}
+    assert not report['success']
+    assert percentile([], 0.5) is None
+    assert percentile([3, 1, 2], 0.5) == 2
+
+
+def test_write_puts_the_report_next_to_the_output(tmp_path, clock):
+    metrics = RunMetrics()
+    with metrics.stage('write_output'):
+        clock.now += 0.25
+    metrics.count('rows', 7)
+    output = str(tmp_path / "PO_Data.xlsx")
+    prometheus = str(tmp_path / "pdf_extractor.prom")
+
+    metrics.write(output, {'success': True}, prometheus)
+
+    report = json.loads((tmp_path / "PO_Data.run.json").read_text())
+    assert report['stages'] == {'write_output': 0.25}
+    text = (tmp_path / "pdf_extractor.prom").read_text()
+    assert "pdf_extractor_run_success 1\n" in text
+    assert 'pdf_extractor_stage_seconds{stage="write_output"} 0.25\n' in text
+    assert 'pdf_extractor_items{counter="rows"} 7\n' in text
+    assert "quantile" not in text  # No PDFs parsed
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["PO_Data.run.json", "pdf_extractor.prom"]
+
+
+def test_a_run_reports_its_counts(tmp_path):
+    pdf = purchase_order("4500000001", [("1.1", "P-1", "15-Jan-2026", "10", "$12.34", "$123.40"),
+                                        ("2.1", "P-2", "16-Jan-2026", "5", "$1.00", "$5.00")])
+    source = InMemoryMailSource([
+        {'entry_id': "m1", 'subject': "PO 4500000001", 'received_time': datetime(2026, 1, 5, 9),
+         'attachments': {"PO 4500000001.pdf": pdf, "terms.txt": b"terms"}},
+        {'entry_id': "m2", 'subject': "FW: PO 4500000001", 'received_time': datetime(2026, 1, 6, 9),
+         'attachments': {"PO 4500000001.pdf": pdf}},  # Same PDF forwarded
+    ])
+    settings = {
+        'parse_workers': 1,
+        'parse_cache_path': str(tmp_path / "parse_cache.sqlite"),
+        'attachment_index_path': str(tmp_path / "attachments.sqlite"),
+        'run_journal_path': str(tmp_path / "journal.sqlite"),
+        'layout_templates': False,
+    }
+    output = str(tmp_path / "PO_Data.csv")
+    set_progress_handler(lambda message: None)
+    try:
+        run = ExtractionRun(settings)
+        assert run.run(run.find_messages(source, "PO", None, None), output)["success"]
+    finally:
+        set_progress_handler(None)
+
+    counters = json.loads((tmp_path / "PO_Data.run.json").read_text())['counters']
+    assert {name: counters.get(name) for name in (
+        'emails_matched', 'emails_processed', 'pdfs_found', 'duplicates_skipped', 'pdfs_parsed', 'rows_extracted')} == {
+        'emails_matched': 2, 'emails_processed': 2, 'pdfs_found': 1, 'duplicates_skipped': 1, 'pdfs_parsed': 1,
+        'rows_extracted': 2}
+    assert {'hash', 'parse_wait', 'write_output'} <= set(run.metrics.stages)
@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from extraction_pipeline import ExtractionRun
+from mail_sources import MailMessage
+from sync_state import SyncState
+
+
+def message(entry_id, received_time):
+    return MailMessage(entry_id, "PO", received_time, list)
+
+
+def test_advance_keeps_boundary_ids_and_never_moves_back(tmp_path):
+    state = SyncState(str(tmp_path / "sync.json"))
+    noon = datetime(2026, 3, 2, 12)
+    state.advance("key", [message("a", datetime(2026, 3, 1)), message("b", noon), message("c", noon)])
+    assert state.watermark("key") == (noon, {"b", "c"})
+
+    state.advance("key", [message("old", datetime(2026, 2, 1)), message("d", noon)])
+    assert state.watermark("key") == (noon, {"b", "c", "d"})
+
+    later = datetime(2026, 3, 3, 8)
+    state.advance("key", [message("e", later)])
+    assert state.watermark("key") == (later, {"e"})
+
+
+def test_new_messages_skips_processed_boundary(tmp_path):
+    state = SyncState(str(tmp_path / "sync.json"))
+    noon = datetime(2026, 3, 2, 12)
+    assert [m.entry_id for m in state.new_messages("key", [message("a", noon)])] == ["a"]  # No watermark yet
+
+    state.advance("key", [message("a", noon)])
+    messages = [message("before", datetime(2026, 3, 2, 11)), message("a", noon), message("same-second", noon),
+                message("after", datetime(2026, 3, 2, 12, 0, 1))]
+    assert [m.entry_id for m in state.new_messages("key", messages)] == ["same-second", "after"]
+
+
+def test_watermark_survives_save(tmp_path):
+    path = str(tmp_path / "sync.json")
+    state = SyncState(path)
+    state.advance("key", [message("a", datetime(2026, 3, 2, 12))])
+    state.save()
+    assert SyncState(path).watermark("key") == (datetime(2026, 3, 2, 12), {"a"})
+
+
+def test_finish_sync_only_advances_past_runs_that_cover_the_watermark(tmp_path):
+    state = SyncState(str(tmp_path / "sync.json"))
+    run = ExtractionRun()
+    march = datetime(2026, 3, 2, 12)
+    run.finish_sync(state, "key", [message("a", march)], incremental=False, start_date=datetime(2026, 3, 1))
+    assert state.watermark("key") == (None, set())  # A dated run doesn't create the watermark
+
+    run.finish_sync(state, "key", [message("a", march)], incremental=True)
+    # A later range skips mail since the watermark - leave it for the next incremental run
+    run.finish_sync(state, "key", [message("b", datetime(2026, 5, 1))], incremental=False,
+                    start_date=datetime(2026, 4, 1))
+    assert state.watermark("key")[0] == march
+
+    run.finish_sync(state, "key", [message("c", datetime(2026, 5, 1))], incremental=False,
+                    start_date=datetime(2026, 3, 2))
+    assert state.watermark("key")[0] == datetime(2026, 5, 1)
+
+    run.finish_sync(state, "key", [message("d", datetime(2026, 6, 1))], incremental=False)  # Full scan
+    assert state.watermark("key")[0] == datetime(2026, 6, 1)
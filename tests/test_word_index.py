@@ -0,0 +1,49 @@
+import random
+
+from po_extractor import WordIndex
+
+TEXTS = ['Ship', 'To:', 'Payment', 'Terms', 'Net', '30', 'Buyer', 'Line', '1.1', '$12.34', 'Shipping']
+
+
+def random_words(seed, count=200):
+    rng = random.Random(seed)
+    # Few distinct tops, so same-line and boundary cases come up often
+    return [{'text': rng.choice(TEXTS), 'top': float(rng.randrange(0, 60)), 'x0': float(rng.randrange(0, 500))}
+            for _ in range(count)]
+
+
+def scan_below(words, top, stop=None):
+    """The extractors' original reading-order scan"""
+    found = []
+    for word in words:
+        if stop is not None and word['top'] >= stop:
+            break
+        if word['top'] > top:
+            found.append(word)
+    return found
+
+
+def test_word_index_matches_linear_scans():
+    for seed in range(20):
+        words = random_words(seed)
+        index = WordIndex(words)
+        for fragment in ('Ship', 'Terms', '.', 'missing'):
+            assert index.containing(fragment) == [i for i, w in enumerate(words) if fragment in w['text']]
+            for below in (None, 10.0, 59.0):
+                expected = next((w for w in words if fragment in w['text'] and (below is None or w['top'] > below)),
+                                None)
+                assert index.first(fragment, below) is expected
+        assert index.containing('Ship', 'Net') == [i for i, w in enumerate(words)
+                                                   if 'Ship' in w['text'] or 'Net' in w['text']]
+        for top in (0.0, 5.0, 20.5, 59.0):
+            for tolerance in (1, 3):
+                assert index.on_line(top, tolerance) == [w for w in words if abs(w['top'] - top) < tolerance]
+            for stop in (None, top, top + 1, top + 15, 100.0):
+                assert index.below(top, stop) == scan_below(words, top, stop)
+
+
+def test_word_index_empty_page():
+    index = WordIndex([])
+    assert index.first('Ship') is None
+    assert index.on_line(10, 3) == []
+    assert index.below(0, 50) == []